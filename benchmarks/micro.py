@@ -0,0 +1,356 @@
+"""
+Micro-benchmarks of the geometry and entity primitives, with a regression guard.
+
+Each benchmark is timed like timeit: `repeat` rounds of the same number of calls (at least 0.2s per round),
+every round seeded the same and with the garbage collector off, keeping the fastest round. Times per call are
+divided by the time of a fixed calibration loop whose rounds alternate with the benchmark's, so a slower or
+busier machine shifts both alike. The normalized times are compared with benchmarks/micro_baseline.json; the
+script exits with 1 when a primitive is slower than its baseline by more than the tolerance, and by more than
+the floor in calibration units, below which the timer noise of the shortest primitives is not judged.
+
+    python benchmarks/micro.py --update-baseline    # once, on the machine that runs the guard
+    python benchmarks/micro.py                      # compare with the baseline
+    python benchmarks/micro.py connect to_dict      # only benchmarks whose name contains one of the words
+    python benchmarks/micro.py --large              # also the slow ones, e.g. add_shape_on_layer with 1000 shapes
+
+The baseline is local and not committed; benchmarks/micro_baseline.template.json shows its layout.
+"""
+
+import argparse
+import contextlib
+import copy
+import gc
+import io
+import json
+import os
+import platform
+import random
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "micro_baseline.json")
+TEMPLATE_PATH = os.path.join(ROOT, "benchmarks", "micro_baseline.template.json")
+SEED = 0
+MIN_ROUND_SECONDS = 0.2
+# cells of the arbitrary polygons, part of the loaded config like in benchmarks/scaling.py
+ARBITRARY_SHAPE_CELL_NUM = 10
+
+Benchmark = Callable[[], Tuple[Callable[[], None], int]]  # setup returning (work, calls per round)
+BENCHMARKS: Dict[str, Benchmark] = {}
+LARGE = set()  # benchmarks of several seconds per call, only run with --large
+
+
+def benchmark(name: str, large: bool = False):
+    def register(setup: Benchmark):
+        BENCHMARKS[name] = setup
+        if large:
+            LARGE.add(name)
+        return setup
+
+    return register
+
+
+def seed():
+    random.seed(SEED)
+    np.random.seed(SEED)
+
+
+def load_generation_config():
+    """entities read their defaults from the current config, so the base input config is loaded once"""
+    os.chdir(ROOT)
+    import gen_rand_tikz
+    from generation_config import GenerationConfig
+
+    GenerationConfig.color_mode = "colored"
+    config = json.loads(gen_rand_tikz.resolve_config_json())
+    config["arbitrary_shape_cell_num"] = ARBITRARY_SHAPE_CELL_NUM
+    gen_rand_tikz.load_config(json.dumps(config))
+
+
+def square(position=(0.0, 0.0), size=1.0):
+    import img_params
+    from entities.simple_shape import SimpleShape
+
+    return SimpleShape(
+        position=np.array(position),
+        rotation=img_params.Angle.deg0,
+        size=size,
+        shape=img_params.Shape.square,
+    )
+
+
+def random_shapes(count: int, extent: float) -> list:
+    """`count` shapes scattered over a square of side `extent`, each overlapping a few neighbors"""
+    import img_params
+    from entities.simple_shape import SimpleShape
+
+    seed()
+    shapes = []
+    for _ in range(count):
+        shape = SimpleShape(
+            position=np.random.uniform(-extent / 2, extent / 2, 2),
+            size=1.0,
+            shape=random.choice([img_params.Shape.square, img_params.Shape.circle, img_params.Shape.triangle]),
+        )
+        shape.base_geometry
+        shapes.append(shape)
+    return shapes
+
+
+@benchmark("simple_shape.construct")
+def bench_construct():
+    import img_params
+    from entities.simple_shape import SimpleShape
+
+    def work():
+        for shape in (img_params.Shape.square, img_params.Shape.circle, img_params.Shape.hexagon):
+            SimpleShape(position=np.array([1.0, 2.0]), size=1.5, shape=shape).base_geometry
+
+    return work, 100
+
+
+@benchmark("simple_shape.rotate")
+def bench_rotate():
+    shape = square()
+
+    def work():
+        shape.rotate(30)
+        shape.base_geometry
+
+    return work, 500
+
+
+@benchmark("simple_shape.scale")
+def bench_scale():
+    shape = square()
+
+    def work():
+        shape.scale(1.01, origin=(0, 0))
+        shape.scale(1 / 1.01, origin=(0, 0))
+        shape.base_geometry
+
+    return work, 500
+
+
+def bench_add_shape_on_layer(count: int):
+    from shape_group import ShapeGroup
+
+    shapes = random_shapes(count, extent=count ** 0.5 * 4)
+    layers = [random.randrange(3) for _ in shapes]
+
+    def work():
+        group = ShapeGroup([[]])
+        for shape, layer in zip(shapes, layers):
+            group.add_shape_on_layer(shape, layer)
+        group.with_overlap_regions()  # overlap regions are resolved when the panel is finalized
+
+    return work, max(100 // count, 1)
+
+
+for _count in (10, 100, 300, 1000):
+    benchmark(f"shape_group.add_shape_on_layer[{_count}]", large=_count >= 1000)(
+        lambda count=_count: bench_add_shape_on_layer(count)
+    )
+
+
+@benchmark("shape_group.search_size_by_interval")
+def bench_search_size_by_interval():
+    from shape_group import ShapeGroup
+
+    inner = ShapeGroup([[square(size=1.0)]])
+    outer = ShapeGroup([[square(position=(4.0, 0.0), size=2.0)]])
+
+    def work():
+        with contextlib.redirect_stdout(io.StringIO()):  # reports the scale it found
+            copy.deepcopy(inner).search_size_by_interval(outer, 0.3)
+
+    return work, 5
+
+
+@benchmark("line_segment.connect")
+def bench_connect():
+    from entities.line_segment import LineSegment
+
+    first = square().base_geometry
+    second = square(position=(4.0, 1.0), size=2.0).base_geometry
+
+    def work():
+        LineSegment.connect(first, second)
+
+    return work, 20
+
+
+@benchmark("complex_shape.arbitrary_polygon")
+def bench_arbitrary_polygon():
+    from entities.complex_shape import ComplexShape
+
+    def work():
+        ComplexShape.arbitrary_polygon()
+
+    return work, 50
+
+
+@benchmark("entity.to_dict")
+def bench_to_dict():
+    from entities.line_segment import LineSegment
+
+    entities = [square(), LineSegment(pt1=(0.0, 0.0), pt2=(3.0, 4.0))]
+
+    def work():
+        for entity in entities:
+            entity.to_dict()
+
+    return work, 200
+
+
+@benchmark("converter.convert")
+def bench_convert():
+    from entities.line_segment import LineSegment
+
+    entities = [square(), LineSegment(pt1=(0.0, 0.0), pt2=(3.0, 4.0))]
+
+    def work():
+        for entity in entities:
+            entity.tikz_converter.convert(entity)
+
+    return work, 200
+
+
+def calibration() -> Tuple[Callable[[], None], int]:
+    """interpreter-bound work with a few small shapely calls, close to the mix of the primitives"""
+    import shapely
+
+    box = shapely.box(0, 0, 1, 1)
+
+    def work():
+        total = 0
+        for i in range(2000):
+            total += i * i % 7
+        for i in range(20):
+            shapely.affinity.rotate(box, i).intersects(box)
+
+    return work, 20
+
+
+def run_round(work: Callable[[], None], calls: int) -> float:
+    seed()
+    gc.disable()  # like timeit, a collection would be charged to whichever call triggers it
+    try:
+        start = time.perf_counter()
+        for _ in range(calls):
+            work()
+        return time.perf_counter() - start
+    finally:
+        gc.enable()
+
+
+def prepare(setup: Benchmark) -> Tuple[Callable[[], None], int]:
+    """the work and its calls per round. short benchmarks get more calls per round, timer noise dominates otherwise"""
+    seed()
+    work, calls = setup()
+    while run_round(work, calls) < MIN_ROUND_SECONDS:  # the first round also warms up caches
+        calls *= 2
+    return work, calls
+
+
+def measure(setup: Benchmark, calibration_round: Tuple[Callable[[], None], int], repeat: int) -> Tuple[float, float]:
+    """
+    seconds per call of the fastest round of the benchmark and of the calibration loop. their rounds alternate,
+    so both are timed while the machine is in the same state
+    """
+    work, calls = prepare(setup)
+    calibration_work, calibration_calls = calibration_round
+    fastest, fastest_calibration = float("inf"), float("inf")
+    for _ in range(repeat):
+        fastest_calibration = min(fastest_calibration, run_round(calibration_work, calibration_calls))
+        fastest = min(fastest, run_round(work, calls))
+    return fastest / calls, fastest_calibration / calibration_calls
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], tolerance: float, floor: float) -> List[str]:
+    """print each result against its baseline (both in calibration units) and return the regressed names"""
+    regressed = []
+    print(f"{'benchmark':<44}{'x calib':>12}{'baseline':>12}{'ratio':>8}")
+    for name, relative in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            print(f"{name:<44}{relative:>12.3f}{'--':>12}{'--':>8}")
+            continue
+        ratio = relative / expected
+        flag = ""
+        if ratio > 1 + tolerance and relative - expected > floor:
+            regressed.append(name)
+            flag = "  REGRESSED"
+        print(f"{name:<44}{relative:>12.3f}{expected:>12.3f}{ratio:>8.2f}{flag}")
+    return regressed
+
+
+def load_baseline(path: str) -> Dict[str, float]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["relative_to_calibration"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="time the hot geometry / entity primitives against a baseline")
+    parser.add_argument("names", nargs="*", help="only run benchmarks whose name contains one of these")
+    parser.add_argument("--repeat", type=int, default=5, help="rounds per benchmark, the fastest one counts")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed slowdown, 0.5 = 50%%")
+    parser.add_argument(
+        "--floor", type=float, default=0.05, help="slowdowns up to this many calibration units are never judged"
+    )
+    parser.add_argument("--large", action="store_true", help="also run the benchmarks of several seconds per call")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true", help="write the results as the new baseline")
+    args = parser.parse_args()
+
+    load_generation_config()
+    selected = [
+        name
+        for name in BENCHMARKS
+        if (args.large or name not in LARGE) and (not args.names or any(word in name for word in args.names))
+    ]
+    if not selected:
+        parser.error(f"no benchmark matches {' '.join(args.names)}")
+    calibration_round = prepare(calibration)
+    results, calibrations = {}, []
+    for name in selected:
+        seconds, calibration_seconds = measure(BENCHMARKS[name], calibration_round, args.repeat)
+        results[name] = seconds / calibration_seconds
+        calibrations.append(calibration_seconds)
+    calibration_seconds = min(calibrations)
+    print(f"[micro] calibration loop {calibration_seconds * 1e3:.2f} ms")
+
+    if args.update_baseline:
+        # start from the existing baseline, or the template listing every benchmark
+        baseline = load_baseline(args.baseline if os.path.exists(args.baseline) else TEMPLATE_PATH)
+        baseline.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "calibration_seconds": calibration_seconds,
+                    "relative_to_calibration": baseline,
+                },
+                f,
+                indent=4,
+            )
+        compare(results, {}, args.tolerance, args.floor)
+        print(f"[micro] baseline written to {args.baseline}")
+        raise SystemExit(0)
+
+    if not os.path.exists(args.baseline):
+        compare(results, {}, args.tolerance, args.floor)
+        print(f"[micro] no baseline at {args.baseline}, run with --update-baseline first")
+        raise SystemExit(1)
+    regressed = compare(results, load_baseline(args.baseline), args.tolerance, args.floor)
+    if regressed:
+        print(f"[micro] {len(regressed)} regressed beyond {args.tolerance:.0%}: {', '.join(regressed)}")
+        raise SystemExit(1)
+    print("[micro] no regressions")
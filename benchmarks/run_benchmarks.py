@@ -0,0 +1,223 @@
+"""
+End-to-end throughput benchmark of the generator.
+
+Every config in benchmarks/configs is run in a fresh process for a fixed number of images (seeded by the
+config's "seed"), timing `generate_panels` alone and together with the TeX / JSON emission. Results are
+printed and written as json, so runs of different commits can be compared.
+
+    python benchmarks/run_benchmarks.py --images 20
+    python benchmarks/run_benchmarks.py benchmarks/configs/grid.json --output grid.json
+    python benchmarks/run_benchmarks.py --memory-profile   # rank configs and generators by peak memory
+    python benchmarks/run_benchmarks.py --profile          # cProfile every config, merged into <output>-profile/
+    python benchmarks/run_benchmarks.py --trace            # chrome trace of every worker, merged into <output>-trace.json
+"""
+
+import argparse
+import contextlib
+import datetime
+import glob
+import io
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import List
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CONFIG_DIR = os.path.join(ROOT, "benchmarks", "configs")
+RESULT_DIR = os.path.join(ROOT, "benchmarks", "results")
+BASIC_ATTRIBUTES_PATH = os.path.join(ROOT, "input", "basic_attributes_distribution.json")
+
+
+def latency_stats(seconds: List[float]) -> dict:
+    if not seconds:
+        return {"images_per_sec": 0.0, "p50_ms": None, "p95_ms": None, "p99_ms": None}
+    p50, p95, p99 = np.percentile(np.array(seconds) * 1000, [50, 95, 99])
+    return {
+        "images_per_sec": len(seconds) / sum(seconds),
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+    }
+
+
+def run_config(
+    config_path: str,
+    images: int,
+    color_mode: str,
+    backend: str,
+    memory_threshold: float = None,
+    profile_dir: str = None,
+    trace: bool = False,
+) -> dict:
+    """generate `images` images of one config in this process and time them"""
+    os.chdir(ROOT)  # the generator loads the template and writes the resolved config relative to the root
+    import gen_rand_tikz
+    import memory_profile
+    import profiling
+    import telemetry
+    import trace_events
+    from generation_config import GenerationConfig
+
+    if memory_threshold is not None:
+        memory_profile.enable(memory_threshold)
+    name = os.path.splitext(os.path.basename(config_path))[0]
+    if trace:
+        trace_events.enable(f"benchmark {name}")
+
+    GenerationConfig.color_mode = color_mode
+    GenerationConfig.render_backend = backend
+    GenerationConfig.generated_file_prefix = "bench-"
+    resolved = gen_rand_tikz.resolve_config_json(config_path, BASIC_ATTRIBUTES_PATH)
+
+    generate_panels, write_outputs = gen_rand_tikz.generate_panels, gen_rand_tikz.write_outputs
+    if profile_dir is not None:
+        profiles = profiling.WorkerProfiles()
+        generate_panels, write_outputs = profiles.profiled(generate_panels), profiles.profiled(write_outputs)
+
+    generate_seconds, total_seconds, failures, image_stats = [], [], 0, []
+    with tempfile.TemporaryDirectory(prefix="bench-") as output_dir:
+        for n in range(images):
+            stats = telemetry.start_image(f"{name}-{n}", config=name)
+            with telemetry.stage("config"):
+                base_config = gen_rand_tikz.load_config(resolved)
+            seed = gen_rand_tikz.image_seed(base_config, n)
+            if seed is not None:
+                random.seed(seed)
+                np.random.seed(seed)
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):  # generators report their progress
+                    start = time.perf_counter()
+                    panels = generate_panels(base_config)
+                    generated = time.perf_counter()
+                    write_outputs(panels, n, output_dir, output_dir, output_dir)
+                    written = time.perf_counter()
+            except Exception as e:
+                print(f"[benchmark] {os.path.basename(config_path)} image {n} failed: {e!r}", file=sys.stderr)
+                failures += 1
+                continue
+            finally:
+                telemetry.finish_image()
+            del panels  # dropped before the next image starts, so it is not part of its memory
+            image_stats.append(stats.to_dict())
+            generate_seconds.append(generated - start)
+            total_seconds.append(written - start)
+
+    result = {
+        "images": images,
+        "failures": failures,
+        "generate": latency_stats(generate_seconds),
+        "full": latency_stats(total_seconds),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,  # kilobytes on linux
+    }
+    if memory_threshold is not None:
+        result["memory"] = memory_profile.summarize(image_stats)
+    if profile_dir is not None:
+        result["profile"] = profiles.dump(profile_dir, prefix=f"{name}-")
+    if trace:
+        result["trace_events"] = trace_events.events()  # merged by the parent, not part of the results json
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(results: dict):
+    print(f"{'config':<20}{'gen img/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'full img/s':>11}{'p99 ms':>9}{'rss MB':>8}{'failed':>7}")
+    for name, result in results.items():
+        generate, full = result["generate"], result["full"]
+        fmt = lambda value: "--" if value is None else f"{value:.1f}"
+        print(
+            f"{name:<20}{generate['images_per_sec']:>10.2f}{fmt(generate['p50_ms']):>9}{fmt(generate['p95_ms']):>9}"
+            f"{fmt(generate['p99_ms']):>9}{full['images_per_sec']:>11.2f}{fmt(full['p99_ms']):>9}"
+            f"{result['peak_rss_mb']:>8.0f}{result['failures']:>7}"
+        )
+
+
+def print_memory_ranking(results: dict):
+    """configs by the largest traced peak of their images, each with its most expensive top-level generator"""
+    print(f"{'config':<20}{'max MB':>9}{'mean MB':>9}  largest generator")
+    ranked = sorted(results.items(), key=lambda item: -max([c["max_peak_mb"] for c in item[1]["memory"]["configs"].values()] or [0]))
+    for name, result in ranked:
+        memory = result["memory"]
+        config = next(iter(memory["configs"].values()), {"max_peak_mb": 0.0, "mean_peak_mb": 0.0})
+        generator = next(iter(memory["generators"].items()), None)
+        largest = f"{generator[0]} {generator[1]['max_peak_mb']:.1f} MB" if generator else "--"
+        print(f"{name:<20}{config['max_peak_mb']:>9.1f}{config['mean_peak_mb']:>9.1f}  {largest}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="measure generation throughput on the benchmark configs")
+    parser.add_argument("configs", nargs="*", help="config files (default: all of benchmarks/configs/*.json)")
+    parser.add_argument("--images", type=int, default=20, help="images per config")
+    parser.add_argument("--color-mode", default="colored")
+    parser.add_argument("--backend", choices=["tikz", "raster"], default="tikz")
+    parser.add_argument("--output", default=None, help="result json (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument(
+        "--memory-profile", action="store_true", help="trace memory per image and generator (slows the timed runs down)"
+    )
+    parser.add_argument("--memory-threshold", type=float, default=100.0, help="MB above which an image keeps its top allocation sites")
+    parser.add_argument("--profile", action="store_true", help="run cProfile in every worker (slows the timed runs down)")
+    parser.add_argument("--trace", action="store_true", help="record a chrome trace-event timeline of every worker")
+    args = parser.parse_args()
+    memory_threshold = args.memory_threshold if args.memory_profile else None
+
+    config_paths = [os.path.abspath(path) for path in args.configs] or sorted(glob.glob(os.path.join(CONFIG_DIR, "*.json")))
+    started = datetime.datetime.now()
+    output = args.output or os.path.join(RESULT_DIR, f"{started:%Y%m%d-%H%M%S}.json")
+    profile_dir = f"{os.path.splitext(os.path.abspath(output))[0]}-profile" if args.profile else None
+    results, events = {}, []
+    for config_path in config_paths:
+        name = os.path.splitext(os.path.basename(config_path))[0]
+        # a fresh process per config, so peak RSS and caches are not shared between configs
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+            results[name] = executor.submit(
+                run_config, config_path, args.images, args.color_mode, args.backend, memory_threshold, profile_dir, args.trace
+            ).result()
+        events += results[name].pop("trace_events", [])
+        print(f"[benchmark] {name} done", flush=True)
+
+    print_table(results)
+    if args.memory_profile:
+        print_memory_ranking(results)
+    report = {
+        "commit": git_commit(),
+        "started": started.isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "images": args.images,
+        "color_mode": args.color_mode,
+        "backend": args.backend,
+        "configs": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4)
+    print(f"[benchmark] results written to {output}")
+    if args.profile:
+        import profiling
+
+        profiling.write_reports([path for result in results.values() for path in result["profile"]], profile_dir)
+        print(f"[benchmark] profiles of {len(results)} workers merged into {profile_dir}")
+    if args.trace:
+        import trace_events
+
+        trace_path = f"{os.path.splitext(os.path.abspath(output))[0]}-trace.json"
+        trace_events.write(trace_path, events)
+        print(f"[benchmark] trace of {len(results)} workers written to {trace_path}")
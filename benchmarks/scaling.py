@@ -0,0 +1,194 @@
+"""
+Scaling sweeps of the generators.
+
+Each knob is swept over increasing sizes on an otherwise fixed config. Every point runs in a fresh process:
+once timed (`run_benchmarks.run_config`), once with the memory profile for the traced peak, which would
+distort the timings. Median generation time and peak memory are then fitted against the size on a log-log
+scale; the slope is the empirical complexity exponent, so 1 is linear and 2 quadratic.
+
+    python benchmarks/scaling.py                 # every knob
+    python benchmarks/scaling.py chaining random --images 5
+"""
+
+import argparse
+import copy
+import datetime
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from run_benchmarks import CONFIG_DIR, RESULT_DIR, git_commit, run_config
+
+SUPERLINEAR_EXPONENT = 1.2  # exponents above this are flagged
+
+with open(os.path.join(CONFIG_DIR, "elements", "simple.json"), "r", encoding="utf-8") as f:
+    SIMPLE_ELEMENT = json.load(f)
+
+
+def base_config(panels: List[dict], layout=(1, 1)) -> dict:
+    return {
+        "layout": list(layout),
+        "canvas_width": 20.0 * max(layout),
+        "canvas_height": 20.0 * max(layout),
+        "opacity": 0.5,
+        "seed": 0,
+        "panel_configs": panels,
+    }
+
+
+def elements(count: int) -> List[dict]:
+    return [copy.deepcopy(SIMPLE_ELEMENT) for _ in range(count)]
+
+
+def chaining(size: int) -> dict:
+    return base_config(
+        [
+            {
+                "composition_type": {"chaining": 1.0},
+                "chaining_image_config": {
+                    "element_num": size,
+                    "chain_shape": "line",
+                    "draw_chain": True,
+                    "chain_level": "bottom",
+                    "interval": 0.2,
+                    "rotation": 0,
+                    "sub_elements": elements(size),
+                },
+            }
+        ]
+    )
+
+
+def random_panel(size: int) -> dict:
+    return {
+        "composition_type": {"random": 1.0},
+        "random_image_config": {"element_num": size, "centralization": 0.5, "sub_elements": elements(size)},
+    }
+
+
+def enclosing(size: int) -> dict:
+    return base_config(
+        [{"composition_type": {"enclosing": 1.0}, "enclosing_image_config": {"enclose_level": size, "sub_elements": elements(1)}}]
+    )
+
+
+def arbitrary_shape(size: int) -> dict:
+    # a simple panel drawing a single arbitrary polygon of `size` cells
+    return base_config(
+        [
+            {
+                "composition_type": {"simple": 1.0},
+                "simple_image_config": {},
+                "shape_distribution": [0.0] * 8 + [1.0],
+                "arbitrary_shape_cell_num": size,
+            }
+        ]
+    )
+
+
+def panels(size: int) -> dict:
+    rows = int(np.ceil(np.sqrt(size)))
+    cols = int(np.ceil(size / rows))
+    return base_config([random_panel(4) for _ in range(rows * cols)], layout=(rows, cols))
+
+
+# knob -> (config of a size, sizes)
+SWEEPS: Dict[str, tuple] = {
+    "chaining.element_num": (chaining, [2, 4, 8, 12, 16, 20]),
+    "random.element_num": (lambda size: base_config([random_panel(size)]), [4, 8, 16, 32, 64]),
+    "enclosing.enclose_level": (enclosing, [1, 2, 4, 6, 8, 10]),
+    "arbitrary_shape_cell_num": (arbitrary_shape, [5, 10, 20, 40, 80, 160]),
+    "layout.panels": (panels, [1, 2, 4, 9, 16]),
+}
+
+
+def fit_exponent(sizes: List[float], values: List[float]) -> dict:
+    """slope and r^2 of log(value) against log(size)"""
+    points = [(size, value) for size, value in zip(sizes, values) if value is not None and value > 0]
+    if len(points) < 2:
+        return {"exponent": None, "r2": None}
+    x, y = np.log([size for size, _ in points]), np.log([value for _, value in points])
+    slope, intercept = np.polyfit(x, y, 1)
+    residual = y - (slope * x + intercept)
+    total = ((y - y.mean()) ** 2).sum()
+    return {"exponent": float(slope), "r2": float(1 - (residual ** 2).sum() / total) if total > 0 else None}
+
+
+def run_point(config: dict, images: int, memory_images: int, color_mode: str) -> dict:
+    with tempfile.TemporaryDirectory(prefix="scaling-") as config_dir:
+        config_path = os.path.join(config_dir, "point.json")
+        with open(config_path, "w", encoding="utf-8") as f:
+            json.dump(config, f)
+        context = get_context("spawn")
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            timed = executor.submit(run_config, config_path, images, color_mode, "tikz").result()
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            # one more image, the first one also pays for loading the template and lazy imports
+            traced = executor.submit(run_config, config_path, memory_images + 1, color_mode, "tikz", float("inf")).result()
+    peaks = [image["peak_mb"] for image in traced["memory"]["images"] if not image["image"].endswith("-0")]
+    return {
+        "generate_p50_ms": timed["generate"]["p50_ms"],
+        "full_p50_ms": timed["full"]["p50_ms"],
+        "peak_mb": float(np.mean(peaks)) if peaks else None,
+        "failures": timed["failures"],
+    }
+
+
+def sweep(name: str, make_config: Callable[[int], dict], sizes: List[int], images: int, memory_images: int, color_mode: str) -> dict:
+    points = []
+    for size in sizes:
+        points.append({"size": size, **run_point(make_config(size), images, memory_images, color_mode)})
+        print(f"[scaling] {name} = {size}: {points[-1]['generate_p50_ms']} ms, {points[-1]['peak_mb']} MB", flush=True)
+    return {
+        "points": points,
+        "time": fit_exponent(sizes, [point["generate_p50_ms"] for point in points]),
+        "memory": fit_exponent(sizes, [point["peak_mb"] for point in points]),
+    }
+
+
+def print_table(results: dict):
+    fmt = lambda value: "--" if value is None else f"{value:.2f}"
+    print(f"{'knob':<28}{'sizes':>16}{'time exp':>10}{'r2':>6}{'memory exp':>12}{'r2':>6}")
+    for name, result in results.items():
+        sizes = f"{result['points'][0]['size']}..{result['points'][-1]['size']}"
+        time_fit, memory_fit = result["time"], result["memory"]
+        flag = ""
+        if time_fit["exponent"] is not None and time_fit["exponent"] > SUPERLINEAR_EXPONENT:
+            flag = "  super-linear"
+        print(
+            f"{name:<28}{sizes:>16}{fmt(time_fit['exponent']):>10}{fmt(time_fit['r2']):>6}"
+            f"{fmt(memory_fit['exponent']):>12}{fmt(memory_fit['r2']):>6}{flag}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="sweep generator knobs and fit the empirical complexity exponent")
+    parser.add_argument("knobs", nargs="*", help=f"knobs whose name contains one of these (default: all of {', '.join(SWEEPS)})")
+    parser.add_argument("--images", type=int, default=5, help="timed images per point")
+    parser.add_argument("--memory-images", type=int, default=2, help="memory-profiled images per point")
+    parser.add_argument("--color-mode", default="colored")
+    parser.add_argument("--output", default=None, help="result json (default: benchmarks/results/scaling-<timestamp>.json)")
+    args = parser.parse_args()
+
+    started = datetime.datetime.now()
+    selected = [name for name in SWEEPS if not args.knobs or any(word in name for word in args.knobs)]
+    results = {}
+    for name in selected:
+        make_config, sizes = SWEEPS[name]
+        results[name] = sweep(name, make_config, sizes, args.images, args.memory_images, args.color_mode)
+
+    print_table(results)
+    output = args.output or os.path.join(RESULT_DIR, f"scaling-{started:%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(
+            {"commit": git_commit(), "started": started.isoformat(timespec="seconds"), "images": args.images, "knobs": results},
+            f,
+            indent=4,
+        )
+    print(f"[scaling] results written to {output}")
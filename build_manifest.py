@@ -0,0 +1,118 @@
+"""
+Content-addressed build manifest, used by the pipeline to skip work whose inputs have not changed.
+
+For every image and stage the manifest stores a digest of the stage's inputs (resolved config, seed,
+code version, upstream files, ...) and a digest of each output file. A stage is fresh when its input
+digest is unchanged and all of its outputs still exist with the recorded content.
+
+Records are appended to a json-lines journal as soon as a stage finishes, so an interrupted batch
+resumes where it stopped. Later lines override earlier ones; `compact` rewrites the file.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# sources whose changes invalidate generated images: the modules gen_rand_tikz runs to produce an image.
+# annotation / conversion scripts and instrumentation (telemetry, tracing, metrics, profilers) are left out,
+# so editing them does not regenerate every image. a new generation module has to be added here
+GENERATION_SOURCES = [
+    "common_types.py",
+    "gen_rand_tikz.py",
+    "generation_config.py",
+    "image_generators.py",
+    "img_params.py",
+    "input_configs.py",
+    "panel.py",
+    "polyomino.py",
+    "raster_renderer.py",
+    "shape_group.py",
+    "shapely_helpers.py",
+    "tikz_converters.py",
+    "uid_service.py",
+    "util.py",
+    "entities/__init__.py",
+    "entities/closed_shape.py",
+    "entities/complex_shape.py",
+    "entities/entity.py",
+    "entities/line_segment.py",
+    "entities/simple_shape.py",
+    "entities/smooth_curve.py",
+    "entities/touching_point.py",
+    "entities/visible_shape.py",
+    "tikz_template.jinja",
+]
+
+
+def digest(*parts) -> str:
+    """sha256 over the given str / bytes / None parts"""
+    hasher = hashlib.sha256()
+    for part in parts:
+        if part is None:
+            part = b"\x00none"
+        elif isinstance(part, str):
+            part = part.encode("utf-8")
+        hasher.update(len(part).to_bytes(8, "little"))
+        hasher.update(part)
+    return hasher.hexdigest()
+
+
+def file_digest(path: str) -> Optional[str]:
+    if not os.path.isfile(path):
+        return None
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def source_digest(paths: Iterable[str] = GENERATION_SOURCES) -> str:
+    """code version of the given source files, independent of git"""
+    paths = sorted(set(os.path.normpath(path) for path in paths))
+    return digest(*[part for path in paths for part in (path, file_digest(path))])
+
+
+class BuildManifest:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.records: Dict[Tuple[str, str], dict] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:  # partially written line of an interrupted run
+                        continue
+                    self.records[(record["image"], record["stage"])] = record
+
+    def is_fresh(self, image: str, stage: str, inputs: str) -> bool:
+        record = self.records.get((image, stage))
+        if record is None or record["inputs"] != inputs:
+            return False
+        return all(file_digest(path) == expected for path, expected in record["outputs"].items())
+
+    def record(self, image: str, stage: str, inputs: str, outputs: List[str]):
+        record = {
+            "image": image,
+            "stage": stage,
+            "inputs": inputs,
+            "outputs": {path: file_digest(path) for path in outputs},
+        }
+        with self._lock:
+            self.records[(image, stage)] = record
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+
+    def compact(self):
+        """rewrite the journal with only the latest record of each image and stage"""
+        with self._lock:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for record in self.records.values():
+                    f.write(json.dumps(record) + "\n")
+            os.replace(tmp_path, self.path)
@@ -5,14 +5,13 @@ from enum import Enum
 from matplotlib.pyplot import xkcd
 from PIL import Image
 
+import gen_rand_tikz
 import img_params
 from common_types import *
 from entities.simple_shape import SimpleShape
+from generation_config import GenerationConfig
+from util import canvas_to_pixel
 
-get_image_id = (x for x in range(1000000)).__next__
-get_annotation_id = (x for x in range(100000)).__next__
-width = 0
-height = 0
 
 
 def find_category_id_by_name(name: str, categories):
@@ -37,13 +36,9 @@ def find_category_id_by_name(name: str, categories):
     return catid
 
 
-def transform_coordinate(coordinate:Coordinate):
+def transform_coordinate(coordinate:Coordinate, size, canvas_size=None):
     """transform the coordinate on the latex canvas to coordinate on the png image (by pixels)"""
-    global width, height
-    return [
-        coordinate[0] / 20 * width + width / 2,
-        height / 2 - coordinate[1] / 20 * height,
-    ]
+    return canvas_to_pixel([coordinate], size, canvas_size)[0].tolist()
 
 
 def calc_bbox(segmentation):
@@ -86,12 +81,13 @@ def calc_relative_category(
 
 
 def format_shape_annotations(
-    shape, panel_top_left, panel_bottom_right
+    shape, panel_top_left, panel_bottom_right, size, canvas_size=None
 ):  # multiple annotations for 1 shape, each annotation for each attribute (category)
+    """annotations of one shape, without ids. they share one annotation id, see number_annotations"""
     annotations = []
 
     # form boundary coordinates and segmentation and bounding box
-    vertices = transform_coordinate(shape["position"]) + [2]
+    vertices = transform_coordinate(shape["position"], size, canvas_size) + [2]
     segmentation = []
     coordinates = (
         shape["base_geometry"]["coordinates"][0]
@@ -110,7 +106,7 @@ def format_shape_annotations(
         "decagon",
     ]
     for coordinate in coordinates[:-1]:
-        transformed_coord = transform_coordinate(coordinate)
+        transformed_coord = transform_coordinate(coordinate, size, canvas_size)
         if "shape" in shape and shape["shape"] in polygon_shapes:
             vertices += transformed_coord
             vertices.append(2)
@@ -123,8 +119,6 @@ def format_shape_annotations(
     else:
         category_id=1000
     shape_annotation = {
-        "id": get_annotation_id(),
-        "image_id": image_id,
         "category_id": category_id,
         "bbox": bbox,
         "segmentation": [segmentation],  # real seg is nested list
@@ -179,7 +173,7 @@ def format_shape_annotations(
     return annotations
 
 
-def format_joint_annotation(joint):
+def format_joint_annotation(joint, shapes, size, canvas_size=None):
     attach_types = [joint["attach_type_A"], joint["attach_type_B"]]
     if "CORNER" in attach_types or "ARC" in attach_types:
         category_id = find_category_id_by_name("intersectionDot", categories)
@@ -188,20 +182,24 @@ def format_joint_annotation(joint):
     else:  # arc overlapping, not likely to happen
         category_id = find_category_id_by_name("intersectionArc", categories)
 
-    joint_coord = transform_coordinate(joint["position"])
+    joint_coord = transform_coordinate(joint["position"], size, canvas_size)
     segmentation = joint_coord[:]
     keypoints = segmentation[:] + [2]
     neighbor_A_coord = transform_coordinate(
         next(
-            (shape for shape in panel["shapes"] if shape["uid"] == joint["neighbor_A"]),
+            (shape for shape in shapes if shape["uid"] == joint["neighbor_A"]),
             None,
-        )["position"]
+        )["position"],
+        size,
+        canvas_size,
     )
     neighbor_B_coord = transform_coordinate(
         next(
-            (shape for shape in panel["shapes"] if shape["uid"] == joint["neighbor_B"]),
+            (shape for shape in shapes if shape["uid"] == joint["neighbor_B"]),
             None,
-        )["position"]
+        )["position"],
+        size,
+        canvas_size,
     )
     keypoints += neighbor_A_coord + [2]
     keypoints += neighbor_B_coord + [2]
@@ -210,8 +208,6 @@ def format_joint_annotation(joint):
     segmentation += neighbor_B_coord  # TODO: consider changing seg representation in case joint not properly contained
 
     joint_annotation = {
-        "id": get_annotation_id(),
-        "image_id": image_id,
         "category_id": category_id,
         # "keypoints": keypoints,
         "segmentation": [segmentation],
@@ -221,57 +217,95 @@ def format_joint_annotation(joint):
     return joint_annotation
 
 
-generate_num = 1
-if len(sys.argv) >= 2 and sys.argv[1]:
-    generate_num = int(sys.argv[1])
-
-if len(sys.argv) >= 3 and sys.argv[2]:
-    file_prefix = sys.argv[2]
-with open("./categories.json", "r") as json_file:
-    categories = list(json.load(json_file))
-
-labels_dict = {
-    "info": {},
-    "licenses": [],
-    "categories": [],
-    "images": [],
-    "annotations": [],
-}
-for i in range(generate_num):
-    image_id = get_image_id()
-    license = {"id": image_id}
-    with Image.open(f"./output_png/{file_prefix}{i}.png") as img:
-        width, height = img.size
+def load_categories(path="./categories.json"):
+    global categories
+    with open(path, "r") as json_file:
+        categories = list(json.load(json_file))
+    return categories
+
+
+def annotate_image(index: int, file_prefix: str = "", png_dir="./output_png", json_dir="./output_json", canvas_size=None):
+    """size and annotation groups of a single generated image, without ids. see add_image.
+    canvas_size (width, height) defaults to the canvas of the current config"""
+    if canvas_size is None:
+        canvas_size = (GenerationConfig.canvas_width, GenerationConfig.canvas_height)
+    with Image.open(f"{png_dir}/{file_prefix}{index}.png") as img:
+        size = img.size
     image = {
-        "id": image_id,
-        "license": license["id"],
-        "file_name": f"{file_prefix}{i}.png",
-        "height": height,
-        "width": width,
+        "file_name": f"{file_prefix}{index}.png",
+        "height": size[1],
+        "width": size[0],
         "date_captured": None,
     }
-    with open(f"./output_json/{file_prefix}{i}.json", "r") as file:
+    annotation_groups = []  # annotations of a group share an id
+    with open(f"{json_dir}/{file_prefix}{index}.json", "r") as file:
         data = json.load(file)
     for panel in data:
         for shape in panel["shapes"]:
-            shape_annotations = format_shape_annotations(
-                shape=shape,
-                panel_bottom_right=panel["bottom_right"],
-                panel_top_left=panel["top_left"],
+            annotation_groups.append(
+                format_shape_annotations(
+                    shape=shape,
+                    panel_bottom_right=panel["bottom_right"],
+                    panel_top_left=panel["top_left"],
+                    size=size,
+                    canvas_size=canvas_size,
+                )
             )
-            labels_dict["annotations"] += shape_annotations
 
         for joint in panel["joints"]:
-            joint_annotation = format_joint_annotation(
-                joint=joint
-            )  # typically only 1 annotation for 1 joint
-            labels_dict["annotations"].append(joint_annotation)
+            # typically only 1 annotation for 1 joint
+            annotation_groups.append([format_joint_annotation(joint=joint, shapes=panel["shapes"], size=size, canvas_size=canvas_size)])
+    return image, annotation_groups
+
+
+def add_image(labels_dict, image, annotation_groups):
+    """append an annotated image, numbering it and its annotations after the ones already in labels_dict.
+    images must be added in index order for the ids to be stable"""
+    image_id = len(labels_dict["images"])
+    annotation_id = labels_dict["annotations"][-1]["id"] + 1 if labels_dict["annotations"] else 0
+    labels_dict["licenses"].append({"id": image_id})
+    labels_dict["images"].append({"id": image_id, "license": image_id, **image})
+    for group in annotation_groups:
+        for annotation in group:
+            labels_dict["annotations"].append({"id": annotation_id, "image_id": image_id, **annotation})
+        annotation_id += 1
+
+
+def new_labels_dict():
+    return {
+        "info": {},
+        "licenses": [],
+        "categories": [],
+        "images": [],
+        "annotations": [],
+    }
+
+
+def write_labels(labels_dict, path="./my_dataset/labels.json"):
+    labels_dict["categories"] = categories
+    with open(path, "w") as json_file:
+        json.dump(labels_dict, json_file, indent=4)
+
+
+if __name__ == "__main__":
+    flags = {arg for arg in sys.argv[1:] if arg.startswith("--")}
+    sys.argv = [arg for arg in sys.argv if arg not in flags]
+    for flag in flags:
+        if flag.startswith("--config="):
+            GenerationConfig.config_path = flag.split("=", 1)[1]
+    generate_num = 1
+    file_prefix = ""
+    if len(sys.argv) >= 2 and sys.argv[1]:
+        generate_num = int(sys.argv[1])
 
-    # information unique to an image
-    labels_dict["licenses"].append(license)
-    labels_dict["images"].append(image)
+    if len(sys.argv) >= 3 and sys.argv[2]:
+        file_prefix = sys.argv[2]
+    load_categories()
+    # the annotations are mapped to pixels by the canvas size of the config
+    gen_rand_tikz.load_config(gen_rand_tikz.resolve_config_json(GenerationConfig.config_path))
 
-labels_dict["categories"] = categories
+    labels_dict = new_labels_dict()
+    for i in range(generate_num):
+        add_image(labels_dict, *annotate_image(i, file_prefix))
 
-with open("./my_dataset/labels.json", "w") as json_file:
-    json.dump(labels_dict, json_file, indent=4)
+    write_labels(labels_dict)
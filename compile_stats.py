@@ -0,0 +1,194 @@
+"""
+Compile cost of the generated .tex files.
+
+The pipeline's compile stage records the pdflatex wall time of every image together with the numbers of its
+pdflatex .log (pages, pdf size, TeX memory used) and features of the image: shapes, vertices and patterns from
+its json, TikZ constructs (overlap-region fills, circles, bezier curves, postactions) from its .tex. Records are
+appended to output_json/compile_stats.jsonl; the latest record of an image wins.
+
+`report` fits compile time (and TeX memory) as a linear function of the features with least squares, so each
+feature gets a cost per unit and its share of the mean compile time.
+
+    python compile_stats.py [records.jsonl]
+"""
+
+import json
+import os
+import re
+import sys
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+RECORDS_PATH = os.path.join("output_json", "compile_stats.jsonl")
+REPORT_PATH = os.path.join("output_json", "compile_report.json")
+
+OUTPUT_LINE = re.compile(r"Output written on .*?\((\d+) pages?, (\d+) bytes\)", re.S)
+MEMORY_LINES = {
+    "tex_strings": re.compile(r"^\s*(\d+) strings out of", re.M),
+    "tex_memory_words": re.compile(r"^\s*(\d+) words of memory out of", re.M),
+    "tex_font_words": re.compile(r"^\s*(\d+) words of font info for", re.M),
+    "tex_control_sequences": re.compile(r"^\s*(\d+) multiletter control sequences out of", re.M),
+}
+# tikz constructs counted in the instructions of a .tex file
+TEX_CONSTRUCTS = {
+    "overlap_regions": re.compile(r"^\\fill \[", re.M),  # intersection regions are the only \fill instructions
+    "circles": re.compile(r"\) circle \("),
+    "beziers": re.compile(r"\.\. controls"),
+    "postactions": re.compile(r"postaction="),
+    "path_segments": re.compile(r" -- "),
+    "shared_styles": re.compile(r"/\.style="),
+}
+
+
+def parse_log(text: str) -> Dict[str, Optional[int]]:
+    """pages and pdf size of the "Output written" line and the "how much of TeX's memory you used" block"""
+    values = {"pages": None, "pdf_bytes": None}
+    output = OUTPUT_LINE.search(text)
+    if output is not None:
+        values["pages"], values["pdf_bytes"] = int(output.group(1)), int(output.group(2))
+    for key, pattern in MEMORY_LINES.items():
+        match = pattern.search(text)
+        values[key] = int(match.group(1)) if match is not None else None
+    return values
+
+
+def count_points(coordinates) -> int:
+    """number of points of nested geojson coordinate lists (polygon rings count their closing point)"""
+    if len(coordinates) and isinstance(coordinates[0], (int, float)):
+        return 1
+    return sum(count_points(part) for part in coordinates)
+
+
+def geometry_vertices(geometry: dict) -> int:
+    if geometry["type"] == "GeometryCollection":
+        return sum(geometry_vertices(part) for part in geometry["geometries"])
+    return count_points(geometry["coordinates"])
+
+
+def json_features(panels: List[dict]) -> Dict[str, int]:
+    features = {"shapes": 0, "vertices": 0, "patterned_shapes": 0}
+    for panel in panels:
+        for shape in panel["shapes"]:
+            features["shapes"] += 1
+            if "base_geometry" in shape:
+                features["vertices"] += geometry_vertices(shape["base_geometry"])
+            pattern = shape.get("pattern")
+            if pattern is not None and pattern != "blank":
+                features["patterned_shapes"] += 1
+                features[f"pattern:{pattern}"] = features.get(f"pattern:{pattern}", 0) + 1
+    return features
+
+
+def tex_features(text: str) -> Dict[str, int]:
+    features = {key: len(pattern.findall(text)) for key, pattern in TEX_CONSTRUCTS.items()}
+    features["tex_kilobytes"] = len(text.encode("utf-8")) // 1024
+    return features
+
+
+def image_record(image: str, seconds: float, log_text: str, tex_path: str, json_path: str) -> dict:
+    with open(tex_path, "r", encoding="utf-8") as f:
+        features = tex_features(f.read())
+    if os.path.exists(json_path):
+        with open(json_path, "r", encoding="utf-8") as f:
+            features.update(json_features(json.load(f)))
+    return {"image": image, "seconds": seconds, "log": parse_log(log_text), "features": features}
+
+
+class RecordJournal:
+    """json lines of compile records, shared by the compile workers"""
+
+    def __init__(self, path: str = RECORDS_PATH) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+
+    def append(self, record: dict):
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+
+
+def load_records(path: str = RECORDS_PATH) -> List[dict]:
+    records = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:  # partially written line of an interrupted run
+                    continue
+                records[record["image"]] = record
+    return list(records.values())
+
+
+def fit(records: List[dict], target: List[float]) -> List[dict]:
+    """least-squares cost per unit of every feature, with an intercept, largest share of the mean first"""
+    names = sorted({name for record in records for name in record["features"]})
+    features = np.array([[record["features"].get(name, 0) for name in names] for record in records], dtype=float)
+    target = np.array(target, dtype=float)
+    design = np.column_stack([features, np.ones(len(records))])
+    coefficients = np.linalg.lstsq(design, target, rcond=None)[0]
+    mean_target = target.mean() if len(target) else 0.0
+
+    rows = [{"feature": "(fixed)", "per_unit": float(coefficients[-1]), "mean": 1.0, "correlation": None}]
+    for i, name in enumerate(names):
+        column = features[:, i]
+        varies = column.std() > 0 and target.std() > 0
+        rows.append(
+            {
+                "feature": name,
+                "per_unit": float(coefficients[i]),
+                "mean": float(column.mean()),
+                "correlation": float(np.corrcoef(column, target)[0, 1]) if varies else None,
+            }
+        )
+    for row in rows:
+        row["share"] = row["per_unit"] * row["mean"] / mean_target if mean_target else 0.0
+    return sorted(rows, key=lambda row: -abs(row["share"]))
+
+
+def report(records: List[dict]) -> dict:
+    """compile seconds and TeX main memory explained by the image features"""
+    summary = {"images": len(records)}
+    if not records:
+        return summary
+    seconds = [record["seconds"] for record in records]
+    summary["seconds"] = {"mean": float(np.mean(seconds)), "max": float(np.max(seconds))}
+    summary["seconds_fit"] = fit(records, seconds)
+    with_memory = [record for record in records if record["log"].get("tex_memory_words") is not None]
+    if with_memory:
+        summary["tex_memory_words_fit"] = fit(with_memory, [record["log"]["tex_memory_words"] for record in with_memory])
+    summary["slowest"] = [
+        {"image": record["image"], "seconds": record["seconds"], "pages": record["log"]["pages"]}
+        for record in sorted(records, key=lambda record: -record["seconds"])[:10]
+    ]
+    return summary
+
+
+def format_report(summary: dict, limit: int = 12) -> str:
+    if not summary["images"]:
+        return "[compile] no compile records"
+    lines = [
+        f"[compile] {summary['images']} images, {summary['seconds']['mean']:.2f}s mean / {summary['seconds']['max']:.2f}s max per .tex",
+        f"  {'feature':<32}{'s per unit':>12}{'mean':>9}{'share':>8}{'corr':>7}",
+    ]
+    if summary["images"] <= len(summary["seconds_fit"]):
+        lines.insert(1, "  (fewer images than features, the fit is underdetermined)")
+    for row in summary["seconds_fit"][:limit]:
+        correlation = "--" if row["correlation"] is None else f"{row['correlation']:.2f}"
+        lines.append(f"  {row['feature']:<32}{row['per_unit']:>12.4f}{row['mean']:>9.1f}{row['share']:>8.0%}{correlation:>7}")
+    return "\n".join(lines)
+
+
+def write_report(records_path: str = RECORDS_PATH, report_path: str = REPORT_PATH) -> dict:
+    summary = report(load_records(records_path))
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=4)
+    return summary
+
+
+if __name__ == "__main__":
+    records_path = sys.argv[1] if len(sys.argv) >= 2 else RECORDS_PATH
+    print(format_report(write_report(records_path)))
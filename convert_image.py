@@ -1,14 +1,56 @@
-import sys
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, List
 
 from pdf2image import convert_from_path
 
-# PDF 文件路径
-pdf_path = sys.argv[1]
+import trace_events
 
-# 将 PDF 转换为图片
-# dpi 参数控制图片的分辨率
-images = convert_from_path(pdf_path, dpi=1000)
+DEFAULT_WIDTH = 2000
+OUTPUT_DIR = "output_png"
 
-# 保存每一页为图片
-for j, image in enumerate(images):
-    image.save(f'output_png/{pdf_path.split("/")[-1].split(".")[0]}.png', 'PNG')
\ No newline at end of file
+
+def convert_pdf(pdf_path: str, width: int = DEFAULT_WIDTH, output_dir: str = OUTPUT_DIR) -> str:
+    """render the first page of the pdf straight to <output_dir>/<pdf name>.png, `width` pixels wide
+
+    poppler writes the png itself (paths_only), so the page is never held in memory as a PIL image
+    """
+    name = Path(pdf_path).stem
+    with trace_events.span("pdftoppm", "subprocess", image=name):
+        paths = convert_from_path(
+            pdf_path,
+            size=(width, None),  # keep aspect ratio
+            output_folder=output_dir,
+            output_file=name,
+            fmt="png",
+            single_file=True,
+            paths_only=True,
+        )
+    return paths[0]
+
+
+def convert_pdfs(
+    pdf_paths: Iterable[str],
+    width: int = DEFAULT_WIDTH,
+    output_dir: str = OUTPUT_DIR,
+    jobs: int = None,
+) -> List[str]:
+    """convert many pdfs on a bounded thread pool. each conversion runs in its own pdftoppm process"""
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = jobs if jobs is not None else os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(lambda path: convert_pdf(path, width, output_dir), pdf_paths))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="convert pdf files to png images")
+    parser.add_argument("pdf_paths", nargs="+", help="pdf files to convert")
+    parser.add_argument("--width", type=int, default=DEFAULT_WIDTH, help="width of the png images in pixels")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--jobs", type=int, default=None, help="number of concurrent conversions (default: cpu count)")
+    args = parser.parse_args()
+
+    for png_path in convert_pdfs(args.pdf_paths, args.width, args.output_dir, args.jobs):
+        print(f"saved {png_path}")
@@ -13,7 +13,6 @@ class ClosedShape(VisibleShape):
 
     def __init__(
         self,
-        tikz_converter,
         pattern: Optional[img_params.Pattern] = None,
         outline=None,
         outline_lightness=None,
@@ -24,7 +23,7 @@ class ClosedShape(VisibleShape):
         color: Optional[img_params.Color] = None,
         lightness: Optional[img_params.Lightness] = None,
     ) -> None:
-        super().__init__(tikz_converter, color=color, lightness=lightness)
+        super().__init__(color=color, lightness=lightness)
         self.pattern = (
             pattern if pattern is not None else util.choose_item_by_distribution(img_params.Pattern,GenerationConfig.pattern_distribution)
         )
@@ -6,6 +6,7 @@ from shapely.affinity import scale
 from shapely.geometry.base import BaseMultipartGeometry
 
 import img_params
+import polyomino
 from entities.closed_shape import ClosedShape
 from entities.entity import Relationship
 from generation_config import GenerationConfig
@@ -31,6 +32,8 @@ class ComplexShape(ClosedShape, Relationship):
         "base_geometry",
     ] + dataset_annotation_categories
 
+    tikz_converter = ComplexShapeConverter()
+
     def __init__(
         self,
         color: Optional[img_params.Color] = None,
@@ -45,7 +48,6 @@ class ComplexShape(ClosedShape, Relationship):
         geometry: shapely.geometry.base.BaseGeometry = None,
     ) -> None:
         super().__init__(
-            tikz_converter=ComplexShapeConverter(),
             color=color,
             lightness=lightness,
             outline=outline,
@@ -73,7 +75,13 @@ class ComplexShape(ClosedShape, Relationship):
             or isinstance(geom2, shapely.MultiLineString)
         ):
             return []
-        overlaping_base_geometry = geom1.intersection(geom2)
+        return ComplexShape.from_intersection(geom1.intersection(geom2))
+
+    @staticmethod
+    def from_intersection(
+        overlaping_base_geometry: shapely.geometry.base.BaseGeometry,
+    ) -> List["ComplexShape"]:
+        """one intersection region per polygon of an already computed intersection"""
         if isinstance(overlaping_base_geometry, BaseMultipartGeometry):
             overlapping_geoms = list(overlaping_base_geometry.geoms)
         else:
@@ -128,141 +136,11 @@ class ComplexShape(ClosedShape, Relationship):
 
     @staticmethod
     def arbitrary_polygon():
-        def generate_orthogonal_polygon_by_cells(start_pos=None, selection_order="random"):
-        
-            def generate_polyomino(n_cells, start_pos=(0,0), selection_order="random"):
-                """
-                Generate a polyomino with n_cells cells using deterministic cell selection.
-                Each cell is represented by its bottom-left coordinate (x, y).
-                """
-                polyomino = set()
-                polyomino.add(start_pos)
-                
-                # frontier: cells adjacent to current polyomino but not yet added
-                frontier = set()
-                def add_neighbors(cell):
-                    x, y = cell
-                    neighbors = []
-                    for dx, dy in [(1,0),(-1,0),(0,1),(0,-1)]:
-                        nbr = (x+dx, y+dy)
-                        if nbr not in polyomino:
-                            neighbors.append(nbr)
-                    if selection_order == "sequential":
-                        # Sort neighbors for deterministic selection
-                        neighbors.sort(key=lambda p: (p[1], p[0]))
-                    for nbr in neighbors:
-                        frontier.add(nbr)
-                
-                add_neighbors(start_pos)
-                
-                while len(polyomino) < n_cells and frontier:
-                    if selection_order == "sequential":
-                        # Choose the leftmost-bottommost cell
-                        cell = min(frontier, key=lambda p: (p[1], p[0]))
-                    else:
-                        cell = random.choice(list(frontier))
-                    polyomino.add(cell)
-                    frontier.remove(cell)
-                    add_neighbors(cell)
-                
-                return polyomino
-
-            def get_boundary_edges(polyomino):
-                """
-                给定多胞形（格子集合），返回边界上的所有边段。
-                每个边段表示为 ((x1, y1), (x2, y2))。
-                """
-                edges = []
-                for (x, y) in polyomino:
-                    # 对于每个单元格，检查4个方向的边
-                    # 底边：如果 (x, y-1) 不在 polyomino，则底边是外边界
-                    if (x, y-1) not in polyomino:
-                        edges.append(((x, y), (x+1, y)))
-                    # 右边：检查 (x+1, y)
-                    if (x+1, y) not in polyomino:
-                        edges.append(((x+1, y), (x+1, y+1)))
-                    # 顶边：检查 (x, y+1)
-                    if (x, y+1) not in polyomino:
-                        edges.append(((x+1, y+1), (x, y+1)))
-                    # 左边：检查 (x-1, y)
-                    if (x-1, y) not in polyomino:
-                        edges.append(((x, y+1), (x, y)))
-                
-                return edges
-
-            def chain_edges_to_polygon(edges):
-                """
-                将一组边段链化成一个闭合多边形的顶点序列。
-                假设边段构成一条单闭合曲线，每个顶点度为2。
-                """
-                # 构造：从一个顶点到与之相连的边段列表
-                conn = {}
-                for seg in edges:
-                    a, b = seg
-                    for v1, v2 in [(a, b), (b, a)]:
-                        conn.setdefault(v1, []).append(v2)
-                
-                # 任选一个起始顶点（例如最左下角的点）
-                start = min(conn.keys(), key=lambda v: (v[1], v[0]))  # 按 y 然后 x 排序
-                polygon = [start]
-                current = start
-                prev = None
-                max_try = 1000
-                cnt=0
-                while True:
-                    nbrs = conn[current]
-                    # 由于度为2（起始点除外），选择一个不是上一步的顶点即可
-                    if prev is None:
-                        next_v = nbrs[0]
-                    else:
-                        if nbrs[0] == prev:
-                            next_v = nbrs[1]
-                        else:
-                            next_v = nbrs[0]
-                    if next_v == start:
-                        break
-                    polygon.append(next_v)
-                    prev, current = current, next_v
-                    cnt+=1
-                    if cnt>max_try:
-                        raise TimeoutError()
-
-                return polygon
-
-            def merge_collinear(polygon):
-                """
-                对顶点序列做合并：如果连续三个点共线，则去除中间点。
-                """
-                if len(polygon) < 3:
-                    return polygon
-                merged = []
-                n = len(polygon)
-                for i in range(n):
-                    p_prev = polygon[i - 1]
-                    p_curr = polygon[i]
-                    p_next = polygon[(i + 1) % n]
-                    # 由于边都是水平或垂直，判断共线可以直接判断坐标相同
-                    if p_prev[0] == p_curr[0] == p_next[0] or p_prev[1] == p_curr[1] == p_next[1]:
-                        # p_curr 在一条直线上，可省略
-                        continue
-                    else:
-                        merged.append(p_curr)
-                return merged
-            flag=True
-            while flag:
-                try:
-                    polyomino = generate_polyomino(GenerationConfig.arbitrary_shape_cell_num)
-                    edges = get_boundary_edges(polyomino)
-                    polygon = chain_edges_to_polygon(edges)
-                    vertices = merge_collinear(polygon)
-                    flag = False
-                except TimeoutError:
-                    continue
-            return vertices
-           
-
-        vertices = generate_orthogonal_polygon_by_cells()
-                        
+        """an orthogonal polygon outlining a random polyomino of `arbitrary_shape_cell_num` cells"""
+        vertices = polyomino.sample_outline(
+            GenerationConfig.arbitrary_shape_cell_num,
+            library_size=getattr(GenerationConfig, "arbitrary_shape_library_size", 0) or 0,
+        )
         return ComplexShape(geometry=shapely.Polygon(vertices))
 
     @property
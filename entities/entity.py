@@ -12,6 +12,7 @@ from shapely.geometry.base import BaseGeometry
 
 import img_params
 import uid_service
+import util
 
 
 class Entity(ABC):
@@ -31,7 +32,7 @@ class Entity(ABC):
                 elif isinstance(value, Enum):
                     value = value.name
                 elif isinstance(value, BaseGeometry):
-                    value = shapely.geometry.mapping(value)
+                    value = shapely.geometry.mapping(shapely.transform(value, util.quantize_coords))
                 elif isinstance(value,Entity): # when attribute is SimpleShape instance, only record down the id
                     value = value.uid
                 dict[key] = value
@@ -3,6 +3,7 @@ import random
 from typing import Optional, Union
 
 import numpy as np
+import shapely
 from shapely import LineString, Point, Polygon
 from shapely.geometry.base import BaseGeometry
 
@@ -13,7 +14,8 @@ from common_types import *
 from entities.visible_shape import OpenShape, VisibleShape
 from tikz_converters import LineSegmentConverter
 from util import (almost_equal, generate_random_points_around_point,
-                  get_line_rotation, get_point_distance, get_rand_point)
+                  get_line_rotation, get_point_distance, get_rand_point,
+                  rotate_points)
 
 
 class LineSegment(OpenShape):
@@ -29,6 +31,8 @@ class LineSegment(OpenShape):
         "base_geometry",
     ] + dataset_annotation_categories
 
+    tikz_converter = LineSegmentConverter()
+
     endpt_comp_key_lr = lambda p: (p[0], -p[1])
     endpt_comp_key_ud = lambda p: (p[1], -p[0])
 
@@ -38,17 +42,17 @@ class LineSegment(OpenShape):
         pt2: Optional[Union[np.ndarray, tuple, list]] = None,
         color = None
     ) -> None:
-        super().__init__(tikz_converter=LineSegmentConverter(),color=color)
+        super().__init__(color=color)
         self.shape = img_params.Shape.linesegment
         if pt1 is None and pt2 is None:
             # if neither points is specified, choose both points randomly
-            self._base_geometry = LineString([get_rand_point() for _ in range(2)])
+            self.endpoints = [get_rand_point() for _ in range(2)]
         elif pt1 is None:
-            self._base_geometry = LineString([pt2, get_rand_point()])
+            self.endpoints = [pt2, get_rand_point()]
         elif pt2 is None:
-            self._base_geometry = LineString([pt1, get_rand_point()])
+            self.endpoints = [pt1, get_rand_point()]
         else:
-            self._base_geometry = LineString([pt1, pt2])
+            self.endpoints = [pt1, pt2]
 
         self.line_pattern = util.choose_item_by_distribution(
             img_params.Outline, generation_config.GenerationConfig.outline_distribution
@@ -62,6 +66,44 @@ class LineSegment(OpenShape):
         else:
             return self._base_geometry
 
+    # the segment is stored as its two endpoints. the LineString and the sorted endpoints are derived
+    # lazily and cached until the endpoints change
+
+    @property
+    def endpoints(self) -> np.ndarray:
+        return self._endpoints
+
+    @endpoints.setter
+    def endpoints(self, endpoints):
+        self._endpoints = np.array(endpoints, dtype=float).reshape(2, 2)
+        self._geometry = None
+        self._sorted_endpoints = None
+
+    @property
+    def _base_geometry(self):
+        if self._geometry is None:
+            self._geometry = LineString(self._endpoints)
+        return self._geometry
+
+    @_base_geometry.setter
+    def _base_geometry(self, geometry):
+        if geometry is not None:
+            self.endpoints = shapely.get_coordinates(geometry)
+
+    def sorted_endpoints(self) -> tuple:
+        """(left, right, up, down) endpoints"""
+        if self._sorted_endpoints is None:
+            pt1, pt2 = self._endpoints
+            pt1.flags.writeable = False
+            pt2.flags.writeable = False
+            self._sorted_endpoints = (
+                min(pt1, pt2, key=LineSegment.endpt_comp_key_lr),
+                max(pt1, pt2, key=LineSegment.endpt_comp_key_lr),
+                max(pt1, pt2, key=LineSegment.endpt_comp_key_ud),
+                min(pt1, pt2, key=LineSegment.endpt_comp_key_ud),
+            )
+        return self._sorted_endpoints
+
     @staticmethod
     def within_distance(point: Coordinate, distance: float):
         pt1, pt2 = generate_random_points_around_point(center=point, distance=distance)
@@ -72,36 +114,23 @@ class LineSegment(OpenShape):
 
     @property
     def endpt_left(self) -> np.ndarray:
-        endpt_coords = self._base_geometry.coords
-        assert len(endpt_coords) == 2
-        pt1, pt2 = np.array(endpt_coords)
-        return min(pt1, pt2, key=LineSegment.endpt_comp_key_lr)
+        return self.sorted_endpoints()[0]
 
     @property
     def endpt_right(self) -> np.ndarray:
-        endpt_coords = self._base_geometry.coords
-        assert len(endpt_coords) == 2
-        pt1, pt2 = endpt_coords
-        return max(pt1, pt2, key=LineSegment.endpt_comp_key_lr)
+        return self.sorted_endpoints()[1]
 
     @property
     def endpt_up(self) -> np.ndarray:
-        endpt_coords = self._base_geometry.coords
-        assert len(endpt_coords) == 2
-        pt1, pt2 = endpt_coords
-        return max(pt1, pt2, key=LineSegment.endpt_comp_key_ud)
+        return self.sorted_endpoints()[2]
 
     @property
     def endpt_down(self) -> np.ndarray:
-        endpt_coords = self._base_geometry.coords
-        assert len(endpt_coords) == 2
-        pt1, pt2 = endpt_coords
-        return min(pt1, pt2, key=LineSegment.endpt_comp_key_ud)
+        return self.sorted_endpoints()[3]
 
     @property
     def center(self) -> np.ndarray:
-        pt1, pt2 = map(np.array, [self.endpt_left, self.endpt_right])
-        return np.array((pt1 + pt2) / 2)
+        return (self.endpt_left + self.endpt_right) / 2
 
     @property
     def midpoint(self):
@@ -124,7 +153,26 @@ class LineSegment(OpenShape):
         return get_line_rotation(self.endpt_left, self.endpt_right)
 
     def set_endpoints(self, pt1: Coordinate, pt2: Coordinate):
-        self._base_geometry = LineString([pt1, pt2])
+        self.endpoints = [pt1, pt2]
+
+    def shift(self, offset: Coordinate):
+        self.endpoints = self._endpoints + np.asarray(offset, dtype=float)
+
+    def resolve_origin(self, origin) -> np.ndarray:
+        if not isinstance(origin, str):
+            return np.array(origin, dtype=float)[:2]
+        if origin in ("center", "centroid"):  # both are the midpoint of a segment
+            return self._endpoints.mean(axis=0)
+        raise ValueError(f"'origin' keyword {origin!r} is not recognized")
+
+    def rotate(self, angle: Union[img_params.Angle, int], origin="center"):
+        if isinstance(angle, img_params.Angle):
+            angle = angle.value
+        self.endpoints = rotate_points(self._endpoints, self.resolve_origin(origin), angle)
+
+    def scale(self, ratio, origin="center"):
+        origin = self.resolve_origin(origin)
+        self.endpoints = origin + ratio * (self._endpoints - origin)
 
     def find_fraction_point(self, fraction: float):
         return self.endpt_left + (self.endpt_right - self.endpt_left) * fraction
@@ -154,9 +202,7 @@ class LineSegment(OpenShape):
         pivot = np.array(pivot)
         offset1 = self.endpt_left - pivot
         offset2 = self.endpt_right - pivot
-        self._base_geometry = LineString(
-            [pivot + offset1 * ratio, pivot + offset2 * ratio]
-        )
+        self.endpoints = [pivot + offset1 * ratio, pivot + offset2 * ratio]
 
     def expand(self, ratio):
         self.scale(ratio=ratio)
@@ -164,30 +210,28 @@ class LineSegment(OpenShape):
     @staticmethod
     def connect(object1: BaseGeometry, object2: BaseGeometry) -> "LineSegment":
         def choose_endpoint_around_shape(shape: Polygon, ref_point: Coordinate):
-            def sample_geometry_boundary(geometry, num_points=30) -> Coordinate:
+            def sample_geometry_boundary(geometry, num_points=30) -> np.ndarray:
                 if isinstance(geometry, Polygon):
                     # 获取多边形的外环
                     exterior_coords = geometry.exterior.coords
                     if len(exterior_coords) >= num_points:  # most likely a circle
-                        return exterior_coords
+                        return np.array(exterior_coords)
                     geometry = LineString(exterior_coords)
 
                 # 根据周长进行等距采样
-                sampled_points = []
-                for i in np.linspace(0, geometry.length, num_points):
-                    sampled_points.append(geometry.interpolate(i).coords[0])
-                return sampled_points
+                return shapely.get_coordinates(
+                    shapely.line_interpolate_point(geometry, np.linspace(0, geometry.length, num_points))
+                )
 
             assert not isinstance(shape, LineString)
             # pick a point on the expanded shape, which faces the next endpoint
-            bound_points: list = sample_geometry_boundary(shape)
-            filtered_bound_points = list(
-                filter(
-                    lambda point: not LineString([point, ref_point]).intersects(shape)
-                    or LineString([point, ref_point]).touches(shape),
-                    bound_points,
-                )
+            bound_points = sample_geometry_boundary(shape)
+            # segments from every candidate to the reference point, tested against the shape in one call
+            segments = shapely.linestrings(
+                np.stack([bound_points, np.broadcast_to(ref_point, bound_points.shape)], axis=1)
             )
+            visible = ~shapely.intersects(segments, shape) | shapely.touches(segments, shape)
+            filtered_bound_points = [tuple(point) for point in bound_points[visible].tolist()]
             if (
                 len(filtered_bound_points) == 0
             ):  # don't know why no point passed the filter. if so, simply choose the point directly facing the next endpoint
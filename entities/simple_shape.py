@@ -1,8 +1,9 @@
 import math
 import random
-from typing import Optional
+from typing import List, Optional
 
 import numpy as np
+from shapely.affinity import rotate
 from shapely.geometry import Point, Polygon
 
 import common_types
@@ -11,6 +12,7 @@ from entities.closed_shape import ClosedShape
 from entities.visible_shape import VisibleShape
 from img_params import *
 from tikz_converters import SimpleShapeConverter
+from util import rotate_points
 
 
 class SimpleShape(ClosedShape):
@@ -38,6 +40,8 @@ class SimpleShape(ClosedShape):
 
     touching_tolerance = 1e-11
 
+    tikz_converter = SimpleShapeConverter()
+
     def __init__(
         self,
         position: np.ndarray,
@@ -56,7 +60,6 @@ class SimpleShape(ClosedShape):
         excluded_shapes_set: set = {},
     ) -> None:
         super().__init__(
-            tikz_converter=SimpleShapeConverter(),
             color=color,
             lightness=lightness,
             pattern=pattern,
@@ -89,41 +92,96 @@ class SimpleShape(ClosedShape):
         )
    
         self.is_expanded = False
-        self.compute_base_geometry()
 
-    def compute_base_geometry(self):
-        rot_rad = math.radians(self.rotation.value)
-        rot_sin = math.sin(rot_rad)
-        rot_cos = math.cos(rot_rad)
-        rot_polar = np.array((rot_cos, rot_sin))
-        rot_cart = self.size * rot_polar
+    # the shape is stored as position, size and the exact orientation `angle` (degrees). the shapely
+    # geometry is only built when a predicate or the serializer asks for it, and transforms only touch
+    # the parameters. `rotation` is the orientation snapped to img_params.Angle, used in annotations
+
+    @property
+    def position(self) -> np.ndarray:
+        return self._position
+
+    @position.setter
+    def position(self, position):
+        self._position = np.array(position, dtype=float)
+        self._geometry = None
+
+    @property
+    def size(self) -> float:
+        return self._size
+
+    @size.setter
+    def size(self, size: float):
+        self._size = size
+        self._geometry = None
+
+    @property
+    def rotation(self) -> img_params.Angle:
+        if self._rotation is None:  # snap lazily after free rotations
+            actual_rotation_angle = get_relative_rotation(self.base_geometry)
+            self._rotation = min(list(img_params.Angle), key=lambda x: abs(actual_rotation_angle - x.value))
+        return self._rotation
+
+    @rotation.setter
+    def rotation(self, rotation: img_params.Angle):
+        self._rotation = rotation
+        self._built_angle = rotation.value  # circles are built unrotated, whatever their rotation
+        self.angle = rotation.value
+
+    @property
+    def angle(self) -> float:
+        return self._angle
 
+    @angle.setter
+    def angle(self, angle: float):
+        self._angle = angle
+        self._geometry = None
+
+    @property
+    def _base_geometry(self):
+        if self._geometry is None:
+            self.compute_base_geometry()
+        return self._geometry
+
+    @_base_geometry.setter
+    def _base_geometry(self, geometry):
+        self._geometry = geometry
+
+    def vertex_angles(self) -> List[float]:
+        if self.shape == Shape.triangle:
+            return [-30, 90, 210]
+        elif self.shape == Shape.square:
+            return [-45, 45, 135, 225]
+        elif self.shape == Shape.pentagon:
+            return [-54 + 72 * x for x in range(5)]
+        elif self.shape == Shape.hexagon:
+            return [60 * x for x in range(6)]
+        raise ValueError(f"illegal shape: {self.shape}")
+
+    def polygon_vertices(self) -> np.ndarray:
+        radians = [math.radians(angle + self.angle) for angle in self.vertex_angles()]
+        return self.position + self.size * np.array([[math.cos(rad), math.sin(rad)] for rad in radians])
+
+    def compute_base_geometry(self):
         # TODO: complete other shapes. remember to add last -- first
         if self.shape == Shape.circle:
-            self._base_geometry = Point(self.position).buffer(self.size)
+            geometry = Point(self.position).buffer(self.size)
+            if (self.angle - self._built_angle) % 360 != 0:  # keep the vertices of a rotated circle where they were
+                geometry = rotate(geometry, self.angle - self._built_angle, origin=tuple(self.position))
+            self._geometry = geometry
         else:
-            if self.shape == Shape.triangle:
-                angle_list = [-30, 90, 210]
-            elif self.shape == Shape.square:
-                angle_list = [-45, 45, 135, 225]
-            elif self.shape == Shape.pentagon:
-                angle_list = [-54 + 72 * x for x in range(5)]
-            elif self.shape == Shape.hexagon:
-                angle_list = [60 * x for x in range(6)]
-            else:
-                raise ValueError(f"illegal shape: {self.shape}")
-
-            vertices = [None] * (len(angle_list))
-            index = 0
-            for angle in angle_list:
-                rot_rad = math.radians(angle + self.rotation.value)
-                rot_sin = math.sin(rot_rad)
-                rot_cos = math.cos(rot_rad)
-                rot_polar = np.array((rot_cos, rot_sin))
-                rot_cart = self.size * rot_polar
-                vertices[index] = self.position + rot_cart
-                index += 1
-            self._base_geometry = Polygon(vertices)
+            self._geometry = Polygon(self.polygon_vertices())
+
+    def resolve_origin(self, origin) -> np.ndarray:
+        """origin keywords of shapely.affinity, resolved from the parameters"""
+        if not isinstance(origin, str):
+            return np.array(origin, dtype=float)[:2]
+        if origin == "centroid" or self.shape == Shape.circle:  # regular polygons are centered on position
+            return self.position
+        if origin == "center":  # bounding box center
+            vertices = self.polygon_vertices()
+            return (vertices.min(axis=0) + vertices.max(axis=0)) / 2
+        raise ValueError(f"'origin' keyword {origin!r} is not recognized")
 
     def get_vertices(self) -> list:
         return self._base_geometry.exterior.coords
@@ -149,14 +207,13 @@ class SimpleShape(ClosedShape):
         return self._base_geometry.overlaps(other._base_geometry)
 
     def set_size(self, new_size: float):
+        self.rotation = self.rotation  # a resized shape is rebuilt with the snapped rotation
         self.size = new_size
-        self.compute_base_geometry()
-        
+
     def scale(self,ratio,origin="center"):
-        super().scale(ratio,origin)
-        self.position = self._base_geometry.centroid.coords[0]
-        new_size = self.size * ratio
-        self.size = new_size
+        origin = self.resolve_origin(origin)
+        self.position = origin + ratio * (self.position - origin)
+        self.size = self.size * ratio
 
     # def search_touching_size(self, other: VisibleShape):
     #     """with a initial size that guarantees to overlap, search the appropriate size that touches the other shape (with tolerance defined in the class), and set the own size to it
@@ -188,9 +245,7 @@ class SimpleShape(ClosedShape):
     #     self.search_touching_size(padded_other)
 
     def shift(self, offset: common_types.Coordinate):
-        offset = np.array(offset)
-        self.position += offset
-        super().shift(offset=offset)
+        self.position = self.position + np.array(offset)
 
     def expand_fixed(self, length):
         cpy = self.copy
@@ -209,38 +264,40 @@ class SimpleShape(ClosedShape):
         return super().overlaps(other)
 
     def rotate(self,angle,origin="center"):
-        super().rotate(angle,origin)
-        # TODO: make better representation of rotation
-        def get_relative_rotation(polygon: Polygon) -> float:
-            """
-            Calculate the relative rotation of a polygon compared to its horizontal placement.
-            
-            :param polygon: A Shapely Polygon object.
-            :return: Rotation angle in degrees, counterclockwise relative to the horizontal axis.
-            """
-            # Get the minimum rotated rectangle
-            rotated_rect = polygon.minimum_rotated_rectangle
-            
-            # Extract the rectangle's coordinates (it will be a closed loop)
-            rect_coords = list(rotated_rect.exterior.coords)[:4]  # Get the 4 corners
-            
-            # Compute the vector along one of the longer sides
-            vec1 = (rect_coords[1][0] - rect_coords[0][0], rect_coords[1][1] - rect_coords[0][1])
-            vec2 = (rect_coords[2][0] - rect_coords[1][0], rect_coords[2][1] - rect_coords[1][1])
-            
-            # Choose the longer vector as the main axis
-            if (vec1[0]**2 + vec1[1]**2) >= (vec2[0]**2 + vec2[1]**2):
-                main_axis = vec1
-            else:
-                main_axis = vec2
-            
-            # Calculate the angle with the horizontal axis
-            angle = math.degrees(math.atan2(main_axis[1], main_axis[0]))
-            
-            # Normalize angle to [0, 180) or [0, 360) as needed
-            angle = angle % 180  # Keep in [0, 180) for bidirectional comparison
-            return angle
-        actual_rotation_angle = get_relative_rotation(self._base_geometry)
-        self.rotation = min(list(img_params.Angle),key=lambda x:abs(actual_rotation_angle - x.value))
-        self.position = self._base_geometry.centroid.coords[0]
-        
\ No newline at end of file
+        if isinstance(angle, img_params.Angle):
+            angle = angle.value
+        self.position = rotate_points([self.position], self.resolve_origin(origin), angle)[0]
+        self.angle = self.angle + angle
+        self._rotation = None
+
+
+# TODO: make better representation of rotation
+def get_relative_rotation(polygon: Polygon) -> float:
+    """
+    Calculate the relative rotation of a polygon compared to its horizontal placement.
+    
+    :param polygon: A Shapely Polygon object.
+    :return: Rotation angle in degrees, counterclockwise relative to the horizontal axis.
+    """
+    # Get the minimum rotated rectangle
+    rotated_rect = polygon.minimum_rotated_rectangle
+    
+    # Extract the rectangle's coordinates (it will be a closed loop)
+    rect_coords = list(rotated_rect.exterior.coords)[:4]  # Get the 4 corners
+    
+    # Compute the vector along one of the longer sides
+    vec1 = (rect_coords[1][0] - rect_coords[0][0], rect_coords[1][1] - rect_coords[0][1])
+    vec2 = (rect_coords[2][0] - rect_coords[1][0], rect_coords[2][1] - rect_coords[1][1])
+    
+    # Choose the longer vector as the main axis
+    if (vec1[0]**2 + vec1[1]**2) >= (vec2[0]**2 + vec2[1]**2):
+        main_axis = vec1
+    else:
+        main_axis = vec2
+    
+    # Calculate the angle with the horizontal axis
+    angle = math.degrees(math.atan2(main_axis[1], main_axis[0]))
+    
+    # Normalize angle to [0, 180) or [0, 360) as needed
+    angle = angle % 180  # Keep in [0, 180) for bidirectional comparison
+    return angle
@@ -1,5 +1,116 @@
-from entities.entity import OpenShape
+import math
+from typing import Literal, Optional
+
+import numpy as np
+from shapely import LineString, MultiPoint
+from shapely.affinity import rotate, scale, translate
+
+import common_types
+import generation_config
+import img_params
+import util
+from entities.visible_shape import OpenShape
+from tikz_converters import SmoothCurveConverter
 
 
 class SmoothCurve(OpenShape):
-    pass
\ No newline at end of file
+    """
+    An open curve drawn as a single path, e.g. the curve that a chain of shapes follows.
+
+    The curve is kept as its defining points, which are transformed together with the sampled polyline:
+    - "polyline": the vertices
+    - "bezier": the 4 control points of a cubic Bezier curve
+    - "circle": the center and the point where the circle starts
+    """
+
+    dataset_annotation_categories = [
+        "position",
+        "shape",
+        "color",
+        "lightness",
+    ]  # attributes that can be directly interpreted as categories in dataset annotations
+
+    serialized_fields = [
+        "uid",
+        "base_geometry",
+    ] + dataset_annotation_categories
+
+    tikz_converter = SmoothCurveConverter()
+
+    def __init__(
+        self,
+        kind: Literal["polyline", "bezier", "circle"],
+        control_points,
+        color: Optional[img_params.Color] = None,
+        num_points: int = 100,
+    ) -> None:
+        super().__init__(color=color)
+        self.kind = kind
+        self.control_points = np.array(control_points, dtype=float)
+        self.shape = img_params.Shape.linesegment if kind == "polyline" else img_params.Type.ARC
+        self.line_pattern = util.choose_item_by_distribution(
+            img_params.Outline, generation_config.GenerationConfig.outline_distribution
+        )
+        self._base_geometry = LineString(self.sample_points(num_points))
+
+    def sample_points(self, num_points: int) -> np.ndarray:
+        if self.kind == "bezier":
+            return util.generate_equidistant_bezier_curve(*self.control_points, num_points=num_points)
+        if self.kind == "circle":
+            center, start = self.control_points
+            start_angle = math.atan2(*(start - center)[::-1])
+            angles = start_angle + np.linspace(0, 2 * np.pi, num_points)
+            return center + self.radius * np.column_stack([np.cos(angles), np.sin(angles)])
+        return self.control_points
+
+    @property
+    def radius(self) -> float:
+        """radius of a circle curve"""
+        return util.get_point_distance(self.control_points[0], self.control_points[1])
+
+    @property
+    def center(self) -> np.ndarray:
+        return np.array(self._base_geometry.coords).mean(axis=0)
+
+    @property
+    def position(self):
+        return self.center
+
+    def resolve_origin(self, origin):
+        """the origin as a point, so the polyline and the control points are transformed around the same point"""
+        if not isinstance(origin, str):
+            return tuple(origin)
+        if origin == "center":
+            min_x, min_y, max_x, max_y = self._base_geometry.bounds
+            return ((min_x + max_x) / 2, (min_y + max_y) / 2)
+        if origin == "centroid":
+            return self._base_geometry.centroid.coords[0]
+        raise ValueError(f"unknown origin {origin}")
+
+    def transform(self, func):
+        self._base_geometry = func(self._base_geometry)
+        self.control_points = np.array([point.coords[0] for point in func(MultiPoint(self.control_points)).geoms])
+
+    def shift(self, offset: common_types.Coordinate):
+        self.transform(lambda geometry: translate(geometry, xoff=offset[0], yoff=offset[1]))
+
+    def rotate(self, angle, origin="center"):
+        if isinstance(angle, img_params.Angle):
+            angle = angle.value
+        origin = self.resolve_origin(origin)
+        self.transform(lambda geometry: rotate(geometry, angle, origin))
+
+    def scale(self, ratio, origin="center"):
+        origin = self.resolve_origin(origin)
+        self.transform(lambda geometry: scale(geometry, xfact=ratio, yfact=ratio, origin=origin))
+
+    def expand(self, ratio):
+        self.scale(ratio)
+
+    def expand_fixed(self, length):
+        """grow the curve's extent by `length` on each side"""
+        min_x, min_y, max_x, max_y = self._base_geometry.bounds
+        extent = max(max_x - min_x, max_y - min_y)
+        if extent > 0:
+            self.scale(1 + 2 * length / extent)
+        return self
@@ -15,14 +15,11 @@ class VisibleShape(Entity, ABC):
 
     def __init__(
         self,
-        tikz_converter,
         color: Optional[img_params.Color] = None,
         lightness: Optional[img_params.Lightness] = None,
     ) -> None:
         super().__init__()
         self._base_geometry: BaseGeometry = None
-        assert tikz_converter is not None
-        self.tikz_converter = tikz_converter
         self.color = (
             color
             if color is not None
@@ -2,6 +2,7 @@ import json
 import math
 import random
 import sys
+from functools import lru_cache
 from pathlib import Path
 from typing import List, Literal
 
@@ -10,7 +11,12 @@ import numpy as np
 import shapely
 from jinja2 import Environment, FileSystemLoader
 
+import geometry_counters
 import img_params
+import memory_profile
+import profiling
+import telemetry
+import trace_events
 from entities.line_segment import LineSegment
 from entities.simple_shape import SimpleShape
 from entities.touching_point import TouchingPoint
@@ -24,6 +30,7 @@ from image_generators import (BorderImageGenerator,
                                      generate_shape_group, get_image_generator)
 from input_configs import BaseConfig
 from panel import Panel
+from raster_renderer import render_panels
 from shape_group import ShapeGroup
 from tikz_converters import *
 from util import *
@@ -37,16 +44,18 @@ def generate_panels(base_config:BaseConfig) -> list[Panel]:
     panel_num = row_num * col_num
     
     panels = []
-    # for each panel, draw simple shapes
-    for i in range(panel_num):
-        reconfigure_for_panel(i)
-        print(f"Generating panel {i+1}/{panel_num}")
+    with telemetry.stage("generate_panels"):
+        # for each panel, draw simple shapes
+        for i in range(panel_num):
+            reconfigure_for_panel(i)
+            print(f"Generating panel {i+1}/{panel_num}")
 
-        center, top_left, bottom_right = compute_panel_position(layout, i)
-        elements = generate_shape_group()
-        
-        panel = elements.to_panel(top_left=top_left,bottom_right=bottom_right)
-        panels.append(panel)
+            center, top_left, bottom_right = compute_panel_position(layout, i)
+            with telemetry.stage("generate_shape_group"):
+                elements = generate_shape_group()
+            
+            panel = elements.to_panel(top_left=top_left,bottom_right=bottom_right)
+            panels.append(panel)
     
     return panels
  
@@ -111,30 +120,62 @@ def generate_consecutive_line_segments(position, num_lines:int = 8, mode:Literal
     return output_line_segments
 
 
-def main(n):
+@lru_cache(maxsize=None)
+def tikz_template():
+    """the compiled template, loaded once per process"""
     env = Environment(loader=FileSystemLoader("."))
-    template = env.get_template("tikz_template.jinja")
-    base_config = initialize_config()
+    return env.get_template("tikz_template.jinja")
+
+
+def main(n) -> dict:
+    """generate the n-th image and return its stage timings"""
+    prefix = generation_config.GenerationConfig.generated_file_prefix
+    config_path = generation_config.GenerationConfig.config_path
+    stats = telemetry.start_image(f"{prefix}{n}", config=config_path)
+    with telemetry.stage("config"):
+        base_config = initialize_config(config_path)
+    seed = image_seed(base_config, n)
+    if seed is not None:
+        random.seed(seed)
+        np.random.seed(seed)
     panels = generate_panels(base_config)
-    tikz_instructions = convert_panels(panels)
-    # tikz_instructions = [line.to_tikz() for line in generate_consecutive_line_segments(position=(0,0))]
-    context = {
-        "tikz_instructions": tikz_instructions,
-        "canvas_width": generation_config.GenerationConfig.canvas_width,
-        "canvas_height": generation_config.GenerationConfig.canvas_height,
-    }
-    output = template.render(context)
-
-    latex_filename = (
-        f"{generation_config.GenerationConfig.generated_file_prefix}{n}.tex"
-    )
-    with open(f"./output_tex/{latex_filename}", "w", encoding="utf-8") as f:
-        f.write(output)
+    write_outputs(panels, n)
+    telemetry.finish_image()
+    stats.write(f"./output_json/{prefix}{n}.stats.json")
+    return stats.to_dict()
+
+
+def write_outputs(panels: List[Panel], n, tex_dir="./output_tex", json_dir="./output_json", png_dir="./output_png"):
+    """write the tex (or png) file and the json annotations of the n-th image"""
+    if generation_config.GenerationConfig.render_backend == "raster":
+        png_filename = (
+            f"{generation_config.GenerationConfig.generated_file_prefix}{n}.png"
+        )
+        with telemetry.stage("raster"):
+            render_panels(panels, f"{png_dir}/{png_filename}")
+    else:
+        # tikz_instructions = [line.to_tikz() for line in generate_consecutive_line_segments(position=(0,0))]
+        # option lists shared by several shapes become named styles in the preamble
+        with telemetry.stage("tikz_convert"):
+            styles = collect_styles(panels)
+        context = {
+            "tikz_styles": styles.definitions(),
+            "tikz_instructions": telemetry.timed_iter("tikz_convert", iter_instructions(panels, styles)),
+            "canvas_width": generation_config.GenerationConfig.canvas_width,
+            "canvas_height": generation_config.GenerationConfig.canvas_height,
+        }
+
+        latex_filename = (
+            f"{generation_config.GenerationConfig.generated_file_prefix}{n}.tex"
+        )
+        with telemetry.stage("write_tex"), open(f"{tex_dir}/{latex_filename}", "w", encoding="utf-8") as f:
+            # instructions are converted and written one by one, the document is never held in memory
+            tikz_template().stream(context).dump(f)
 
     json_filename = (
         f"{generation_config.GenerationConfig.generated_file_prefix}{n}.json"
     )
-    with open(f"./output_json/{json_filename}", "w", encoding="utf-8") as f:
+    with telemetry.stage("write_json"), open(f"{json_dir}/{json_filename}", "w", encoding="utf-8") as f:
         # json.dump([item.to_dict() for item in panels],f,indent=4)
         json.dump(
             [panel.__dict__ for panel in panels],
@@ -143,18 +184,23 @@ def main(n):
             default=lambda x: x.to_dict(),
         )
 
-def initialize_config()->BaseConfig:
-    base_path = Path("input/base.json").resolve()
+def resolve_config_json(base_path="input/base.json", basic_attributes_path="input/basic_attributes_distribution.json") -> str:
+    """load the input config, resolve its $refs and merge the global attribute distributions"""
+    base_path = Path(base_path).resolve()
 
     # 加载主文件并解析引用
     with open(base_path, "r", encoding="utf-8") as f:
         data = json.load(f)
 
     resolved = jsonref.JsonRef.replace_refs(data,base_uri=base_path.as_uri())
-    global_basic_attributes_distribution = json.load(open("input/basic_attributes_distribution.json","r",encoding="utf-8"))
+    global_basic_attributes_distribution = json.load(open(basic_attributes_path,"r",encoding="utf-8"))
     resolved = resolved | global_basic_attributes_distribution
 
-    resolved_json_str = json.dumps(resolved,indent=4)
+    return json.dumps(resolved,indent=4)
+
+
+def initialize_config(base_path="input/base.json", basic_attributes_path="input/basic_attributes_distribution.json")->BaseConfig:
+    resolved_json_str = resolve_config_json(base_path, basic_attributes_path)
     
     # 输出resolved_config到新文件
     resolved_config_filename = "resolved_config.json"
@@ -162,17 +208,63 @@ def initialize_config()->BaseConfig:
         f.write(resolved_json_str)
     print(f"Resolved config saved to output_json/{resolved_config_filename}")
     
+    return load_config(resolved_json_str)
+
+
+def load_config(resolved_json_str: str) -> BaseConfig:
+    """make a resolved config the current one. configs are consumed while generating, so load one per image"""
     config = BaseConfig.model_validate_json(resolved_json_str)
     GenerationConfig.current_config = config
     return config
 
 
+def image_seed(base_config: BaseConfig, n: int):
+    """seed of the n-th image, None when the config does not fix a seed"""
+    return None if base_config.seed is None else base_config.seed + n
+
+
+GEOMETRY_COUNTERS_PATH = "./output_json/geometry_counters.json"
+MEMORY_SUMMARY_PATH = "./output_json/memory_summary.json"
+PROFILE_DIR = "./output_json/profile"
+TRACE_PATH = "./output_json/trace.json"
+
+
 if __name__ == "__main__":
+    flags = {arg for arg in sys.argv[1:] if arg.startswith("--")}
+    sys.argv = [arg for arg in sys.argv if arg not in flags]
+    for flag in flags:
+        if flag.startswith("--config="):
+            generation_config.GenerationConfig.config_path = flag.split("=", 1)[1]
+    count_geometry = "--count-geometry" in flags
+    if count_geometry:
+        geometry_counters.enable()
+    if "--memory-profile" in flags:
+        memory_profile.enable()
+    profiles = profiling.WorkerProfiles() if "--profile" in flags else None
+    if "--trace" in flags:
+        trace_events.enable("gen_rand_tikz")
+    generate_image = profiles.profiled(main) if profiles is not None else main
     if len(sys.argv) >= 2 and sys.argv[1]:
         generation_config.GenerationConfig.generate_num = int(sys.argv[1])
     if len(sys.argv) >= 3 and sys.argv[2]:
         generation_config.GenerationConfig.color_mode = sys.argv[2]
     if len(sys.argv) >= 4 and sys.argv[3]:
         generation_config.GenerationConfig.generated_file_prefix = sys.argv[3]
-    for i in range(generation_config.GenerationConfig.generate_num):
-        main(i)
+    if len(sys.argv) >= 5 and sys.argv[4]:
+        generation_config.GenerationConfig.render_backend = sys.argv[4]
+    all_stats = [generate_image(i) for i in range(generation_config.GenerationConfig.generate_num)]
+    print(telemetry.format_summary(telemetry.aggregate(all_stats)))
+    if count_geometry:
+        geometry_counters.write(GEOMETRY_COUNTERS_PATH)
+        print(geometry_counters.format_report())
+    if memory_profile.enabled:
+        memory_summary = memory_profile.summarize(all_stats)
+        with open(MEMORY_SUMMARY_PATH, "w", encoding="utf-8") as f:
+            json.dump(memory_summary, f, indent=4)
+        print(memory_profile.format_summary(memory_summary))
+    if profiles is not None:
+        profiling.write_reports(profiles.dump(PROFILE_DIR, prefix="gen_rand_tikz-"), PROFILE_DIR)
+        print(f"[profile] written to {PROFILE_DIR}")
+    if trace_events.enabled:
+        trace_events.write(TRACE_PATH)
+        print(f"[trace] written to {TRACE_PATH}")
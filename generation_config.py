@@ -40,6 +40,16 @@ class DynamicClassAttributesMeta(type):
 class GenerationConfig(metaclass=DynamicClassAttributesMeta):
     # pointer to the config object that is currently being used
     current_config: Union[BaseConfig, PanelConfig, ElementConfig] = None
+
+    # input config of the run, resolved again for every image
+    config_path: str = "input/base.json"
+
+    # how the panels are turned into pixels: "tikz" writes .tex files for pdflatex, "raster" draws png files directly
+    render_backend: Literal["tikz", "raster"] = "tikz"
+    raster_image_width: int = 2000
+
+    # decimal places of the coordinates written to .tex and .json files
+    coordinate_precision: int = 3
     
     # Those are default values. Will be covered by the input given in input.json
     # color_mode: Literal["colored", "mono"] = "colored"
@@ -0,0 +1,230 @@
+"""
+Opt-in call counters for shapely operations and config lookups.
+
+`enable()` wraps the shapely predicates and constructive operations (module functions, geometry methods,
+shapely.affinity / shapely.ops and the names project modules imported from them), the public methods of
+ShapeGroup, the `__init__` / `generate` of every image generator and DynamicClassAttributesMeta.__getattr__.
+Every call is counted and timed, attributed to its owner: the innermost image generator, followed by the
+outermost ShapeGroup method it is running, e.g. "ChainingImageGenerator@1 > ShapeGroup.search_size_by_interval".
+Operations nested in another operation (BaseGeometry.intersection calling shapely.intersection) count once.
+
+Wrapping costs a few microseconds per call, so it is off unless asked for (--count-geometry).
+Counters are process-global; generation runs on a single thread.
+"""
+
+import functools
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+import shapely
+import shapely.affinity
+import shapely.ops
+from shapely.geometry.base import BaseGeometry
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+SHAPELY_FUNCTIONS = [
+    # predicates
+    "overlaps", "within", "contains", "contains_properly", "intersects", "touches", "crosses",
+    "covers", "covered_by", "disjoint", "equals",
+    # constructive
+    "unary_union", "union", "union_all", "intersection", "difference", "symmetric_difference",
+    "buffer", "simplify", "make_valid", "line_interpolate_point",
+    # measurement
+    "distance",
+]
+GEOMETRY_METHODS = [
+    "overlaps", "within", "contains", "intersects", "touches", "crosses", "covers", "covered_by",
+    "disjoint", "equals", "union", "intersection", "difference", "symmetric_difference", "buffer",
+    "simplify", "distance", "interpolate",
+]
+AFFINITY_FUNCTIONS = ["rotate", "scale", "translate", "skew", "affine_transform"]
+OPS_FUNCTIONS = ["unary_union", "nearest_points", "split"]
+
+_local = threading.local()
+_patches: List[Tuple[object, str, object]] = []  # (owner object, attribute, original) to undo in disable()
+operations: Dict[str, Dict[str, list]] = {}  # owner -> operation -> [count, seconds]
+config_lookups: Dict[str, Dict[str, list]] = {}  # owner -> config attribute -> [count, seconds]
+
+
+def owner() -> str:
+    stack = getattr(_local, "owners", None)
+    return stack[-1] if stack else "-"
+
+
+def _push(label: str, shape_group_method: bool = False):
+    stack = _local.__dict__.setdefault("owners", [])
+    current = stack[-1] if stack else None
+    if shape_group_method:
+        if current is not None and (" > ShapeGroup." in current or current.startswith("ShapeGroup.")):
+            stack.append(current)  # a ShapeGroup method called by another one
+        else:
+            stack.append(label if current is None else f"{current} > {label}")
+    else:
+        stack.append(label)
+
+
+def _pop():
+    _local.owners.pop()
+
+
+def _record(records: Dict[str, Dict[str, list]], key: str, seconds: float):
+    record = records.setdefault(owner(), {}).setdefault(key, [0, 0.0])
+    record[0] += 1
+    record[1] += seconds
+
+
+def _counted(name: str, function: Callable) -> Callable:
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if getattr(_local, "inside", False):  # called by another counted operation
+            return function(*args, **kwargs)
+        _local.inside = True
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _record(operations, name, time.perf_counter() - start)
+            _local.inside = False
+
+    return wrapper
+
+
+def _owned(label: Callable[[], str], function: Callable, shape_group_method: bool = False) -> Callable:
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        _push(label(), shape_group_method)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _pop()
+
+    return wrapper
+
+
+def _patch(target, attribute: str, replacement):
+    _patches.append((target, attribute, target.__dict__[attribute]))
+    setattr(target, attribute, replacement)
+
+
+def _project_modules():
+    for module in list(sys.modules.values()):
+        path = getattr(module, "__file__", None)
+        if path and os.path.abspath(path).startswith(ROOT + os.sep) and module.__name__ != __name__:
+            yield module
+
+
+def _generator_depth() -> int:
+    return sum(1 for label in getattr(_local, "owners", []) if " > " not in label and "@" in label)
+
+
+def enable():
+    """start counting. patches the modules that are imported at this point"""
+    if _patches:
+        return
+    from generation_config import DynamicClassAttributesMeta
+    from image_generators import ImageGenerator
+    from shape_group import ShapeGroup
+
+    replacements = {}  # original function -> counted wrapper
+    for module, names, prefix in [
+        (shapely, SHAPELY_FUNCTIONS, ""),
+        (shapely.affinity, AFFINITY_FUNCTIONS, "affinity."),
+        (shapely.ops, OPS_FUNCTIONS, "ops."),
+    ]:
+        for name in names:
+            original = module.__dict__.get(name)
+            if original is None:
+                continue
+            wrapper = replacements.setdefault(original, _counted(prefix + name, original))
+            _patch(module, name, wrapper)
+    for name in GEOMETRY_METHODS:
+        if name in BaseGeometry.__dict__:
+            _patch(BaseGeometry, name, _counted(name, BaseGeometry.__dict__[name]))
+    _patch(shapely.STRtree, "query", _counted("STRtree.query", shapely.STRtree.__dict__["query"]))
+
+    # names bound with `from shapely.affinity import rotate` and the like
+    for module in _project_modules():
+        for name, value in list(module.__dict__.items()):
+            try:
+                wrapper = replacements.get(value)
+            except TypeError:  # unhashable module attribute
+                continue
+            if wrapper is not None:
+                _patch(module, name, wrapper)
+
+    for name, method in list(ShapeGroup.__dict__.items()):
+        if inspect.isfunction(method) and (not name.startswith("__") or name == "__add__"):
+            _patch(ShapeGroup, name, _owned(lambda name=name: f"ShapeGroup.{name}", method, shape_group_method=True))
+
+    generators, pending = [], list(ImageGenerator.__subclasses__())
+    while pending:
+        generators.append(pending.pop())
+        pending += generators[-1].__subclasses__()
+    for generator in generators:
+        for name in ("__init__", "generate"):
+            if name in generator.__dict__:
+                label = lambda generator=generator: f"{generator.__name__}@{_generator_depth() + 1}"
+                _patch(generator, name, _owned(label, generator.__dict__[name]))
+
+    lookup = DynamicClassAttributesMeta.__dict__["__getattr__"]
+
+    @functools.wraps(lookup)
+    def counted_lookup(cls, name):
+        start = time.perf_counter()
+        try:
+            return lookup(cls, name)
+        finally:
+            _record(config_lookups, name, time.perf_counter() - start)
+
+    _patch(DynamicClassAttributesMeta, "__getattr__", counted_lookup)
+
+
+def disable():
+    """undo every patch of enable(). the counters are kept"""
+    while _patches:
+        target, attribute, original = _patches.pop()
+        setattr(target, attribute, original)
+
+
+def reset():
+    operations.clear()
+    config_lookups.clear()
+
+
+def snapshot() -> dict:
+    as_dicts = lambda records: {
+        key: {name: {"count": count, "seconds": seconds} for name, (count, seconds) in sorted(values.items())}
+        for key, values in sorted(records.items())
+    }
+    return {"operations": as_dicts(operations), "config_lookups": as_dicts(config_lookups)}
+
+
+def write(path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(snapshot(), f, indent=4)
+
+
+def format_report(limit: int = 5) -> str:
+    """owners by time spent in shapely, each with its most expensive operations"""
+    lines = ["[geometry] shapely time by owner"]
+    owners = sorted(operations.items(), key=lambda item: -sum(seconds for _, seconds in item[1].values()))
+    for key, values in owners:
+        count = sum(count for count, _ in values.values())
+        seconds = sum(seconds for _, seconds in values.values())
+        lines.append(f"  {key:<64}{count:>9} calls{seconds:>10.3f}s")
+        for name, (count, seconds) in sorted(values.items(), key=lambda item: -item[1][1])[:limit]:
+            lines.append(f"      {name:<60}{count:>9} calls{seconds:>10.3f}s")
+    lookups = {}
+    for values in config_lookups.values():
+        for name, (count, _) in values.items():
+            lookups[name] = lookups.get(name, 0) + count
+    total = sum(lookups.values())
+    top = ", ".join(f"{name} {count}" for name, count in sorted(lookups.items(), key=lambda item: -item[1])[:limit])
+    lines.append(f"[geometry] {total} config lookups ({top})")
+    return "\n".join(lines)
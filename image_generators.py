@@ -19,12 +19,14 @@ from shapely.geometry.polygon import Polygon
 
 import generation_config
 import img_params
+import telemetry
 # === 项目相关导入 ===
 from common_types import *
 from entities.closed_shape import ClosedShape
 from entities.complex_shape import ComplexShape
 from entities.line_segment import LineSegment
 from entities.simple_shape import SimpleShape
+from entities.smooth_curve import SmoothCurve
 from generation_config import (GenerationConfig,
                                step_into_config_scope_decorator,
                                step_out_config_scope)
@@ -186,22 +188,28 @@ class ChainingImageGenerator(ImageGenerator):
     def generate_chain(self):
         assert self.element_num >= 2 and self.element_num <= 20
         # composite the image first, then shift to the center pos
+        # the defining points of the curve are kept to draw it as a single SmoothCurve
         if self.chain_shape == "bezier":
-            curve_function = lambda: generate_random_bezier_curve()
+            self.curve_kind = "bezier"
+            control_points = generate_random_bezier_control_points()
+            curve_function = lambda: generate_equidistant_bezier_curve(*control_points)
         elif self.chain_shape == "circle":
-            curve_function = lambda: generate_circle_curve(random.randrange(4, 8))
+            self.curve_kind = "circle"
+            radius = random.randrange(4, 8)
+            control_points = [(0.0, 0.0), (radius, 0.0)]
+            curve_function = lambda: generate_circle_curve(radius)
         elif self.chain_shape == "line":
-            curve_function = lambda: get_points_on_line(
+            self.curve_kind = "polyline"
+            control_points = [
                 (-GenerationConfig.canvas_limit / 2, 0.0),
                 (GenerationConfig.canvas_limit / 2, 0.0),
-            )
+            ]
+            curve_function = lambda: get_points_on_line(*control_points)
         else:
             print("curve type not assigned")
             raise
-        self.curve_point_set = curve_function()
-        self.curve_point_set = [
-            rotate_point(pt, (0, 0), self.rotation) for pt in self.curve_point_set
-        ]
+        self.curve_point_set = rotate_points(curve_function(), (0, 0), self.rotation)
+        self.curve_control_points = rotate_points(control_points, (0, 0), self.rotation)
 
         def get_chain():
             step_length = max(1, len(self.curve_point_set) // (self.element_num - 1))
@@ -320,24 +328,15 @@ class ChainingImageGenerator(ImageGenerator):
                 self.shapes.add_shape(LineSegment.connect(current_point, end_point))
 
     def add_chain_segments(self):
-        chain_segments = [
-            LineSegment(
-                self.curve_point_set[i],
-                self.curve_point_set[i + 1],
-                color=img_params.Color.black,
-            )
-            for i in range(len(self.curve_point_set) - 2)
-            # for i in range(0,len(self.curve_point_set) - 2,2)
-        ]
+        chain_curve = SmoothCurve(
+            self.curve_kind, self.curve_control_points, color=img_params.Color.black
+        )
 
         if self.chain_level == "bottom":
             self.shapes.lift_up_layer()
-            for seg in chain_segments:
-                self.shapes.add_shape_on_layer(seg, 0)
+            self.shapes.add_shape_on_layer(chain_curve, 0)
         elif self.chain_level == "top":
-            top_layer = self.shapes.layer_num - 1
-            for seg in chain_segments:
-                self.shapes.add_shape_on_layer(seg, top_layer)
+            self.shapes.add_shape_on_top_layer(chain_curve)
         else:
             raise ValueError()
 
@@ -805,7 +804,8 @@ def generate_shape_group() -> ShapeGroup:
     generator = get_image_generator(composition_type)
     cfg_name = get_config_name(generator)
     generation_config.step_into_config_scope(cfg_name)
-    elements: ShapeGroup = generator.generate()
+    with telemetry.generator(generator.__class__.__name__):
+        elements: ShapeGroup = generator.generate()
     return elements
 
 
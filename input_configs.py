@@ -30,6 +30,8 @@ class BaseConfig(ConfigBaseModel):
     canvas_height: float
     panel_configs: List["NestedConfigModel"]
     opacity: float
+    seed: Optional[int] = None  # image n is generated with seed + n
+    arbitrary_shape_library_size: int = 0  # outlines kept per cell number for reuse, 0 disables the library
 
     @model_validator(mode="after")
     def set_parents_for_children(self) -> "BaseConfig":
@@ -0,0 +1,121 @@
+"""
+Live metrics of long-running batches, in the Prometheus text exposition format.
+
+The pipeline collects its counters (images completed / failed / skipped per stage, images/sec, queue depth
+in front of each stage, RSS) and the latency histograms kept here, fed by telemetry while images are
+generated: one per image generator and nesting depth, and one for whole images. With --metrics-file the text
+is rewritten every report interval (atomically, so the node_exporter textfile collector never reads half a
+file); with --metrics-port it is served on http://127.0.0.1:<port>/metrics.
+"""
+
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Tuple
+
+PREFIX = "shapes_"
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+enabled = False
+
+Labels = Tuple[Tuple[str, str], ...]
+
+_lock = threading.Lock()
+_histograms: Dict[str, Dict[Labels, "Histogram"]] = {}
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)  # per bucket, made cumulative when formatted
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += value
+
+
+def enable():
+    global enabled
+    enabled = True
+
+
+def observe(name: str, value: float, **labels):
+    """add `value` to the histogram `name` with these labels"""
+    key = tuple(sorted((label, str(label_value)) for label, label_value in labels.items()))
+    with _lock:
+        _histograms.setdefault(name, {}).setdefault(key, Histogram()).observe(value)
+
+
+def format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escape = lambda value: value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{label}="{escape(value)}"' for label, value in labels) + "}"
+
+
+def format_value(value: float) -> str:
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def format_metric(name: str, kind: str, help_text: str, samples: List[Tuple[dict, float]]) -> List[str]:
+    """a counter or gauge family, each sample a (labels, value) pair"""
+    lines = [f"# HELP {PREFIX}{name} {help_text}", f"# TYPE {PREFIX}{name} {kind}"]
+    for labels, value in samples:
+        lines.append(f"{PREFIX}{name}{format_labels(tuple(sorted(labels.items())))} {format_value(value)}")
+    return lines
+
+
+def format_histograms(help_texts: Dict[str, str]) -> List[str]:
+    lines = []
+    with _lock:
+        for name, histograms in sorted(_histograms.items()):
+            lines += [f"# HELP {PREFIX}{name} {help_texts.get(name, name)}", f"# TYPE {PREFIX}{name} histogram"]
+            for labels, histogram in sorted(histograms.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f"{PREFIX}{name}_bucket{format_labels(labels + (('le', f'{bound:g}'),))} {cumulative}")
+                lines.append(f"{PREFIX}{name}_bucket{format_labels(labels + (('le', '+Inf'),))} {histogram.count}")
+                lines.append(f"{PREFIX}{name}_sum{format_labels(labels)} {format_value(histogram.sum)}")
+                lines.append(f"{PREFIX}{name}_count{format_labels(labels)} {histogram.count}")
+    return lines
+
+
+def write_file(path: str, text: str):
+    """replace the file in one rename, readers never see a partial file"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(temporary, path)
+
+
+def serve(port: int, collect: Callable[[], str], host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """serve `collect()` on /metrics from a daemon thread. call shutdown() on the returned server to stop"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = collect().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):  # scrapes would flood the progress output
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
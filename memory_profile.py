@@ -0,0 +1,161 @@
+"""
+Memory instrumentation of generation runs (--memory-profile).
+
+When enabled, tracemalloc runs for the whole process. Every image recorded by telemetry gets an ImageMemory:
+the traced peak above the memory in use when the image started, and the RSS delta. The same is recorded for
+each top-level image generator (telemetry depth 1). An image whose peak exceeds `threshold_mb` also gets the
+allocation sites that grew most since tracing was enabled, taken at its end while its panels are still alive.
+Only those images pay for a snapshot; the baseline is taken once, in `enable`.
+
+`summarize` ranks configs, images and generators by their peak.
+"""
+
+import os
+import tracemalloc
+from typing import Dict, List, Optional
+
+DEFAULT_THRESHOLD_MB = 100.0
+TOP_SITES = 15
+MB = 1024 * 1024
+
+enabled = False
+threshold_mb = DEFAULT_THRESHOLD_MB
+_baseline: Optional[tracemalloc.Snapshot] = None  # allocations before the first image
+
+
+def enable(threshold: float = DEFAULT_THRESHOLD_MB):
+    global enabled, threshold_mb, _baseline
+    enabled, threshold_mb = True, threshold
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _baseline = take_snapshot()
+
+
+def rss_mb() -> float:
+    """current resident set size"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / MB
+    except (OSError, ValueError):  # not linux. peak instead of current RSS
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def take_snapshot() -> tracemalloc.Snapshot:
+    return tracemalloc.take_snapshot().filter_traces(
+        [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap*>")]
+    )
+
+
+def top_allocation_sites(since: tracemalloc.Snapshot, limit: int = TOP_SITES) -> List[dict]:
+    """sites that hold more memory than at the time of `since`, largest growth first"""
+    growth = [stat for stat in take_snapshot().compare_to(since, "lineno") if stat.size_diff > 0]
+    return [
+        {
+            "site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+            "size_mb": stat.size_diff / MB,
+            "count": stat.count_diff,
+        }
+        for stat in growth[:limit]
+    ]
+
+
+class ImageMemory:
+    """
+    peaks are measured with tracemalloc.reset_peak, which every generator resets again. the image's peak is
+    therefore folded in before each reset
+    """
+
+    def __init__(self) -> None:
+        tracemalloc.reset_peak()
+        self.start_traced = tracemalloc.get_traced_memory()[0]
+        self.start_rss = rss_mb()
+        self.peak_traced = self.start_traced
+        self.peak_mb: Optional[float] = None
+        self.rss_delta_mb: Optional[float] = None
+        self.generators: Dict[str, dict] = {}
+        self.top_allocations: Optional[List[dict]] = None
+
+    def fold_peak(self):
+        self.peak_traced = max(self.peak_traced, tracemalloc.get_traced_memory()[1])
+
+    def enter_generator(self) -> tuple:
+        self.fold_peak()
+        tracemalloc.reset_peak()
+        return tracemalloc.get_traced_memory()[0], rss_mb()
+
+    def exit_generator(self, key: str, entered: tuple):
+        start_traced, start_rss = entered
+        peak = tracemalloc.get_traced_memory()[1]
+        self.fold_peak()
+        record = self.generators.setdefault(key, {"count": 0, "peak_mb": 0.0, "rss_delta_mb": 0.0})
+        record["count"] += 1
+        record["peak_mb"] = max(record["peak_mb"], (peak - start_traced) / MB)
+        record["rss_delta_mb"] += rss_mb() - start_rss
+
+    def finish(self):
+        self.fold_peak()
+        self.peak_mb = (self.peak_traced - self.start_traced) / MB
+        self.rss_delta_mb = rss_mb() - self.start_rss
+        if self.peak_mb > threshold_mb:
+            self.top_allocations = top_allocation_sites(_baseline)
+
+    def to_dict(self) -> dict:
+        memory = {"peak_mb": self.peak_mb, "rss_delta_mb": self.rss_delta_mb, "generators": self.generators}
+        if self.top_allocations is not None:
+            memory["top_allocations"] = self.top_allocations
+        return memory
+
+
+def summarize(all_stats: List[dict], limit: int = 10) -> dict:
+    """configs, images and top-level generators ranked by their traced peak, largest first"""
+    images = [stats for stats in all_stats if stats.get("memory")]
+    configs, generators = {}, {}
+    for stats in images:
+        memory = stats["memory"]
+        config = configs.setdefault(stats.get("config") or "-", {"images": 0, "max_peak_mb": 0.0, "total_peak_mb": 0.0})
+        config["images"] += 1
+        config["max_peak_mb"] = max(config["max_peak_mb"], memory["peak_mb"])
+        config["total_peak_mb"] += memory["peak_mb"]
+        for key, record in memory["generators"].items():
+            generator = generators.setdefault(key, {"count": 0, "max_peak_mb": 0.0, "rss_delta_mb": 0.0})
+            generator["count"] += record["count"]
+            generator["max_peak_mb"] = max(generator["max_peak_mb"], record["peak_mb"])
+            generator["rss_delta_mb"] += record["rss_delta_mb"]
+    for config in configs.values():
+        config["mean_peak_mb"] = config.pop("total_peak_mb") / config["images"]
+
+    by_peak = lambda records: dict(sorted(records.items(), key=lambda item: -item[1]["max_peak_mb"]))
+    ranked_images = sorted(images, key=lambda stats: -stats["memory"]["peak_mb"])[:limit]
+    return {
+        "threshold_mb": threshold_mb,
+        "configs": by_peak(configs),
+        "images": [
+            {
+                "image": stats["image"],
+                "config": stats.get("config"),
+                "peak_mb": stats["memory"]["peak_mb"],
+                "rss_delta_mb": stats["memory"]["rss_delta_mb"],
+                "over_threshold": "top_allocations" in stats["memory"],
+            }
+            for stats in ranked_images
+        ],
+        "generators": by_peak(generators),
+    }
+
+
+def format_summary(summary: dict) -> str:
+    lines = [f"[memory] traced peak per config (images over {summary['threshold_mb']:.0f} MB keep their top allocation sites)"]
+    for name, config in summary["configs"].items():
+        lines.append(f"  {name:<40}{config['images']:>6} images  max {config['max_peak_mb']:>8.1f} MB  mean {config['mean_peak_mb']:>8.1f} MB")
+    lines.append("[memory] largest images")
+    for image in summary["images"]:
+        flag = "  over threshold" if image["over_threshold"] else ""
+        lines.append(f"  {image['image']:<40}peak {image['peak_mb']:>8.1f} MB  rss {image['rss_delta_mb']:>+8.1f} MB{flag}")
+    lines.append("[memory] top-level generators")
+    for key, generator in summary["generators"].items():
+        lines.append(
+            f"  {key:<40}{generator['count']:>6} calls  max {generator['max_peak_mb']:>8.1f} MB  rss {generator['rss_delta_mb']:>+8.1f} MB"
+        )
+    return "\n".join(lines)
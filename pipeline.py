@@ -0,0 +1,443 @@
+"""
+Single-process streaming pipeline: generate -> compile -> rasterize -> annotate.
+
+Each stage is fed by a bounded queue, so an image flows to the next stage as soon as it is ready
+instead of waiting for the whole batch. pdflatex / pdftoppm run as subprocesses with a concurrency
+limit per stage; each pdflatex run uses its own auxiliary directory.
+
+Stages whose inputs are unchanged since the last run are skipped, see build_manifest.py.
+"""
+
+import argparse
+import json
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import traceback
+from typing import Callable, List, Optional
+
+import combine_json
+import compile_stats
+from build_manifest import BuildManifest, digest, file_digest, source_digest
+import convert_image
+import gen_rand_tikz
+import generation_config
+from input_configs import BaseConfig
+import geometry_counters
+import live_metrics
+import memory_profile
+import profiling
+import telemetry
+import trace_events
+
+TEX_DIR = "output_tex"
+PDF_DIR = "output_pdf"
+PNG_DIR = "output_png"
+JSON_DIR = "output_json"
+DATASET_DIR = "my_dataset"
+MANIFEST_PATH = os.path.join(JSON_DIR, "build_manifest.json")
+RUN_STATS_PATH = os.path.join(JSON_DIR, "run_stats.json")
+GEOMETRY_COUNTERS_PATH = os.path.join(JSON_DIR, "geometry_counters.json")
+MEMORY_SUMMARY_PATH = os.path.join(JSON_DIR, "memory_summary.json")
+PROFILE_DIR = os.path.join(JSON_DIR, "profile")
+TRACE_PATH = os.path.join(JSON_DIR, "trace.json")
+
+HISTOGRAM_HELP = {
+    "image_seconds": "wall time of generating one image",
+    "generator_seconds": "wall time of one ImageGenerator.generate call, by generator and nesting depth",
+}
+
+_DONE = object()  # sentinel that shuts a stage down
+
+
+class Stage:
+    """a pool of worker threads that take image indices from `inbox`, process them and pass them on"""
+
+    def __init__(
+        self,
+        name: str,
+        work: Callable[[int], None],
+        workers: int,
+        inbox: queue.Queue,
+        outbox: Optional[queue.Queue],
+    ) -> None:
+        self.name = name
+        self.work = work
+        self.workers = workers
+        self.inbox = inbox
+        self.outbox = outbox
+        self.completed = 0
+        self.failed: List[int] = []
+        self._lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"{name}-{i}", daemon=True)
+            for i in range(workers)
+        ]
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+
+    def _run(self):
+        while True:
+            index = self.inbox.get()
+            if index is _DONE:
+                break
+            try:
+                self.work(index)
+            except Exception:
+                print(f"[{self.name}] image {index} failed")
+                traceback.print_exc()
+                with self._lock:
+                    self.failed.append(index)
+                continue
+            with self._lock:
+                self.completed += 1
+            if self.outbox is not None:
+                self.outbox.put(index)
+
+    def close(self):
+        """called once the upstream stage has finished, so every index is already queued"""
+        for _ in self._threads:
+            self.inbox.put(_DONE)
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+
+class Pipeline:
+    def __init__(
+        self,
+        generate_num: int,
+        file_prefix: str = "",
+        backend: str = "tikz",
+        compile_jobs: int = None,
+        raster_jobs: int = None,
+        queue_size: int = 8,
+        png_width: int = convert_image.DEFAULT_WIDTH,
+        report_interval: float = 2.0,
+        force: bool = False,
+        count_geometry: bool = False,
+        memory_threshold: float = None,
+        profile: bool = False,
+        trace: bool = False,
+        metrics_file: str = None,
+        metrics_port: int = None,
+    ) -> None:
+        self.generate_num = generate_num
+        self.file_prefix = file_prefix
+        self.backend = backend
+        self.png_width = png_width
+        self.report_interval = report_interval
+        self.force = force
+        self.count_geometry = count_geometry
+        self.memory_threshold = memory_threshold  # None: no memory profile
+        self.profiles = profiling.WorkerProfiles() if profile else None
+        self.trace = trace
+        self.metrics_file = metrics_file  # rewritten every report interval
+        self.metrics_port = metrics_port
+        self.manifest = BuildManifest(MANIFEST_PATH)
+        self.generate_inputs = None  # set in run(), once the config has been resolved
+        self.canvas_size = None  # (width, height) the annotations are mapped by, also set in run()
+        self.skipped = {}
+        self.image_stats = []  # stage timings of the images generated in this run
+        self.compile_journal = compile_stats.RecordJournal()
+        self.compiled = 0
+        self._lock = threading.Lock()
+        cpu_count = os.cpu_count() or 1
+        compile_jobs = compile_jobs if compile_jobs is not None else cpu_count
+        raster_jobs = raster_jobs if raster_jobs is not None else max(cpu_count // 2, 1)
+
+        self.labels_dict = combine_json.new_labels_dict()
+        self.annotated = {}
+
+        # generation mutates the global GenerationConfig, so it always runs on a single thread
+        self.to_generate = queue.Queue()
+        self.to_annotate = queue.Queue(maxsize=queue_size)
+        self.stages = [Stage("generate", self.generate, 1, self.to_generate, None)]
+        if backend == "raster":  # the generator writes png files itself
+            self.stages[0].outbox = self.to_annotate
+        else:
+            self.to_compile = queue.Queue(maxsize=queue_size)
+            self.to_rasterize = queue.Queue(maxsize=queue_size)
+            self.stages[0].outbox = self.to_compile
+            self.stages += [
+                Stage("compile", self.compile, compile_jobs, self.to_compile, self.to_rasterize),
+                Stage("rasterize", self.rasterize, raster_jobs, self.to_rasterize, self.to_annotate),
+            ]
+        self.stages.append(Stage("annotate", self.annotate, 1, self.to_annotate, None))
+        if self.profiles is not None:
+            # only the generate stage: the others wait for subprocesses, and python >= 3.12 allows a single
+            # active profiler per process
+            self.stages[0].work = self.profiles.profiled(self.stages[0].work)
+
+    def name(self, index: int) -> str:
+        return f"{self.file_prefix}{index}"
+
+    def cached(self, index: int, stage: str, inputs: str, outputs: List[str], work: Callable[[], None]):
+        """run `work` unless the manifest says its outputs are up to date for these inputs"""
+        if not self.force and self.manifest.is_fresh(self.name(index), stage, inputs):
+            with self._lock:
+                self.skipped[stage] = self.skipped.get(stage, 0) + 1
+            return
+        work()
+        self.manifest.record(self.name(index), stage, inputs, outputs)
+
+    def generate(self, index: int):
+        if self.backend == "raster":
+            image_path = os.path.join(PNG_DIR, f"{self.name(index)}.png")
+        else:
+            image_path = os.path.join(TEX_DIR, f"{self.name(index)}.tex")
+        self.cached(
+            index,
+            "generate",
+            digest(self.generate_inputs, str(index)),
+            [image_path, os.path.join(JSON_DIR, f"{self.name(index)}.json")],
+            lambda: self.image_stats.append(gen_rand_tikz.main(index)),
+        )
+
+    def compile(self, index: int):
+        tex_path = os.path.join(TEX_DIR, f"{self.name(index)}.tex")
+        pdf_path = os.path.join(PDF_DIR, f"{self.name(index)}.pdf")
+        self.cached(
+            index, "compile", digest(file_digest(tex_path)), [pdf_path], lambda: self.run_pdflatex(index)
+        )
+
+    def run_pdflatex(self, index: int):
+        tex_path = os.path.abspath(os.path.join(TEX_DIR, f"{self.name(index)}.tex"))
+        with tempfile.TemporaryDirectory(prefix="pdflatex-") as aux_dir:
+            start = time.perf_counter()
+            with trace_events.span("pdflatex", "subprocess", image=self.name(index)) as span_args:
+                process = subprocess.Popen(
+                    [
+                        "pdflatex",
+                        "-interaction=batchmode",
+                        "-halt-on-error",
+                        f"-output-directory={aux_dir}",
+                        tex_path,
+                    ],
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                )
+                span_args["process_pid"] = process.pid
+                returncode = process.wait()
+            seconds = time.perf_counter() - start
+            if returncode != 0:
+                raise RuntimeError(f"pdflatex exited with {returncode} on {tex_path}")
+            with open(os.path.join(aux_dir, f"{self.name(index)}.log"), "r", encoding="latin-1") as f:
+                log_text = f.read()
+            json_path = os.path.join(JSON_DIR, f"{self.name(index)}.json")
+            self.compile_journal.append(compile_stats.image_record(self.name(index), seconds, log_text, tex_path, json_path))
+            with self._lock:
+                self.compiled += 1
+            shutil.move(
+                os.path.join(aux_dir, f"{self.name(index)}.pdf"),
+                os.path.join(PDF_DIR, f"{self.name(index)}.pdf"),
+            )
+
+    def rasterize(self, index: int):
+        pdf_path = os.path.join(PDF_DIR, f"{self.name(index)}.pdf")
+        self.cached(
+            index,
+            "rasterize",
+            digest(file_digest(pdf_path), str(self.png_width)),
+            [os.path.join(PNG_DIR, f"{self.name(index)}.png")],
+            lambda: convert_image.convert_pdf(pdf_path, self.png_width, PNG_DIR),
+        )
+
+    def annotate(self, index: int):
+        self.annotated[index] = combine_json.annotate_image(
+            index, self.file_prefix, png_dir=PNG_DIR, json_dir=JSON_DIR, canvas_size=self.canvas_size
+        )
+        shutil.copy(
+            os.path.join(PNG_DIR, f"{self.name(index)}.png"),
+            os.path.join(DATASET_DIR, "data"),
+        )
+
+    def write_labels(self):
+        # ids are assigned here, in index order, so they do not depend on the order images were annotated in
+        for index in sorted(self.annotated):
+            combine_json.add_image(self.labels_dict, *self.annotated[index])
+        combine_json.write_labels(self.labels_dict, os.path.join(DATASET_DIR, "labels.json"))
+
+    def report(self, start_time: float, stop: threading.Event):
+        while not stop.wait(self.report_interval):
+            self.print_progress(start_time)
+            if self.metrics_file is not None:
+                live_metrics.write_file(self.metrics_file, self.metrics_text(start_time))
+
+    def print_progress(self, start_time: float):
+        done = self.stages[-1].completed
+        elapsed = time.perf_counter() - start_time
+        rate = done / elapsed if elapsed > 0 else 0.0
+        remaining = self.generate_num - done - sum(len(stage.failed) for stage in self.stages)
+        eta = f"{remaining / rate:.0f}s" if rate > 0 else "--"
+        queues = ", ".join(
+            f"{stage.name}: {stage.inbox.qsize()}" for stage in self.stages[1:]
+        )
+        print(
+            f"[pipeline] {done}/{self.generate_num} images, {rate:.2f} images/s, ETA {eta} (queued {queues})",
+            flush=True,
+        )
+
+    def metrics_text(self, start_time: float) -> str:
+        """progress of the run in the Prometheus text format"""
+        done = self.stages[-1].completed
+        elapsed = time.perf_counter() - start_time
+        by_stage = lambda value: [({"stage": stage.name}, value(stage)) for stage in self.stages]
+        lines = live_metrics.format_metric("images_planned", "gauge", "images in this run", [({}, self.generate_num)])
+        lines += live_metrics.format_metric("images_completed_total", "counter", "images that went through every stage", [({}, done)])
+        lines += live_metrics.format_metric(
+            "images_per_second", "gauge", "completed images per second since the run started", [({}, done / elapsed if elapsed > 0 else 0.0)]
+        )
+        lines += live_metrics.format_metric(
+            "stage_completed_total", "counter", "images passed on by a stage, up-to-date ones included", by_stage(lambda stage: stage.completed)
+        )
+        lines += live_metrics.format_metric("stage_failures_total", "counter", "images that failed in a stage", by_stage(lambda stage: len(stage.failed)))
+        lines += live_metrics.format_metric(
+            "stage_skipped_total", "counter", "images a stage skipped as up to date", by_stage(lambda stage: self.skipped.get(stage.name, 0))
+        )
+        lines += live_metrics.format_metric("queue_depth", "gauge", "images waiting in front of a stage", by_stage(lambda stage: stage.inbox.qsize()))
+        lines += live_metrics.format_metric(
+            "resident_memory_bytes", "gauge", "resident set size of the pipeline process", [({}, memory_profile.rss_mb() * memory_profile.MB)]
+        )
+        lines += live_metrics.format_histograms(HISTOGRAM_HELP)
+        return "\n".join(lines) + "\n"
+
+    def run(self):
+        for directory in [TEX_DIR, PDF_DIR, PNG_DIR, JSON_DIR, os.path.join(DATASET_DIR, "data")]:
+            os.makedirs(directory, exist_ok=True)
+        combine_json.load_categories()
+
+        # everything a generated image depends on besides its index. the seed is part of the config
+        config = generation_config.GenerationConfig
+        resolved_config = gen_rand_tikz.resolve_config_json(config.config_path)
+        self.generate_inputs = digest(
+            resolved_config,
+            source_digest(),
+            config.color_mode,
+            self.backend,
+            str(config.raster_image_width) if self.backend == "raster" else None,
+        )
+        # read here, the annotate thread must not look up the config generation is stepping through
+        base_config = BaseConfig.model_validate_json(resolved_config)
+        self.canvas_size = (base_config.canvas_width, base_config.canvas_height)
+
+        if self.count_geometry:
+            geometry_counters.enable()
+        if self.memory_threshold is not None:
+            # traces every thread; besides generation only annotation allocates noticeably
+            memory_profile.enable(self.memory_threshold)
+        if self.trace:
+            trace_events.enable("pipeline")
+
+        start_time = time.perf_counter()
+        metrics_server = None
+        if self.metrics_file is not None or self.metrics_port is not None:
+            live_metrics.enable()
+        if self.metrics_port is not None:
+            metrics_server = live_metrics.serve(self.metrics_port, lambda: self.metrics_text(start_time))
+            print(f"[pipeline] metrics served on http://127.0.0.1:{metrics_server.server_address[1]}/metrics")
+        stop = threading.Event()
+        reporter = threading.Thread(target=self.report, args=(start_time, stop), daemon=True)
+        reporter.start()
+
+        for stage in self.stages:
+            stage.start()
+        for index in range(self.generate_num):
+            self.to_generate.put(index)
+        for stage in self.stages:  # shut the stages down in order, upstream first
+            stage.close()
+            stage.join()
+
+        stop.set()
+        self.manifest.compact()
+        self.write_labels()
+        self.print_progress(start_time)
+        if self.metrics_file is not None:
+            live_metrics.write_file(self.metrics_file, self.metrics_text(start_time))
+        if metrics_server is not None:
+            metrics_server.shutdown()
+        if self.image_stats:
+            summary = telemetry.aggregate(self.image_stats)
+            with open(RUN_STATS_PATH, "w", encoding="utf-8") as f:
+                json.dump(summary, f, indent=4)
+            print(telemetry.format_summary(summary))
+            if memory_profile.enabled:
+                memory_summary = memory_profile.summarize(self.image_stats)
+                with open(MEMORY_SUMMARY_PATH, "w", encoding="utf-8") as f:
+                    json.dump(memory_summary, f, indent=4)
+                print(memory_profile.format_summary(memory_summary))
+        if self.count_geometry:
+            geometry_counters.write(GEOMETRY_COUNTERS_PATH)
+            print(geometry_counters.format_report())
+        if self.compiled:
+            print(compile_stats.format_report(compile_stats.write_report()))
+        if self.profiles is not None and self.profiles.profiles:
+            profiling.write_reports(self.profiles.dump(PROFILE_DIR), PROFILE_DIR)
+            print(f"[pipeline] profile written to {PROFILE_DIR}")
+        if self.trace:
+            trace_events.write(TRACE_PATH)
+            print(f"[pipeline] trace written to {TRACE_PATH}")
+        if self.skipped:
+            skipped = ", ".join(f"{stage}: {count}" for stage, count in self.skipped.items())
+            print(f"[pipeline] up to date, skipped {skipped}")
+        failed = sorted(index for stage in self.stages for index in stage.failed)
+        if failed:
+            print(f"[pipeline] failed images: {failed}")
+        return failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="generate, compile, rasterize and annotate images in one streaming run")
+    parser.add_argument("generate_num", type=int)
+    parser.add_argument("color_mode", nargs="?", default="colored")
+    parser.add_argument("file_prefix", nargs="?", default="")
+    parser.add_argument("--config", default=generation_config.GenerationConfig.config_path, help="input config of the run")
+    parser.add_argument("--backend", choices=["tikz", "raster"], default="tikz")
+    parser.add_argument("--compile-jobs", type=int, default=None, help="concurrent pdflatex processes")
+    parser.add_argument("--raster-jobs", type=int, default=None, help="concurrent pdftoppm processes")
+    parser.add_argument("--queue-size", type=int, default=8, help="capacity of the queue in front of each stage")
+    parser.add_argument("--png-width", type=int, default=convert_image.DEFAULT_WIDTH)
+    parser.add_argument("--force", action="store_true", help="ignore the build manifest and redo every stage")
+    parser.add_argument("--count-geometry", action="store_true", help="count shapely operations and config lookups per generator")
+    parser.add_argument("--profile", action="store_true", help=f"cProfile the generate stage, reports in {PROFILE_DIR}")
+    parser.add_argument("--trace", action="store_true", help=f"write a chrome trace-event timeline of the run to {TRACE_PATH}")
+    parser.add_argument("--metrics-file", default=None, help="rewrite progress metrics in the Prometheus text format to this file")
+    parser.add_argument("--metrics-port", type=int, default=None, help="serve progress metrics on http://127.0.0.1:<port>/metrics")
+    parser.add_argument("--memory-profile", action="store_true", help="record traced peak memory and RSS per image and generator")
+    parser.add_argument(
+        "--memory-threshold", type=float, default=memory_profile.DEFAULT_THRESHOLD_MB,
+        help="MB of traced peak above which an image keeps its top allocation sites",
+    )
+    args = parser.parse_args()
+
+    generation_config.GenerationConfig.generate_num = args.generate_num
+    generation_config.GenerationConfig.color_mode = args.color_mode
+    generation_config.GenerationConfig.generated_file_prefix = args.file_prefix
+    generation_config.GenerationConfig.render_backend = args.backend
+    generation_config.GenerationConfig.config_path = args.config
+    generation_config.GenerationConfig.raster_image_width = args.png_width
+
+    failed = Pipeline(
+        generate_num=args.generate_num,
+        file_prefix=args.file_prefix,
+        backend=args.backend,
+        compile_jobs=args.compile_jobs,
+        raster_jobs=args.raster_jobs,
+        queue_size=args.queue_size,
+        png_width=args.png_width,
+        force=args.force,
+        count_geometry=args.count_geometry,
+        memory_threshold=args.memory_threshold if args.memory_profile else None,
+        profile=args.profile,
+        trace=args.trace,
+        metrics_file=args.metrics_file,
+        metrics_port=args.metrics_port,
+    ).run()
+    raise SystemExit(1 if failed else 0)
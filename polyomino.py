@@ -0,0 +1,164 @@
+"""
+Random polyominoes (connected sets of grid cells) and their outlines, used for arbitrary orthogonal shapes.
+
+A polyomino is a boolean grid indexed [x, y]. Its outline is the counter-clockwise vertex list of the
+outer boundary in cell units, with the first grown cell's bottom-left corner at the origin.
+"""
+
+import heapq
+import random
+from typing import Dict, List, Literal
+
+import numpy as np
+from scipy import ndimage
+
+NEIGHBOR_OFFSETS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+
+def grow_polyomino(n_cells: int, selection_order: Literal["random", "sequential"] = "random") -> np.ndarray:
+    """
+    grow n_cells connected cells from the center of a (2 * n_cells + 1)^2 grid.
+
+    "random" picks a uniformly random frontier cell in O(1) (swap with the last one and pop),
+    "sequential" always picks the bottom-most, then left-most frontier cell.
+    """
+    size = 2 * n_cells + 1
+    grid = np.zeros((size, size), dtype=bool)
+    seen = np.zeros((size, size), dtype=bool)  # cells that are in the polyomino or have been in the frontier
+    frontier = []  # list for "random", heap of (y, x) for "sequential"
+
+    def add_neighbors(x, y):
+        for dx, dy in NEIGHBOR_OFFSETS:
+            nx, ny = x + dx, y + dy
+            if not seen[nx, ny]:
+                seen[nx, ny] = True
+                if selection_order == "sequential":
+                    heapq.heappush(frontier, (ny, nx))
+                else:
+                    frontier.append((nx, ny))
+
+    grid[n_cells, n_cells] = seen[n_cells, n_cells] = True
+    add_neighbors(n_cells, n_cells)
+    for _ in range(n_cells - 1):
+        if selection_order == "sequential":
+            y, x = heapq.heappop(frontier)
+        else:
+            index = random.randrange(len(frontier))
+            frontier[index], frontier[-1] = frontier[-1], frontier[index]
+            x, y = frontier.pop()
+        grid[x, y] = True
+        add_neighbors(x, y)
+    return grid
+
+
+def has_pinch(grid: np.ndarray) -> bool:
+    """whether two cells touch only at a corner, which would make the outline self-touching"""
+    bottom_left, bottom_right = grid[:-1, :-1], grid[1:, :-1]
+    top_left, top_right = grid[:-1, 1:], grid[1:, 1:]
+    return bool(
+        np.any(
+            (bottom_left & top_right & ~bottom_right & ~top_left)
+            | (bottom_right & top_left & ~bottom_left & ~top_right)
+        )
+    )
+
+
+def trace_outline(grid: np.ndarray) -> np.ndarray:
+    """
+    vertices of the boundary of a hole-free, pinch-free grid, counter-clockwise, collinear vertices merged.
+    coordinates are grid indices of cell corners
+    """
+    padded = np.pad(grid, 1)
+    width, height = grid.shape
+    x, y = np.nonzero(grid)
+
+    # directed boundary edges of every cell side that faces an empty cell, interior on the left
+    bottom = ~padded[1:-1, :-2][x, y]
+    right = ~padded[2:, 1:-1][x, y]
+    top = ~padded[1:-1, 2:][x, y]
+    left = ~padded[:-2, 1:-1][x, y]
+    starts = np.concatenate(
+        [
+            np.column_stack([x, y])[bottom],
+            np.column_stack([x + 1, y])[right],
+            np.column_stack([x + 1, y + 1])[top],
+            np.column_stack([x, y + 1])[left],
+        ]
+    )
+    ends = np.concatenate(
+        [
+            np.column_stack([x + 1, y])[bottom],
+            np.column_stack([x + 1, y + 1])[right],
+            np.column_stack([x, y + 1])[top],
+            np.column_stack([x, y])[left],
+        ]
+    )
+
+    # every corner has exactly one outgoing edge, so the boundary is a single successor chain
+    corner_ids = lambda points: points[:, 0] * (height + 1) + points[:, 1]
+    successor = np.full((width + 1) * (height + 1), -1)
+    successor[corner_ids(starts)] = corner_ids(ends)
+    successor = successor.tolist()
+    first = int(corner_ids(starts[:1])[0])
+    chain = [first]
+    current = successor[first]
+    while current != first:
+        chain.append(current)
+        current = successor[current]
+    assert len(chain) == len(starts), "boundary is not a single loop"
+
+    vertices = np.column_stack(np.divmod(np.array(chain), height + 1))
+    incoming = vertices - np.roll(vertices, 1, axis=0)
+    outgoing = np.roll(vertices, -1, axis=0) - vertices
+    turns = incoming[:, 0] * outgoing[:, 1] - incoming[:, 1] * outgoing[:, 0]
+    return vertices[turns != 0]
+
+
+def random_outline(n_cells: int, selection_order: Literal["random", "sequential"] = "random") -> np.ndarray:
+    """outline of a random polyomino. holes are filled, polyominoes with pinch points are grown again"""
+    while True:
+        grid = ndimage.binary_fill_holes(grow_polyomino(n_cells, selection_order))
+        if not has_pinch(grid):
+            return trace_outline(grid) - n_cells  # the first cell starts at the origin
+
+
+def transform_d4(vertices: np.ndarray, index: int) -> np.ndarray:
+    """one of the 8 rotations / reflections of the square, keeping counter-clockwise order"""
+    quarter_turns, reflect = index % 4, index >= 4
+    cos, sin = [(1, 0), (0, 1), (-1, 0), (0, -1)][quarter_turns]
+    vertices = vertices.dot(np.array([[cos, sin], [-sin, cos]]))
+    if reflect:
+        vertices = vertices * np.array([-1, 1])
+        vertices = vertices[::-1]
+    return vertices
+
+
+class OutlineLibrary:
+    """
+    Outlines kept per cell count and reused with a random rotation or reflection.
+    The first `library_size` requests for a cell count generate new outlines, later ones sample them.
+    """
+
+    def __init__(self) -> None:
+        self.outlines: Dict[int, List[np.ndarray]] = {}
+
+    def sample(self, n_cells: int, library_size: int) -> np.ndarray:
+        outlines = self.outlines.setdefault(n_cells, [])
+        if len(outlines) < library_size:
+            outlines.append(random_outline(n_cells))
+            return outlines[-1]
+        return transform_d4(random.choice(outlines), random.randrange(8))
+
+
+OUTLINE_LIBRARY = OutlineLibrary()
+
+
+def sample_outline(
+    n_cells: int,
+    library_size: int = 0,
+    selection_order: Literal["random", "sequential"] = "random",
+) -> np.ndarray:
+    """outline of an arbitrary orthogonal shape; with library_size > 0 outlines are drawn from OUTLINE_LIBRARY"""
+    if library_size > 0 and selection_order == "random":
+        return OUTLINE_LIBRARY.sample(n_cells, library_size)
+    return random_outline(n_cells, selection_order)
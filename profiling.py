@@ -0,0 +1,113 @@
+"""
+cProfile capture for generation runs (--profile).
+
+Each worker (a benchmark process, the pipeline's generation thread, the gen_rand_tikz process) profiles its own
+calls and dumps them to <profile dir>/<worker>.pstats. `write_reports` merges the dumps of a run into
+
+    merged.pstats       all workers, loadable with pstats / snakeviz
+    report.txt          functions of project modules by cumulative time
+    stacks.collapsed    "caller;callee;... microseconds" lines for flamegraph.pl, speedscope, inferno
+
+cProfile only records caller -> callee edges, so the collapsed stacks are rebuilt from the call graph: a
+function's time on a path is its total time split in proportion to the time each caller spent calling it.
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import re
+import threading
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+REPORT_LIMIT = 60
+MAX_STACK_DEPTH = 100
+MIN_STACK_SHARE = 1e-4  # paths below this share of the total time are left out of the collapsed stacks
+
+Function = Tuple[str, int, str]  # (file, line, name), as in pstats
+
+
+class WorkerProfiles:
+    """one cProfile.Profile per thread, accumulated over every call wrapped with `profiled`"""
+
+    def __init__(self) -> None:
+        self.profiles: Dict[str, cProfile.Profile] = {}
+        self._lock = threading.Lock()
+
+    def profiled(self, work):
+        def wrapper(*args, **kwargs):
+            name = threading.current_thread().name
+            with self._lock:
+                profile = self.profiles.setdefault(name, cProfile.Profile())
+            profile.enable()
+            try:
+                return work(*args, **kwargs)
+            finally:
+                profile.disable()
+
+        return wrapper
+
+    def dump(self, profile_dir: str, prefix: str = "") -> List[str]:
+        os.makedirs(profile_dir, exist_ok=True)
+        paths = []
+        for name, profile in self.profiles.items():
+            paths.append(os.path.join(profile_dir, f"{prefix}{name}.pstats"))
+            profile.dump_stats(paths[-1])
+        return paths
+
+
+def frame_name(function: Function) -> str:
+    path, line, name = function
+    if path == "~":  # builtins
+        return name.replace(";", ",")
+    return f"{name} ({os.path.relpath(path, ROOT) if path.startswith(ROOT) else os.path.basename(path)}:{line})".replace(";", ",")
+
+
+def collapsed_stacks(stats: pstats.Stats) -> List[str]:
+    """folded stacks with microseconds of self time, see the module docstring"""
+    entries = stats.stats  # function -> (primitive calls, calls, self time, cumulative time, callers)
+    children: Dict[Function, Dict[Function, float]] = {}
+    for function, (_, _, _, _, callers) in entries.items():
+        for caller, (_, _, _, cumulative) in callers.items():
+            children.setdefault(caller, {})[function] = cumulative
+    roots = [function for function, entry in entries.items() if not entry[4]]
+    total = sum(entries[root][3] for root in roots) or 1.0
+
+    folded: Dict[str, float] = {}
+    pending = [(root, entries[root][3], (frame_name(root),), frozenset([root])) for root in roots]
+    while pending:
+        function, seconds, path, on_path = pending.pop()
+        _, _, self_time, cumulative, _ = entries[function]
+        share = seconds / cumulative if cumulative > 0 else 0.0
+        key = ";".join(path)
+        folded[key] = folded.get(key, 0.0) + self_time * share
+        if len(path) >= MAX_STACK_DEPTH:
+            continue
+        for child, child_seconds in children.get(function, {}).items():
+            child_seconds *= share
+            if child in on_path or child_seconds / total < MIN_STACK_SHARE:
+                continue  # recursion is accounted to the outermost call
+            pending.append((child, child_seconds, path + (frame_name(child),), on_path | {child}))
+
+    return [f"{key} {round(seconds * 1e6)}" for key, seconds in sorted(folded.items()) if seconds * 1e6 >= 1]
+
+
+def project_report(stats: pstats.Stats, limit: int = REPORT_LIMIT) -> str:
+    """functions defined in this repository, by cumulative time"""
+    stream = io.StringIO()
+    stats.stream = stream
+    stats.sort_stats("cumulative").print_stats(re.escape(ROOT + os.sep), limit)
+    return stream.getvalue()
+
+
+def write_reports(paths: List[str], profile_dir: str) -> str:
+    """merge per-worker pstats files into the reports listed in the module docstring, return the report text"""
+    stats = pstats.Stats(*paths)
+    stats.dump_stats(os.path.join(profile_dir, "merged.pstats"))
+    report = project_report(stats)
+    with open(os.path.join(profile_dir, "report.txt"), "w", encoding="utf-8") as f:
+        f.write(report)
+    with open(os.path.join(profile_dir, "stacks.collapsed"), "w", encoding="utf-8") as f:
+        f.write("\n".join(collapsed_stacks(stats)) + "\n")
+    return report
@@ -0,0 +1,300 @@
+"""
+Native raster backend: draws panels straight from their shapely geometries into a PNG,
+without going through TikZ -> pdflatex -> pdf2image.
+
+The TikZ backend remains the high-fidelity path. This module approximates its output:
+fill colors mixed with white by `Lightness` (xcolor `red!40` semantics), fill opacity,
+outline thickness and dash styles, and the fill patterns listed in `img_params.Pattern`.
+"""
+
+from typing import Callable, Dict, Iterator, List
+
+import numpy as np
+from PIL import Image, ImageDraw
+from shapely import LineString, LinearRing, MultiLineString, MultiPolygon, Polygon
+from shapely.geometry.base import BaseGeometry, BaseMultipartGeometry
+
+import img_params
+from entities.closed_shape import ClosedShape
+from entities.line_segment import LineSegment
+from entities.smooth_curve import SmoothCurve
+from entities.visible_shape import VisibleShape
+from generation_config import GenerationConfig
+from panel import Panel
+from util import canvas_to_pixel
+
+MM_PER_UNIT = 5.0  # tikzpicture is drawn with scale=0.5, so 1 coordinate unit is 0.5cm
+MM_PER_PT = 0.3515
+DEFAULT_LINE_WIDTH_PT = 0.4
+ULTRA_THICK_PT = 1.6
+
+# base colors of xcolor, in rgb floats
+COLOR_RGB = {
+    "white": (1.0, 1.0, 1.0),
+    "black": (0.0, 0.0, 0.0),
+    "red": (1.0, 0.0, 0.0),
+    "green": (0.0, 1.0, 0.0),
+    "blue": (0.0, 0.0, 1.0),
+    "cyan": (0.0, 1.0, 1.0),
+    "magenta": (1.0, 0.0, 1.0),
+    "yellow": (1.0, 1.0, 0.0),
+    "purple": (0.75, 0.0, 0.25),
+    "brown": (0.75, 0.5, 0.25),
+    "orange": (1.0, 0.5, 0.0),
+}
+
+# dash patterns of TikZ, as alternating on/off lengths in pt. "lw" stands for the current line width
+DASH_PATTERNS_PT = {
+    img_params.Outline.solid: None,
+    img_params.Outline.dotted: [0.4, 2],
+    img_params.Outline.denselyDotted: [0.4, 1],
+    img_params.Outline.looselyDotted: [0.4, 4],
+    img_params.Outline.dashed: [3, 3],
+    img_params.Outline.denselyDashed: [3, 2],
+    img_params.Outline.looselyDashed: [3, 6],
+    img_params.Outline.dashDot: [3, 2, "lw", 2],
+    img_params.Outline.denselyDashDot: [3, 1, "lw", 1],
+    img_params.Outline.dashDotDot: [3, 2, "lw", 2, "lw", 2],
+    img_params.Outline.denselyDashDotDot: [3, 1, "lw", 1, "lw", 1],
+    img_params.Outline.looselyDashDotDot: [3, 4, "lw", 4, "lw", 4],
+}
+
+
+def _near(values: np.ndarray, period: float, offset: float, half_width: float) -> np.ndarray:
+    """whether values lie within half_width of offset, modulo period"""
+    d = np.abs(np.mod(values - offset + period / 2, period) - period / 2)
+    return d <= half_width
+
+
+def _dots(x, y, period, radius, offset=(0.0, 0.0)):
+    dx = np.mod(x - offset[0], period) - period / 2
+    dy = np.mod(y - offset[1], period) - period / 2
+    return dx**2 + dy**2 <= radius**2
+
+
+# approximations of the tikz `patterns` library, as functions of page coordinates in pt
+PATTERN_MASKS: Dict[img_params.Pattern, Callable[[np.ndarray, np.ndarray], np.ndarray]] = {
+    img_params.Pattern.horizontalLines: lambda x, y: _near(y, 4, 2, 0.2),
+    img_params.Pattern.verticalLines: lambda x, y: _near(x, 4, 2, 0.2),
+    img_params.Pattern.northEastLines: lambda x, y: _near(x - y, 3, 0, 0.28),
+    img_params.Pattern.northWestLines: lambda x, y: _near(x + y, 3, 0, 0.28),
+    img_params.Pattern.grid: lambda x, y: _near(x, 3, 0, 0.2) | _near(y, 3, 0, 0.2),
+    img_params.Pattern.crosshatch: lambda x, y: _near(x - y, 3, 0, 0.28)
+    | _near(x + y, 3, 0, 0.28),
+    img_params.Pattern.dots: lambda x, y: _dots(x, y, 3, 0.5),
+    img_params.Pattern.crosshatchDots: lambda x, y: _dots(x, y, 3, 0.5)
+    | _dots(x, y, 3, 0.5, offset=(1.5, 1.5)),
+    img_params.Pattern.fivepointedStars: lambda x, y: _dots(x, y, 3, 0.8),
+    img_params.Pattern.sixpointedStars: lambda x, y: _dots(x, y, 3, 0.9),
+    img_params.Pattern.bricks: lambda x, y: _near(y, 5, 0, 0.2)
+    | (_near(x + 5 * (np.floor(y / 5) % 2), 10, 0, 0.2)),
+    img_params.Pattern.checkerboard: lambda x, y: (np.floor(x / 4) + np.floor(y / 4)) % 2 == 0,
+}
+
+
+def mix_with_white(color_name: str, lightness: int) -> np.ndarray:
+    """xcolor `color!lightness`: lightness percent of the color, the rest white"""
+    ratio = lightness / 100.0
+    return np.array(COLOR_RGB[color_name]) * ratio + (1.0 - ratio)
+
+
+def iter_polygons(geometry: BaseGeometry) -> Iterator[Polygon]:
+    if isinstance(geometry, Polygon):
+        if not geometry.is_empty:
+            yield geometry
+    elif isinstance(geometry, BaseMultipartGeometry):
+        for geom in geometry.geoms:
+            yield from iter_polygons(geom)
+
+
+def iter_lines(geometry: BaseGeometry) -> Iterator[np.ndarray]:
+    """coordinates of every 1d component of the geometry, rings included"""
+    if isinstance(geometry, (LineString, LinearRing)):
+        if not geometry.is_empty:
+            yield np.asarray(geometry.coords)
+    elif isinstance(geometry, Polygon):
+        yield from iter_lines(geometry.exterior)
+        for interior in geometry.interiors:
+            yield from iter_lines(interior)
+    elif isinstance(geometry, (MultiPolygon, MultiLineString, BaseMultipartGeometry)):
+        for geom in geometry.geoms:
+            yield from iter_lines(geom)
+
+
+def split_dashes(coords: np.ndarray, pattern: List[float]) -> List[np.ndarray]:
+    """cut a polyline into the "on" pieces of a dash pattern (lengths in the same unit as coords)"""
+    seg_lengths = np.linalg.norm(np.diff(coords, axis=0), axis=1)
+    cumulative = np.concatenate([[0.0], np.cumsum(seg_lengths)])
+    total = cumulative[-1]
+    period = sum(pattern)
+    if total <= 0 or period <= 0:
+        return [coords]
+
+    pieces = []
+    start = 0.0
+    while start < total:
+        for index, length in enumerate(pattern):
+            end = min(start + length, total)
+            if index % 2 == 0 and end > start:
+                inner = (cumulative > start) & (cumulative < end)
+                piece = np.vstack(
+                    [
+                        [np.interp(start, cumulative, coords[:, 0]), np.interp(start, cumulative, coords[:, 1])],
+                        coords[inner],
+                        [np.interp(end, cumulative, coords[:, 0]), np.interp(end, cumulative, coords[:, 1])],
+                    ]
+                )
+                pieces.append(piece)
+            start = end
+            if start >= total:
+                break
+    return pieces
+
+
+class RasterCanvas:
+    """an rgb float image covering the whole tikz canvas, centered at (0, 0)"""
+
+    def __init__(self, width: int, height: int, canvas_width: float, canvas_height: float) -> None:
+        self.width = width
+        self.height = height
+        self.canvas_width = canvas_width
+        self.canvas_height = canvas_height
+        self.px_per_unit = width / canvas_width
+        self.px_per_pt = self.px_per_unit / MM_PER_UNIT * MM_PER_PT
+        self.pixels = np.ones((height, width, 3), dtype=np.float32)
+
+    def to_pixel(self, coords: np.ndarray) -> np.ndarray:
+        """same mapping as the annotations of combine_json"""
+        return canvas_to_pixel(coords, (self.width, self.height), (self.canvas_width, self.canvas_height))
+
+    def _window(self, pixel_coords: np.ndarray, margin: float):
+        """integer pixel bounds of the area touched by the coordinates, clipped to the image"""
+        x0 = max(int(np.floor(pixel_coords[:, 0].min() - margin)), 0)
+        y0 = max(int(np.floor(pixel_coords[:, 1].min() - margin)), 0)
+        x1 = min(int(np.ceil(pixel_coords[:, 0].max() + margin)) + 1, self.width)
+        y1 = min(int(np.ceil(pixel_coords[:, 1].max() + margin)) + 1, self.height)
+        return x0, y0, x1, y1
+
+    def _composite(self, window, mask: np.ndarray, color: np.ndarray, alpha: float = 1.0):
+        x0, y0, x1, y1 = window
+        coverage = (mask.astype(np.float32) / 255.0 * alpha)[..., None]
+        region = self.pixels[y0:y1, x0:x1]
+        region *= 1.0 - coverage
+        region += coverage * color
+
+    def polygon_mask(self, geometry: BaseGeometry):
+        polygons = list(iter_polygons(geometry))
+        if not polygons:
+            return None, None
+        all_coords = np.vstack([self.to_pixel(p.exterior.coords) for p in polygons])
+        window = self._window(all_coords, margin=1)
+        x0, y0, x1, y1 = window
+        if x1 <= x0 or y1 <= y0:
+            return None, None
+        mask = Image.new("L", (x1 - x0, y1 - y0), 0)
+        draw = ImageDraw.Draw(mask)
+        offset = np.array([x0, y0])
+        for polygon in polygons:
+            draw.polygon([tuple(p) for p in self.to_pixel(polygon.exterior.coords) - offset], fill=255)
+            for interior in polygon.interiors:
+                draw.polygon([tuple(p) for p in self.to_pixel(interior.coords) - offset], fill=0)
+        return window, np.asarray(mask)
+
+    def fill(self, geometry: BaseGeometry, color: np.ndarray, opacity: float = 1.0):
+        window, mask = self.polygon_mask(geometry)
+        if mask is not None:
+            self._composite(window, mask, color, opacity)
+
+    def fill_pattern(self, geometry: BaseGeometry, pattern: img_params.Pattern, color: np.ndarray):
+        if pattern not in PATTERN_MASKS:
+            return
+        window, mask = self.polygon_mask(geometry)
+        if mask is None:
+            return
+        x0, y0, x1, y1 = window
+        # pattern cells are anchored to the page, so adjacent shapes share the same phase
+        xs = (np.arange(x0, x1) + 0.5) / self.px_per_pt
+        ys = (self.height - np.arange(y0, y1) - 0.5) / self.px_per_pt
+        grid_x, grid_y = np.meshgrid(xs, ys)
+        pattern_mask = PATTERN_MASKS[pattern](grid_x, grid_y)
+        self._composite(window, np.where(pattern_mask, mask, 0), color)
+
+    def stroke(self, geometry: BaseGeometry, color: np.ndarray, line_width_pt: float, outline=img_params.Outline.solid):
+        line_width = max(line_width_pt * self.px_per_pt, 1.0)
+        dash = DASH_PATTERNS_PT.get(outline)
+        if dash is not None:
+            dash = [(line_width_pt if length == "lw" else length) * self.px_per_pt for length in dash]
+
+        lines = [self.to_pixel(coords) for coords in iter_lines(geometry)]
+        if not lines:
+            return
+        window = self._window(np.vstack(lines), margin=line_width)
+        x0, y0, x1, y1 = window
+        if x1 <= x0 or y1 <= y0:
+            return
+        mask = Image.new("L", (x1 - x0, y1 - y0), 0)
+        draw = ImageDraw.Draw(mask)
+        offset = np.array([x0, y0])
+        for line in lines:
+            pieces = [line] if dash is None else split_dashes(line, dash)
+            for piece in pieces:
+                draw.line([tuple(p) for p in piece - offset], fill=255, width=round(line_width), joint="curve")
+        self._composite(window, np.asarray(mask), color)
+
+    def draw_shape(self, shape: VisibleShape):
+        geometry = shape.base_geometry
+        if isinstance(shape, (LineSegment, SmoothCurve)):
+            self.stroke(geometry, mix_with_white(shape.color.name, 100), ULTRA_THICK_PT, shape.line_pattern)
+            return
+        if not isinstance(shape, ClosedShape):
+            return
+        if isinstance(geometry, (LineString, MultiLineString)):
+            self.stroke(geometry, mix_with_white(shape.color.name, 100), DEFAULT_LINE_WIDTH_PT)
+            return
+
+        self.fill(
+            geometry,
+            mix_with_white(shape.color.name, shape.lightness.value),
+            GenerationConfig.opacity,
+        )
+        if shape.shape == img_params.Type.INTERSECTIONREGION:
+            return
+        if shape.pattern != img_params.Pattern.blank:
+            pattern_color = shape.pattern_color.name.removeprefix("pattern").lower()
+            self.fill_pattern(
+                geometry,
+                shape.pattern,
+                mix_with_white(pattern_color, shape.pattern_lightness.value),
+            )
+        if shape.outline_thickness != img_params.OutlineThickness.noOutline:
+            outline_color = shape.outline_color.name.removeprefix("outline").lower()
+            line_width_pt = shape.outline_thickness.value * 0.1 / MM_PER_PT
+            self.stroke(
+                geometry,
+                mix_with_white(outline_color, shape.outline_lightness.value),
+                line_width_pt,
+                shape.outline,
+            )
+
+    def to_image(self) -> Image.Image:
+        return Image.fromarray(np.clip(self.pixels * 255.0 + 0.5, 0, 255).astype(np.uint8), "RGB")
+
+
+def render_panels(panels: List[Panel], output_path: str, width: int = None, supersample: int = 2):
+    """rasterize the panels, in the same drawing order as the tikz backend, and save as png"""
+    width = width if width is not None else GenerationConfig.raster_image_width
+    canvas_width = GenerationConfig.canvas_width
+    canvas_height = GenerationConfig.canvas_height
+    height = max(round(width * canvas_height / canvas_width), 1)
+
+    canvas = RasterCanvas(width * supersample, height * supersample, canvas_width, canvas_height)
+    for panel in panels:
+        canvas.draw_shape(panel.background)
+        for shape in panel.shapes:
+            canvas.draw_shape(shape)
+
+    image = canvas.to_image()
+    if supersample > 1:
+        image = image.resize((width, height), Image.Resampling.BOX)
+    image.save(output_path, "PNG")
+    return output_path
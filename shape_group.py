@@ -3,12 +3,14 @@ import inspect
 from typing import List, Optional, Tuple, Union
 
 import numpy as np
-from shapely import LineString, MultiPolygon, Polygon, unary_union
+import shapely
+from shapely import LineString, MultiPolygon, Polygon, STRtree, unary_union
 from shapely.geometry import (GeometryCollection, LinearRing, MultiLineString,
                               Point)
 from shapely.geometry.base import BaseGeometry
 
 import img_params
+import telemetry
 from entities.closed_shape import ClosedShape
 from entities.complex_shape import ComplexShape
 from entities.visible_shape import VisibleShape
@@ -16,9 +18,102 @@ from generation_config import GenerationConfig
 from panel import Panel
 
 
+class OverlapResolver:
+    """
+    Replays the additions recorded by a ShapeGroup and creates its intersection regions in one pass.
+
+    Whenever a closed shape is added, every layer it partially overlaps gets the intersection of the shape
+    and that layer as new regions `layer + 1` above it. A region is part of the shape it was cut from, so
+    only layers holding shapes or regions of intersecting primary shapes can produce one; these pairs come
+    from a single STRtree query over the final primary geometries.
+    """
+
+    def __init__(self, primary_shapes: List[VisibleShape]) -> None:
+        closed_shapes = [shape for shape in primary_shapes if isinstance(shape, ClosedShape)]
+        self.origin = {id(shape): index for index, shape in enumerate(closed_shapes)}
+        self.neighbors = [set() for _ in closed_shapes]
+        if closed_shapes:
+            tree = STRtree([shape.base_geometry for shape in closed_shapes])
+            for i, j in zip(*tree.query(tree.geometries, predicate="intersects").tolist()):
+                self.neighbors[i].add(j)
+        # id(layer list) -> (layer list, shape count, origins, union or None). the list is kept and compared with
+        # `is`, an id of a freed list (nested replay results, popped padding layers) can be reused by a new one
+        self.layer_cache = {}
+
+    def layer_state(self, layer: List[VisibleShape]):
+        cached_layer, count, origins, union = self.layer_cache.get(id(layer), (None, -1, None, None))
+        if cached_layer is not layer or count != len(layer):  # layers only grow while replaying
+            origins = set(self.origin[id(shape)] for shape in layer if isinstance(shape, ClosedShape))
+            count, union = len(layer), None
+            self.layer_cache[id(layer)] = (layer, count, origins, union)
+        return origins
+
+    def layer_union(self, layer: List[VisibleShape]) -> BaseGeometry:
+        _, count, origins, union = self.layer_cache[id(layer)]
+        if union is None:
+            union = unary_union([shape.base_geometry for shape in layer if isinstance(shape, ClosedShape)])
+            self.layer_cache[id(layer)] = (layer, count, origins, union)
+        return union
+
+    def add(self, layers: List[List[VisibleShape]], shape: VisibleShape, layer: int):
+        padded_layer = len(layers) + layer + 1
+        while len(layers) <= padded_layer:
+            layers.append([])
+        geometry = shape.base_geometry
+        if isinstance(shape, ClosedShape) and not isinstance(geometry, (LineString, MultiLineString)):
+            neighbors = self.neighbors[self.origin[id(shape)]]
+            candidates = [
+                layer_cnt
+                for layer_cnt, shapes in enumerate(layers)
+                if not neighbors.isdisjoint(self.layer_state(shapes))
+            ]
+            if candidates:
+                unions = np.array([self.layer_union(layers[layer_cnt]) for layer_cnt in candidates])
+                overlapping = (
+                    shapely.overlaps(geometry, unions)
+                    & ~shapely.contains(geometry, unions)
+                    & ~shapely.contains(unions, geometry)
+                )
+                intersections = shapely.intersection(geometry, unions[overlapping])
+                for layer_cnt, union, intersection in zip(
+                    np.array(candidates)[overlapping].tolist(), unions[overlapping], intersections
+                ):
+                    if isinstance(union, (LineString, MultiLineString)):
+                        continue
+                    regions = ComplexShape.from_intersection(intersection)
+                    for region in regions:
+                        self.origin[id(region)] = self.origin[id(shape)]
+                    layers[layer_cnt + layer + 1].extend(regions)
+        layers[layer].append(shape)
+        while len(layers[-1]) == 0:  # remove unused layers
+            layers.pop()
+
+    def replay(self, initial_shapes: List[List[VisibleShape]], events: list) -> List[List[VisibleShape]]:
+        layers = [list(shapes) for shapes in initial_shapes]
+        for event, *args in events:
+            if event == "add":
+                self.add(layers, *args)
+            elif event == "top":
+                self.add(layers, args[0], len(layers) - 1)
+            elif event == "group":
+                for new_layer, shapes in enumerate(self.replay(*args)):
+                    for shape in shapes:
+                        self.add(layers, shape, new_layer)
+            elif event == "lift":
+                layers[0:0] = [[] for _ in range(args[0])]
+        return layers
+
+
 class ShapeGroup:
+    """
+    Layers of shapes. `shapes` only holds the shapes added by the generators; the intersection regions of
+    overlapping closed shapes are created once in `to_panel`, after all scaling and fitting is done.
+    """
+
     def __init__(self, shapes: List[List[VisibleShape]]) -> None:
         self.shapes = shapes if shapes is not None else [[]]
+        self.initial_shapes = [list(layer) for layer in self.shapes]
+        self.events = []  # additions and layer lifts, replayed by OverlapResolver
 
     def geometry(self, layer, include_1d = False) -> BaseGeometry:
         return unary_union(
@@ -36,7 +131,11 @@ class ShapeGroup:
 
     def add_group(self, new_shapes: Union[List[List[VisibleShape]], "ShapeGroup"]):
         if isinstance(new_shapes, ShapeGroup):
-            new_shapes = new_shapes.shapes
+            for new_layer, shapes_on_layer in enumerate(new_shapes.shapes):
+                self.pad_layer(new_layer)
+                self.shapes[new_layer].extend(shapes_on_layer)
+            self.events.append(("group", new_shapes.initial_shapes, list(new_shapes.events)))
+            return
 
         def validate_two_level_list(lst):
             if not isinstance(lst, list):
@@ -60,35 +159,30 @@ class ShapeGroup:
 
     @property
     def layer_num(self):
+        """number of layers without the intersection regions"""
         return len(self.shapes)
 
     def add_shape_on_layer(self, shape: VisibleShape, layer: int):
         """layer starts from 0"""
-        self.pad_layer(self.layer_num + layer + 1)
-        if isinstance(shape, ClosedShape):
-            overlapping_group = [[] for _ in range(len(self.shapes))]
-            for layer_cnt in range(len(self.shapes)):
-                if shape.base_geometry.overlaps(self.geometry(layer_cnt)) and not (
-                    shape.base_geometry.contains(self.geometry(layer_cnt))
-                    or self.geometry(layer_cnt).contains(shape.base_geometry)
-                ):
-                    overlapping_group[layer_cnt + layer + 1].extend(
-                        ComplexShape.from_overlapping_geometries(
-                            shape.base_geometry, self.geometry(layer_cnt)
-                        )
-                    )
-
-            for layer_cnt, shapes in enumerate(overlapping_group):
-                self.shapes[layer_cnt].extend(shapes)
+        self.pad_layer(layer)
         self.shapes[layer].append(shape)
-        while len(self.shapes[-1])==0: # remove unused layers
-            self.shapes.pop()
+        self.events.append(("add", shape, layer))
+
+    def add_shape_on_top_layer(self, shape: VisibleShape):
+        """add to the topmost layer, counting the layers of the intersection regions"""
+        self.pad_layer(0)
+        self.shapes[-1].append(shape)
+        self.events.append(("top", shape))
+
+    def with_overlap_regions(self) -> List[List[VisibleShape]]:
+        """layers including the intersection regions, computed from the current geometries"""
+        return OverlapResolver(self.flattened()).replay(self.initial_shapes, self.events)
 
     def __add__(self, other):
         if isinstance(other, VisibleShape):
             self.add_shape(other)
         elif isinstance(other, ShapeGroup):
-            self.add_group(other.shapes)
+            self.add_group(other)
         elif isinstance(other, list) and all(
             isinstance(item, VisibleShape) for item in other
         ):
@@ -144,6 +238,20 @@ class ShapeGroup:
 
 
     def to_panel(self, top_left, bottom_right):
+        with telemetry.stage("fit_panel"):
+            self.fit_panel(top_left, bottom_right)
+        with telemetry.stage("overlap_regions"):
+            layers = self.with_overlap_regions()
+        flattened_list = [item for sublist in layers for item in sublist]
+        return Panel(
+            top_left=top_left,
+            bottom_right=bottom_right,
+            shapes=flattened_list,
+            joints=[],
+        )
+
+    def fit_panel(self, top_left, bottom_right):
+        """shift and scale the group into the panel"""
         panel_center = (
             (top_left[0] + bottom_right[0]) / 2,
             (top_left[1] + bottom_right[1]) / 2,
@@ -190,14 +298,6 @@ class ShapeGroup:
             # 如果多次尝试后仍然不适应，才使用更激进的缩放
             if attempt > 5:
                 scale_factor = 0.9
-        
-        flattened_list = [item for sublist in self.shapes for item in sublist]
-        return Panel(
-            top_left=top_left,
-            bottom_right=bottom_right,
-            shapes=flattened_list,
-            joints=[],
-        )
 
     def show(self):
         for layer in self.shapes:
@@ -209,6 +309,7 @@ class ShapeGroup:
     def lift_up_layer(self, by: int = 1):
         for _ in range(by):
             self.shapes.insert(0, [])
+        self.events.append(("lift", by))
 
     def fit_canvas(self):
         while self.exceeds_canvas():
@@ -0,0 +1,159 @@
+"""
+Per-image stage timers.
+
+While an image is generated, `stage(name)` blocks and `generator(name)` calls add their wall time to the
+image's ImageStats: stages by name, image generators by "<generator>@<nesting depth>". Times are
+inclusive (e.g. "write_tex" contains the streamed "tikz_convert"). Each image's stats are written next to
+its json as <prefix><n>.stats.json and summed up at the end of a run with `aggregate`.
+
+A timer is two perf_counter calls and a dict update, cheap enough to stay on in production runs.
+With memory_profile enabled, images and top-level generators also record their memory, see memory_profile.py.
+With trace_events enabled, stages and generators are also recorded as trace spans, see trace_events.py.
+With live_metrics enabled, image and generator times also go to its latency histograms, see live_metrics.py.
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import live_metrics
+import memory_profile
+import trace_events
+
+_local = threading.local()  # the image being generated on this thread
+
+
+class ImageStats:
+    def __init__(self, image: str, config: Optional[str] = None) -> None:
+        self.image = image
+        self.config = config  # the input config the image was generated from
+        self.memory = memory_profile.ImageMemory() if memory_profile.enabled else None
+        self.started = time.perf_counter()
+        self.total_seconds: Optional[float] = None
+        self.stages: Dict[str, dict] = {}
+        self.generators: Dict[str, dict] = {}
+        self.depth = 0  # nesting depth of the image generator being run
+
+    @staticmethod
+    def add(records: Dict[str, dict], key: str, seconds: float):
+        record = records.setdefault(key, {"count": 0, "seconds": 0.0})
+        record["count"] += 1
+        record["seconds"] += seconds
+
+    def finish(self):
+        self.total_seconds = time.perf_counter() - self.started
+        if self.memory is not None:
+            self.memory.finish()
+
+    def to_dict(self) -> dict:
+        stats = {
+            "image": self.image,
+            "config": self.config,
+            "total_seconds": self.total_seconds,
+            "stages": self.stages,
+            "generators": self.generators,
+        }
+        if self.memory is not None:
+            stats["memory"] = self.memory.to_dict()
+        return stats
+
+    def write(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=4)
+
+
+def start_image(image: str, config: Optional[str] = None) -> ImageStats:
+    _local.stats = ImageStats(image, config)
+    return _local.stats
+
+
+def finish_image() -> Optional[ImageStats]:
+    stats = current()
+    if stats is not None:
+        stats.finish()
+        if live_metrics.enabled:
+            live_metrics.observe("image_seconds", stats.total_seconds)
+    _local.stats = None
+    return stats
+
+
+def current() -> Optional[ImageStats]:
+    return getattr(_local, "stats", None)
+
+
+@contextmanager
+def stage(name: str, trace: bool = True):
+    stats = current()
+    if stats is None:  # generation outside of an image, e.g. from a test
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        stats.add(stats.stages, name, seconds)
+        if trace and trace_events.enabled:
+            trace_events.record(name, "stage", start, seconds, image=stats.image)
+
+
+@contextmanager
+def generator(name: str):
+    stats = current()
+    if stats is None:
+        yield
+        return
+    stats.depth += 1
+    key = f"{name}@{stats.depth}"
+    track_memory = stats.memory is not None and stats.depth == 1
+    entered = stats.memory.enter_generator() if track_memory else None
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        stats.add(stats.generators, key, seconds)
+        if trace_events.enabled:
+            trace_events.record(name, "generator", start, seconds, image=stats.image, depth=stats.depth)
+        if live_metrics.enabled:
+            live_metrics.observe("generator_seconds", seconds, generator=name, depth=stats.depth)
+        if track_memory:
+            stats.memory.exit_generator(key, entered)
+        stats.depth -= 1
+
+
+def timed_iter(name: str, items: Iterable) -> Iterator:
+    """time the production of each item of a lazy iterable as stage `name`. items are too many to trace"""
+    iterator = iter(items)
+    while True:
+        with stage(name, trace=False):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+def aggregate(all_stats: List[dict]) -> dict:
+    """sum the stats dicts of several images"""
+    summary = {"images": len(all_stats), "total_seconds": 0.0, "stages": {}, "generators": {}}
+    for stats in all_stats:
+        summary["total_seconds"] += stats["total_seconds"] or 0.0
+        for group in ("stages", "generators"):
+            for key, record in stats[group].items():
+                total = summary[group].setdefault(key, {"count": 0, "seconds": 0.0})
+                total["count"] += record["count"]
+                total["seconds"] += record["seconds"]
+    return summary
+
+
+def format_summary(summary: dict) -> str:
+    lines = [f"[telemetry] {summary['images']} images, {summary['total_seconds']:.2f}s generating"]
+    for group in ("stages", "generators"):
+        records = sorted(summary[group].items(), key=lambda item: -item[1]["seconds"])
+        for key, record in records:
+            share = record["seconds"] / summary["total_seconds"] * 100 if summary["total_seconds"] else 0.0
+            lines.append(f"  {key:<32}{record['count']:>8} calls{record['seconds']:>10.3f}s{share:>7.1f}%")
+    return "\n".join(lines)
@@ -0,0 +1,46 @@
+import ast
+import os
+import sys
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import build_manifest
+
+# imported by generation code, but cannot change a generated image
+INSTRUMENTATION = {"geometry_counters", "live_metrics", "memory_profile", "profiling", "telemetry", "trace_events"}
+
+
+def project_imports(path: Path) -> set:
+    names = set()
+    for node in ast.walk(ast.parse(path.read_text(encoding="utf-8"))):
+        if isinstance(node, ast.Import):
+            names |= {alias.name for alias in node.names}
+        elif isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+            names.add(node.module)
+    modules = set()
+    for name in names:
+        module = name.replace(".", "/")
+        for candidate in (f"{module}.py", f"{module}/__init__.py"):
+            if (ROOT / candidate).is_file():
+                modules.add(candidate)
+    return modules
+
+
+class TestBuildManifest(unittest.TestCase):
+
+    def test_generation_sources_cover_what_generation_imports(self):
+        sources = set(build_manifest.GENERATION_SOURCES)
+        for source in sources:
+            self.assertTrue((ROOT / source).is_file(), source)
+            if not source.endswith(".py"):
+                continue
+            for module in project_imports(ROOT / source):
+                if os.path.splitext(module)[0] not in INSTRUMENTATION:
+                    self.assertIn(module, sources, f"{source} imports {module}")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+from shapely import Polygon
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import combine_json
+from raster_renderer import RasterCanvas
+
+
+def write_image(directory: str, index: int, shape_count: int):
+    Image.new("RGB", (200, 200), "white").save(f"{directory}/img-{index}.png")
+    shapes = [
+        {
+            "uid": i,
+            "shape": "triangle",
+            "position": [i, 0],
+            "base_geometry": {"type": "Polygon", "coordinates": [[[i, 1], [i - 1, -1], [i + 1, -1], [i, 1]]]},
+        }
+        for i in range(shape_count)
+    ]
+    panels = [{"shapes": shapes, "joints": [], "top_left": [-10, 10], "bottom_right": [10, -10]}]
+    with open(f"{directory}/img-{index}.json", "w") as f:
+        json.dump(panels, f)
+
+
+class TestCombineJson(unittest.TestCase):
+
+    def test_ids_follow_the_index_not_the_annotation_order(self):
+        combine_json.load_categories(str(ROOT / "categories.json"))
+        with tempfile.TemporaryDirectory() as directory:
+            write_image(directory, 0, shape_count=2)
+            write_image(directory, 1, shape_count=1)
+            annotated = {
+                index: combine_json.annotate_image(index, "img-", directory, directory, canvas_size=(20.0, 20.0))
+                for index in (1, 0)
+            }
+
+        labels = combine_json.new_labels_dict()
+        for index in sorted(annotated):
+            combine_json.add_image(labels, *annotated[index])
+        self.assertEqual([image["id"] for image in labels["images"]], [0, 1])
+        self.assertEqual(labels["images"][1]["file_name"], "img-1.png")
+        # a shape and its two position annotations share an id
+        ids = [(annotation["image_id"], annotation["id"]) for annotation in labels["annotations"]]
+        self.assertEqual(ids, [(0, 0)] * 3 + [(0, 1)] * 3 + [(1, 2)] * 3)
+
+    def test_annotation_bbox_matches_raster_pixels_on_non_square_canvas(self):
+        combine_json.load_categories(str(ROOT / "categories.json"))
+        coordinates = [[4.0, 6.0], [16.0, 6.0], [16.0, -2.0], [4.0, -2.0], [4.0, 6.0]]
+        canvas = RasterCanvas(400, 200, 40.0, 20.0)
+        canvas.fill(Polygon(coordinates), np.array([0.0, 0.0, 1.0]))
+        with tempfile.TemporaryDirectory() as directory:
+            canvas.to_image().save(f"{directory}/img-0.png")
+            shape = {"uid": 0, "shape": "square", "position": [10.0, 2.0], "base_geometry": {"type": "Polygon", "coordinates": [coordinates]}}
+            with open(f"{directory}/img-0.json", "w") as f:
+                json.dump([{"shapes": [shape], "joints": [], "top_left": [-20, 10], "bottom_right": [20, -10]}], f)
+            _, annotation_groups = combine_json.annotate_image(0, "img-", directory, directory, canvas_size=(40.0, 20.0))
+
+        rows, columns = np.nonzero(canvas.pixels.min(axis=2) < 0.5)
+        pixel_bbox = [columns.min(), rows.min(), columns.max() + 1 - columns.min(), rows.max() + 1 - rows.min()]
+        np.testing.assert_allclose(annotation_groups[0][0]["bbox"], pixel_bbox, atol=1)
+
+
+if __name__ == "__main__":
+    unittest.main()
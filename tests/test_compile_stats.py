@@ -0,0 +1,62 @@
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import compile_stats
+
+LOG = """Here is how much of TeX's memory you used:
+ 12417 strings out of 476041
+ 1866388 words of memory out of 5000000
+ 558832 words of font info for 38 fonts, out of 8000000 for 9000
+Output written on /tmp/pdflatex-x/new-0.pdf (1 page, 40212 bytes).
+"""
+
+
+class TestCompileStats(unittest.TestCase):
+
+    def test_parse_log(self):
+        values = compile_stats.parse_log(LOG)
+        self.assertEqual(values["pages"], 1)
+        self.assertEqual(values["pdf_bytes"], 40212)
+        self.assertEqual(values["tex_memory_words"], 1866388)
+        self.assertIsNone(compile_stats.parse_log("")["pages"])
+
+    def test_json_features(self):
+        panels = [
+            {
+                "shapes": [
+                    {"base_geometry": {"type": "Polygon", "coordinates": [[[0, 0], [1, 0], [0, 1], [0, 0]]]}, "pattern": "dots"},
+                    {"base_geometry": {"type": "LineString", "coordinates": [[0, 0], [1, 1]]}},
+                ]
+            }
+        ]
+        features = compile_stats.json_features(panels)
+        self.assertEqual(features, {"shapes": 2, "vertices": 6, "patterned_shapes": 1, "pattern:dots": 1})
+
+    def test_tex_features_tell_overlap_fills_from_shape_fills(self):
+        tex = (
+            "\\path [s0,postaction={draw,fill opacity=1,s1}] (0, 0) -- (1, 0) -- (0, 1) -- (0, 0);\n"
+            "\\fill [fill=red!50,fill opacity=0.5,] (0, 0) -- (0.5, 0) -- (0, 0.5) -- (0, 0);\n"
+            "\\draw [s0,postaction={draw,fill opacity=1,s1}] (1, 1) circle (2);\n"
+        )
+        features = compile_stats.tex_features(tex)
+        self.assertEqual(features["overlap_regions"], 1)
+        self.assertEqual(features["circles"], 1)
+        self.assertEqual(features["postactions"], 2)
+
+    def test_fit_recovers_costs(self):
+        records = [
+            {"image": str(i), "features": {"circles": i % 4, "overlap_regions": i // 4}, "log": {}}
+            for i in range(16)
+        ]
+        seconds = [0.5 + 0.1 * r["features"]["circles"] + 0.3 * r["features"]["overlap_regions"] for r in records]
+        rows = {row["feature"]: row for row in compile_stats.fit(records, seconds)}
+        self.assertAlmostEqual(rows["circles"]["per_unit"], 0.1)
+        self.assertAlmostEqual(rows["overlap_regions"]["per_unit"], 0.3)
+        self.assertAlmostEqual(rows["(fixed)"]["per_unit"], 0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
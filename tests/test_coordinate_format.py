@@ -0,0 +1,32 @@
+import sys
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from util import format_coord, format_number, format_trace, quantize_coords
+
+
+class TestCoordinateFormat(unittest.TestCase):
+
+    def test_format_number(self):
+        self.assertEqual(format_number(3.4999999999999996, 3), "3.5")
+        self.assertEqual(format_number(-1.2246467991283532e-16, 3), "0")
+        self.assertEqual(format_number(100.0, 0), "100")
+        self.assertEqual(format_number(-2.0004, 3), "-2")
+
+    def test_format_trace_drops_coinciding_vertices(self):
+        coords = [(0.0, 0.0), (1.0001, 0.0), (1.0, 0.0), (1.0, 1.0), (0.0, 0.0)]
+        self.assertEqual(format_trace(coords, 3), "(0, 0) -- (1, 0) -- (1, 1) -- (0, 0)")
+        self.assertEqual(format_coord((0.5, -0.25), 1), "(0.5, -0.2)")
+
+    def test_quantize_coords_snaps_negative_zero(self):
+        quantized = quantize_coords([[-1e-17, 2.00049]], 3)
+        np.testing.assert_array_equal(quantized, [[0.0, 2.0]])
+        self.assertFalse(np.signbit(quantized[0, 0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import sys
+import unittest
+from pathlib import Path
+
+import shapely
+from shapely import Polygon
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import geometry_counters
+from generation_config import GenerationConfig
+from shape_group import ShapeGroup
+
+
+class TestGeometryCounters(unittest.TestCase):
+
+    def setUp(self):
+        self.intersection = shapely.intersection
+        geometry_counters.reset()
+        geometry_counters.enable()
+
+    def tearDown(self):
+        geometry_counters.disable()
+        geometry_counters.reset()
+
+    def test_nested_operations_count_once(self):
+        square = Polygon([(0, 0), (2, 0), (2, 2), (0, 2)])
+        square.intersection(shapely.box(1, 1, 3, 3))  # calls shapely.intersection internally
+        self.assertEqual(geometry_counters.operations["-"]["intersection"][0], 1)
+
+    def test_operations_are_attributed_to_shape_group_methods(self):
+        ShapeGroup([[]]).geometry(0)
+        self.assertIn("ShapeGroup.geometry", geometry_counters.operations)
+
+    def test_config_lookups_are_counted(self):
+        getattr(GenerationConfig, "not_a_config_attribute", None)
+        self.assertEqual(geometry_counters.config_lookups["-"]["not_a_config_attribute"][0], 1)
+
+    def test_disable_restores_shapely(self):
+        geometry_counters.disable()
+        self.assertIs(shapely.intersection, self.intersection)
+
+
+if __name__ == "__main__":
+    unittest.main()
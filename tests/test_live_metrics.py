@@ -0,0 +1,46 @@
+import sys
+import unittest
+import urllib.request
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import live_metrics
+import telemetry
+
+
+class TestLiveMetrics(unittest.TestCase):
+
+    def tearDown(self):
+        live_metrics.enabled = False
+        live_metrics._histograms.clear()
+
+    def test_generator_histograms_are_served(self):
+        live_metrics.enable()
+        telemetry.start_image("img-0")
+        with telemetry.generator("ChainingImageGenerator"):
+            for _ in range(2):
+                with telemetry.generator("SimpleImageGenerator"):
+                    pass
+        telemetry.finish_image()
+
+        collect = lambda: "\n".join(
+            live_metrics.format_metric("images_completed_total", "counter", "completed images", [({}, 1)])
+            + live_metrics.format_histograms({})
+        )
+        server = live_metrics.serve(0, collect)
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics") as response:
+                text = response.read().decode("utf-8")
+        finally:
+            server.shutdown()
+
+        self.assertIn("# TYPE shapes_generator_seconds histogram", text)
+        self.assertIn('shapes_generator_seconds_count{depth="2",generator="SimpleImageGenerator"} 2', text)
+        self.assertIn('shapes_generator_seconds_bucket{depth="1",generator="ChainingImageGenerator",le="+Inf"} 1', text)
+        self.assertIn("shapes_image_seconds_count 1", text)
+        self.assertIn("shapes_images_completed_total 1", text)
+
+
+if __name__ == "__main__":
+    unittest.main()
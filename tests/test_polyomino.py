@@ -0,0 +1,60 @@
+import random
+import sys
+import unittest
+from pathlib import Path
+
+import numpy as np
+import shapely
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from polyomino import (OutlineLibrary, grow_polyomino, has_pinch, random_outline,
+                       trace_outline, transform_d4)
+
+
+class TestPolyomino(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(0)
+
+    def test_grow_polyomino_cell_count(self):
+        for selection_order in ["random", "sequential"]:
+            grid = grow_polyomino(20, selection_order)
+            self.assertEqual(grid.sum(), 20)
+
+    def test_outlines_are_simple_counter_clockwise_polygons(self):
+        for n_cells in [1, 4, 12, 60]:
+            for _ in range(20):
+                polygon = shapely.Polygon(random_outline(n_cells))
+                self.assertTrue(polygon.is_valid)
+                self.assertTrue(polygon.exterior.is_ccw)
+                self.assertGreaterEqual(polygon.area, n_cells)
+
+    def test_trace_outline_merges_collinear_vertices(self):
+        grid = np.zeros((3, 2), dtype=bool)
+        grid[:, 0] = True  # 3 x 1 bar
+        grid[0, 1] = True  # L shape
+        self.assertEqual(len(trace_outline(grid)), 6)
+        self.assertEqual(shapely.Polygon(trace_outline(grid)).area, 4)
+
+    def test_has_pinch(self):
+        self.assertTrue(has_pinch(np.array([[True, False], [False, True]])))
+        self.assertFalse(has_pinch(np.array([[True, True], [False, True]])))
+
+    def test_transform_d4_preserves_shape(self):
+        outline = random_outline(10)
+        area = shapely.Polygon(outline).area
+        for index in range(8):
+            polygon = shapely.Polygon(transform_d4(outline, index))
+            self.assertTrue(polygon.exterior.is_ccw)
+            self.assertAlmostEqual(polygon.area, area)
+
+    def test_library_reuses_outlines(self):
+        library = OutlineLibrary()
+        for _ in range(10):
+            library.sample(8, library_size=3)
+        self.assertEqual(len(library.outlines[8]), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
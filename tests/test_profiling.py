@@ -0,0 +1,34 @@
+import pstats
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import profiling
+
+
+def leaf():
+    return sum(i * i for i in range(20000))
+
+
+def branch():
+    return leaf() + leaf()
+
+
+class TestProfiling(unittest.TestCase):
+
+    def test_collapsed_stacks_follow_the_call_graph(self):
+        profiles = profiling.WorkerProfiles()
+        profiles.profiled(branch)()
+        profile = next(iter(profiles.profiles.values()))
+        lines = profiling.collapsed_stacks(pstats.Stats(profile))
+        stacks = {line.rsplit(" ", 1)[0]: int(line.rsplit(" ", 1)[1]) for line in lines}
+        leaf_stacks = [stack for stack in stacks if stack.split(";")[-1].startswith("leaf ")]
+        self.assertEqual(len(leaf_stacks), 1)
+        self.assertTrue(leaf_stacks[0].split(";")[-2].startswith("branch "))
+        self.assertTrue(all(seconds >= 1 for seconds in stacks.values()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import sys
+import unittest
+from pathlib import Path
+
+import numpy as np
+from shapely import Polygon
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from raster_renderer import RasterCanvas, mix_with_white, split_dashes
+
+
+class TestRasterRenderer(unittest.TestCase):
+
+    def test_mix_with_white(self):
+        np.testing.assert_allclose(mix_with_white("red", 100), [1.0, 0.0, 0.0])
+        np.testing.assert_allclose(mix_with_white("red", 40), [1.0, 0.6, 0.6])
+        np.testing.assert_allclose(mix_with_white("black", 0), [1.0, 1.0, 1.0])
+
+    def test_to_pixel_matches_annotation_transform(self):
+        canvas = RasterCanvas(200, 100, 20.0, 20.0)
+        pixels = canvas.to_pixel(np.array([[0.0, 0.0], [10.0, 10.0], [-10.0, -10.0]]))
+        np.testing.assert_allclose(pixels, [[100, 50], [200, 0], [0, 100]])
+
+    def test_split_dashes_keeps_on_lengths(self):
+        line = np.array([[0.0, 0.0], [10.0, 0.0]])
+        pieces = split_dashes(line, [2.0, 3.0])
+        self.assertEqual(len(pieces), 2)
+        np.testing.assert_allclose(pieces[0][[0, -1]], [[0, 0], [2, 0]])
+        np.testing.assert_allclose(pieces[1][[0, -1]], [[5, 0], [7, 0]])
+
+    def test_fill_with_opacity(self):
+        canvas = RasterCanvas(100, 100, 20.0, 20.0)
+        canvas.fill(Polygon([(-5, -5), (5, -5), (5, 5), (-5, 5)]), np.array([0.0, 0.0, 1.0]), 0.5)
+        np.testing.assert_allclose(canvas.pixels[50, 50], [0.5, 0.5, 1.0])
+        np.testing.assert_allclose(canvas.pixels[5, 5], [1.0, 1.0, 1.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
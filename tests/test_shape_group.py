@@ -0,0 +1,24 @@
+import sys
+import unittest
+from pathlib import Path
+
+from shapely import Point
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from shape_group import OverlapResolver
+
+
+class TestOverlapResolver(unittest.TestCase):
+
+    def test_layer_cache_ignores_entries_of_freed_lists(self):
+        resolver = OverlapResolver([])
+        layer = [object()]
+        # left behind by another list of the same length, whose id was reused by `layer`
+        resolver.layer_cache[id(layer)] = ([object()], 1, {0}, Point(0, 0).buffer(1))
+        self.assertEqual(resolver.layer_state(layer), set())
+        self.assertTrue(resolver.layer_union(layer).is_empty)
+
+
+if __name__ == "__main__":
+    unittest.main()
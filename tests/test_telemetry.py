@@ -0,0 +1,62 @@
+import sys
+import tracemalloc
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import memory_profile
+import telemetry
+
+
+class TestTelemetry(unittest.TestCase):
+
+    def test_stages_and_generator_depth(self):
+        telemetry.start_image("img-0")
+        with telemetry.generator("ChainingImageGenerator"):
+            for _ in range(2):
+                with telemetry.generator("SimpleImageGenerator"):
+                    pass
+        with telemetry.stage("write_json"):
+            pass
+        stats = telemetry.finish_image().to_dict()
+        self.assertEqual(stats["generators"]["ChainingImageGenerator@1"]["count"], 1)
+        self.assertEqual(stats["generators"]["SimpleImageGenerator@2"]["count"], 2)
+        self.assertEqual(stats["stages"]["write_json"]["count"], 1)
+        self.assertGreaterEqual(stats["total_seconds"], 0.0)
+
+    def test_timers_are_noops_outside_an_image(self):
+        self.assertIsNone(telemetry.current())
+        with telemetry.stage("config"):
+            pass
+        self.assertEqual(list(telemetry.timed_iter("tikz_convert", [1, 2])), [1, 2])
+
+    def test_aggregate(self):
+        image = {"total_seconds": 1.0, "stages": {"config": {"count": 1, "seconds": 0.25}}, "generators": {}}
+        summary = telemetry.aggregate([image, image])
+        self.assertEqual(summary["images"], 2)
+        self.assertEqual(summary["stages"]["config"], {"count": 2, "seconds": 0.5})
+
+    def test_memory_profile_of_top_level_generators(self):
+        memory_profile.enable(threshold=0.0)
+        try:
+            telemetry.start_image("img-0", config="test")
+            with telemetry.generator("ChainingImageGenerator"):
+                kept = [bytearray(1024 * 1024)]
+                with telemetry.generator("SimpleImageGenerator"):
+                    pass
+            stats = telemetry.finish_image().to_dict()
+        finally:
+            memory_profile.enabled = False
+            tracemalloc.stop()
+        memory = stats["memory"]
+        self.assertEqual(list(memory["generators"]), ["ChainingImageGenerator@1"])
+        self.assertGreaterEqual(memory["generators"]["ChainingImageGenerator@1"]["peak_mb"], 1.0)
+        self.assertGreaterEqual(memory["peak_mb"], 1.0)
+        self.assertTrue(memory["top_allocations"])
+        summary = memory_profile.summarize([stats])
+        self.assertEqual(summary["configs"]["test"]["images"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+import os
+import sys
+import threading
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import telemetry
+import trace_events
+
+
+class TestTraceEvents(unittest.TestCase):
+
+    def tearDown(self):
+        trace_events.enabled = False
+        trace_events._events.clear()
+        trace_events._named_threads.clear()
+
+    def test_stages_and_generators_become_spans_of_this_thread(self):
+        trace_events.enable("test")
+        telemetry.start_image("img-0")
+        with telemetry.stage("generate_panels"):
+            with telemetry.generator("ChainingImageGenerator"):
+                with telemetry.generator("SimpleImageGenerator"):
+                    pass
+        list(telemetry.timed_iter("tikz_convert", [1, 2, 3]))
+        telemetry.finish_image()
+        with trace_events.span("pdflatex", "subprocess") as span_args:
+            span_args["process_pid"] = 1
+
+        events = trace_events.events()
+        spans = {event["name"]: event for event in events if event["ph"] == "X"}
+        self.assertEqual(set(spans), {"generate_panels", "ChainingImageGenerator", "SimpleImageGenerator", "pdflatex"})
+        self.assertEqual(spans["SimpleImageGenerator"]["args"], {"image": "img-0", "depth": 2})
+        self.assertEqual(spans["pdflatex"]["args"], {"process_pid": 1})
+        outer, inner = spans["generate_panels"], spans["ChainingImageGenerator"]
+        self.assertLessEqual(outer["ts"], inner["ts"])
+        self.assertGreaterEqual(outer["ts"] + outer["dur"], inner["ts"] + inner["dur"])
+        self.assertTrue(all(event["pid"] == os.getpid() for event in events))
+        thread_names = [event for event in events if event["name"] == "thread_name"]
+        self.assertEqual([event["args"]["name"] for event in thread_names], [threading.current_thread().name])
+
+
+if __name__ == "__main__":
+    unittest.main()
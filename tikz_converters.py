@@ -1,6 +1,6 @@
 import re
 from abc import ABC, abstractmethod
-from typing import List
+from typing import Dict, Iterator, List
 
 from shapely import LineString
 
@@ -9,87 +9,111 @@ import img_params
 from entities.visible_shape import VisibleShape
 from generation_config import GenerationConfig
 from img_params import *
-
-
-class BaseConverter:  # enclose in classes to store temporary strings that makes the tikz strings, held by each individual VisibleShape instance to avoid data miswrite
-    def __init__(self) -> None:
-        self.color_str = ""
-        self.lightness_str = ""
-        self.pattern_str = ""
-        self.pattern_color_str = ""
-        self.pattern_lightness_str = ""
-        self.outline_str = ""
-        self.outline_color_str = ""
-        self.outline_thickness_str = ""
-        self.outline_lightness_str = ""
-
-    def partition_camel_case(self, string):
-        return re.sub(r"([a-z])([A-Z])", r"\1 \2", string).lower()
+from util import format_coord, format_number, format_trace
+
+
+def partition_camel_case(string):
+    return re.sub(r"([a-z])([A-Z])", r"\1 \2", string).lower()
+
+
+# tikz option fragment of every enum member, built once at import
+PATTERN_OPTIONS = {
+    pattern: "" if pattern == Pattern.blank else f"pattern={partition_camel_case(pattern.name)}"
+    for pattern in Pattern
+}
+PATTERN_COLOR_OPTIONS = {
+    color: f"pattern color={color.name.removeprefix('pattern').lower()}" for color in PattenColor
+}
+FILL_COLOR_OPTIONS = {color: f"fill={color.name}" for color in Color}
+LINE_COLOR_OPTIONS = {color: color.name.lower() for color in Color}
+OUTLINE_OPTIONS = {outline: partition_camel_case(outline.name) for outline in Outline}
+OUTLINE_COLOR_OPTIONS = {
+    color: f"draw={color.name.removeprefix('outline').lower()}" for color in OutlineColor
+}
+OUTLINE_THICKNESS_OPTIONS = {
+    thickness: "" if thickness == OutlineThickness.noOutline else f"line width={format_number(thickness.value * 0.1, 2)}mm"
+    for thickness in OutlineThickness
+}
+# lightness attributes are drawn from several lightness enums
+LIGHTNESS_OPTIONS = {
+    lightness: f"!{lightness.value}"
+    for enum in (Lightness, PatternLightness, OutlineLightness)
+    for lightness in enum
+}
+
+FRAGMENT_TABLES = {
+    "pattern": PATTERN_OPTIONS,
+    "color": FILL_COLOR_OPTIONS,
+    "lightness": LIGHTNESS_OPTIONS,
+    "pattern_color": PATTERN_COLOR_OPTIONS,
+    "pattern_lightness": LIGHTNESS_OPTIONS,
+    "outline": OUTLINE_OPTIONS,
+    "outline_color": OUTLINE_COLOR_OPTIONS,
+    "outline_thickness": OUTLINE_THICKNESS_OPTIONS,
+    "outline_lightness": LIGHTNESS_OPTIONS,
+}
+EMPTY_FRAGMENTS = {attr: "" for attr in FRAGMENT_TABLES}
+
+
+class BaseConverter(ABC):
+    """stateless; a single instance of each converter is shared by all entities of a type"""
 
     @abstractmethod
-    def convert(self, target: entity.Entity):
+    def convert(self, target: entity.Entity, styles: "TikzStyleRegistry" = None):
         pass
 
-    def get_pattern_tikz_string(self, pattern: Pattern):
-        if pattern == Pattern.blank:
-            return
-        self.pattern_str = f"pattern={self.partition_camel_case(pattern.name)}"
-
-    def get_pattern_lightness_string(self, pattern_lightness: PatternLightness):
-        self.pattern_lightness_str = f"!{pattern_lightness.value}"
-
-    def get_pattern_color_tikz_string(self, patttern_color: PattenColor):
-        self.pattern_color_str = (
-            f"pattern color={patttern_color.name.removeprefix('pattern').lower()}"
-        )
-
-    def get_color_tikz_string(self, color: Color):
-        self.color_str = f"fill={color.name}"
-
-    def get_lightness_tikz_string(self, lightness: Lightness):
-        self.lightness_str = f"!{lightness.value}"
+    @abstractmethod
+    def style_options(self, target: entity.Entity) -> List[str]:
+        """option list of each instruction emitted for the target, in order"""
+        pass
 
-    def get_outline_tikz_string(self, outline: Outline):
-        self.outline_str = self.partition_camel_case(outline.name)
+    def resolve_styles(self, target, styles: "TikzStyleRegistry" = None) -> List[str]:
+        options = self.style_options(target)
+        if styles is None:
+            return options
+        return [styles.reference(option) for option in options]
 
-    def get_outline_color_tikz_string(self, outline_color: OutlineColor):
-        self.outline_color_str = (
-            f"draw={outline_color.name.removeprefix('outline').lower()}"
+    def option_fragments(self, target) -> Dict[str, str]:
+        """tikz option fragment of each annotation category of the target, empty for absent categories"""
+        fragments = dict(EMPTY_FRAGMENTS)
+        for attr in target.dataset_annotation_categories:
+            if attr in FRAGMENT_TABLES:
+                fragments[attr] = FRAGMENT_TABLES[attr][getattr(target, attr)]
+        if "outline_thickness" in target.dataset_annotation_categories and target.outline_thickness == OutlineThickness.noOutline:
+            fragments["outline"] = "draw=none"
+        return fragments
+
+    def fill_options(self, fragments: Dict[str, str]) -> str:
+        return f"{fragments['color'] + fragments['lightness']},fill opacity={GenerationConfig.opacity}"
+
+    def draw_options(self, fragments: Dict[str, str]) -> str:
+        return (
+            f"{fragments['outline_thickness']},{fragments['outline_color'] + fragments['outline_lightness']},"
+            f"{fragments['pattern']},{fragments['pattern_color'] + fragments['pattern_lightness']},{fragments['outline']}"
         )
 
-    def get_outline_lightness_tikz_string(self, outline_lightness: OutlineLightness):
-        self.outline_lightness_str = f"!{outline_lightness.value}"
-
-    def get_outline_thickness_tikz_string(self, outline_thickness: OutlineThickness):
-        if outline_thickness == OutlineThickness.noOutline:
-            self.outline_str = "draw=none"
-            return
-        self.outline_thickness_str = f"line width={outline_thickness.value*0.1}mm"
-
-    def prepare_strings(self, target):
-        func_router = {
-            "pattern": self.get_pattern_tikz_string,
-            "color": self.get_color_tikz_string,
-            "lightness": self.get_lightness_tikz_string,
-            "pattern_color": self.get_pattern_color_tikz_string,
-            "pattern_lightness": self.get_pattern_lightness_string,
-            "outline": self.get_outline_tikz_string,
-            "outline_color": self.get_outline_color_tikz_string,
-            "outline_thickness": self.get_outline_thickness_tikz_string,
-            "outline_lightness": self.get_outline_lightness_tikz_string,
-        }
-
-        for attr in target.dataset_annotation_categories:
-            if attr in func_router:
-                func_router[attr](getattr(target, attr))
+    def shape_path(self, command: str, fill_style: str, draw_style: str, path: str) -> str:
+        """
+        one path per shape: the main path fills it, the outline and pattern are drawn over the fill by a
+        postaction. a postaction keeps the graphic state of the main path, so the fill opacity is reset there
+        """
+        return f"\\{command} [{fill_style},postaction={{draw,fill opacity=1,{draw_style}}}] {path};\n"
 
 
 class SimpleShapeConverter(BaseConverter):
-    def __init__(self) -> None:
-        super().__init__()
 
-    def convert(self, target):
-        self.prepare_strings(target)
+    def style_options(self, target) -> List[str]:
+        fragments = self.option_fragments(target)
+        if target.shape == Shape.circle:
+            return [
+                self.fill_options(fragments),
+                f"{fragments['outline_thickness']},{fragments['outline_color']},{fragments['outline']},"
+                f"{fragments['pattern']},{fragments['pattern_color'] + fragments['pattern_lightness']}",
+            ]
+        return [self.fill_options(fragments), self.draw_options(fragments)]
+
+    def convert(self, target, styles: "TikzStyleRegistry" = None):
+        fill_style, draw_style = self.resolve_styles(target, styles)
 
         if target.shape in [
             Shape.triangle,
@@ -97,27 +121,21 @@ class SimpleShapeConverter(BaseConverter):
             Shape.pentagon,
             Shape.hexagon,
         ]:
-            trace = " -- ".join(
-                [str(coord) for coord in target.base_geometry.exterior.coords]
-            )
+            trace = format_trace(target.base_geometry.exterior.coords)
             tikz_instruction = (
-                # draw the background color in seperate instruction, otherwise will be covered by pattern
+                # the pattern is drawn by a postaction after the fill, otherwise the background color will be covered by pattern
                 # f"\\node[regular polygon, regular polygon sides={sides}, minimum size={round(target.size,3)}cm,fill opacity={GenerationConfig.opacity},"
                 # f"{self.color_str+self.lightness_str}, inner sep=0pt,rotate={target.rotation.value}]"
                 # f"at ({target.position[0]},{target.position[1]}) {{}};\n"
-                f"\\fill [{self.color_str + self.lightness_str},fill opacity={GenerationConfig.opacity}] {trace};\n"
-                f"\\draw [{self.outline_thickness_str},{self.outline_color_str+self.outline_lightness_str},{self.pattern_str},{self.pattern_color_str+self.pattern_lightness_str},{self.outline_str}] {trace};\n"
+                self.shape_path("path", fill_style, draw_style, trace)
                 # f"\\node[{self.outline_thickness_str},regular polygon, regular polygon sides={sides}, minimum size={round(target.size,3)}cm,"
                 # f"inner sep=0pt,{self.outline_color_str+self.outline_lightness_str},rotate={target.rotation.value},{self.pattern_str},"
                 # f"{self.pattern_color_str+self.pattern_lightness_str},{self.outline_str}] at ({target.position[0]},{target.position[1]}) {{}};\n"
             )
         elif target.shape == Shape.circle:
-            tikz_instruction = (
-                f"\draw [{self.color_str+self.lightness_str},fill opacity={GenerationConfig.opacity}]"
-                f"({target.position[0]},{target.position[1]}) circle ({target.size});\n"
-                f"\draw [{self.outline_thickness_str},{self.outline_color_str},{self.outline_str},"
-                f"{self.pattern_str},{self.pattern_color_str+self.pattern_lightness_str}]"
-                f"({target.position[0]},{target.position[1]}) circle ({target.size});\n"
+            # the fill of a circle is a \draw, which also strokes the default thin black outline
+            tikz_instruction = self.shape_path(
+                "draw", fill_style, draw_style, f"{format_coord(target.position)} circle ({format_number(target.size)})"
             )
 
         # tikz_instruction += f"\\fill [black] ({shape.position[0]},{shape.position[1]}) circle (0.1);\n"
@@ -125,49 +143,113 @@ class SimpleShapeConverter(BaseConverter):
 
 
 class LineSegmentConverter(BaseConverter):
-    def __init__(self) -> None:
-        super().__init__()
 
-    def convert(self, target):
-        tikz = f"\draw[color={target.color.name.lower()},ultra thick,{self.partition_camel_case(target.line_pattern.name)}] ({target.endpt_up[0]},{target.endpt_up[1]}) -- ({target.endpt_down[0]},{target.endpt_down[1]});"
+    def style_options(self, target) -> List[str]:
+        return [f"color={LINE_COLOR_OPTIONS[target.color]},ultra thick,{OUTLINE_OPTIONS[target.line_pattern]}"]
+
+    def convert(self, target, styles: "TikzStyleRegistry" = None):
+        (style,) = self.resolve_styles(target, styles)
+        tikz = f"\\draw[{style}] {format_coord(target.endpt_up)} -- {format_coord(target.endpt_down)};"
         return tikz
 
 
+class SmoothCurveConverter(BaseConverter):
+
+    def style_options(self, target) -> List[str]:
+        return [f"color={LINE_COLOR_OPTIONS[target.color]},ultra thick,{OUTLINE_OPTIONS[target.line_pattern]}"]
+
+    def convert(self, target, styles: "TikzStyleRegistry" = None):
+        (style,) = self.resolve_styles(target, styles)
+        points = target.control_points
+        if target.kind == "bezier":
+            path = f"{format_coord(points[0])} .. controls {format_coord(points[1])} and {format_coord(points[2])} .. {format_coord(points[3])}"
+        elif target.kind == "circle":
+            path = f"{format_coord(points[0])} circle ({format_number(target.radius)})"
+        else:
+            path = format_trace(points)
+        return f"\\draw[{style}] {path};"
+
+
 class ComplexShapeConverter(BaseConverter):
-    def __init__(self) -> None:
-        super().__init__()
 
-    def convert(self, target):
-        self.prepare_strings(target)
+    def style_options(self, target) -> List[str]:
+        if isinstance(target.base_geometry, LineString):
+            return [LINE_COLOR_OPTIONS[target.color]]
+        fragments = self.option_fragments(target)
+        if target.shape == img_params.Type.INTERSECTIONREGION:
+            return [f"{self.fill_options(fragments)},"]
+        return [self.fill_options(fragments), self.draw_options(fragments)]
+
+    def convert(self, target, styles: "TikzStyleRegistry" = None):
+        resolved = self.resolve_styles(target, styles)
         if isinstance(target.base_geometry, LineString):
-            tikz = f"\\draw [{target.color.name.lower()}] {target.base_geometry.coords[0]} -- {target.base_geometry.coords[1]};\n"
+            coords = target.base_geometry.coords
+            tikz = f"\\draw [{resolved[0]}] {format_coord(coords[0])} -- {format_coord(coords[1])};\n"
         elif target.shape == img_params.Type.INTERSECTIONREGION:
-            trace = " -- ".join(
-                [str(coord) for coord in target.base_geometry.exterior.coords]
-            )
-            tikz = f"\\fill [{self.color_str + self.lightness_str},fill opacity={GenerationConfig.opacity},] {trace};\n"
+            trace = format_trace(target.base_geometry.exterior.coords)
+            tikz = f"\\fill [{resolved[0]}] {trace};\n"
         else:
-            trace = " -- ".join(
-                [str(coord) for coord in target.base_geometry.exterior.coords]
-            )
-            tikz = (
-                f"\\fill [{self.color_str + self.lightness_str},fill opacity={GenerationConfig.opacity}] {trace};\n"
-                f"\\draw [{self.outline_thickness_str},{self.outline_color_str+self.outline_lightness_str},{self.pattern_str},{self.pattern_color_str+self.pattern_lightness_str},{self.outline_str}] {trace};\n"
-            )
+            trace = format_trace(target.base_geometry.exterior.coords)
+            tikz = self.shape_path("path", resolved[0], resolved[1], trace)
         return tikz
 
 
-def convert_panel(input_panel) -> list[str]:
-    instructions = [SimpleShapeConverter().convert(input_panel.background)]
+class TikzStyleRegistry:
+    """
+    Option lists shared by several instructions of a document. They are defined once with \\tikzset
+    in the template preamble and referenced by name; options used only once stay inline.
+    """
+
+    def __init__(self) -> None:
+        self.counts = {}
+        self.names = {}
+
+    def register(self, options: str):
+        self.counts[options] = self.counts.get(options, 0) + 1
+
+    def assign_names(self):
+        shared = [options for options, count in self.counts.items() if count > 1]
+        self.names = {options: f"s{i}" for i, options in enumerate(shared)}
+
+    def reference(self, options: str) -> str:
+        return self.names.get(options, options)
+
+    def definitions(self) -> List[str]:
+        return [f"{name}/.style={{{options}}}" for options, name in self.names.items()]
 
+
+def iter_panel_shapes(input_panel):
+    """every shape of the panel with its converter, in drawing order"""
+    yield input_panel.background, input_panel.background.tikz_converter
     for shape in input_panel.shapes:
-        instructions.append(shape.tikz_converter.convert(shape))
+        yield shape, shape.tikz_converter
 
-    return instructions
 
+def collect_styles(panels) -> TikzStyleRegistry:
+    """pre-pass over the panels that only builds the option lists, not the paths"""
+    styles = TikzStyleRegistry()
+    for panel in panels:
+        for shape, converter in iter_panel_shapes(panel):
+            for options in converter.style_options(shape):
+                styles.register(options)
+    styles.assign_names()
+    return styles
 
-def convert_panels(panels) -> list[str]:
-    instructions = []
+
+def iter_panel_instructions(input_panel, styles: TikzStyleRegistry = None) -> Iterator[str]:
+    for shape, converter in iter_panel_shapes(input_panel):
+        yield converter.convert(shape, styles)
+
+
+def iter_instructions(panels, styles: TikzStyleRegistry = None) -> Iterator[str]:
+    """tikz instructions of all panels, converted lazily while the template is rendered"""
     for panel in panels:
-        instructions += convert_panel(panel)
-    return instructions
+        yield from iter_panel_instructions(panel, styles)
+
+
+def convert_panel(input_panel) -> list[str]:
+    return list(iter_panel_instructions(input_panel))
+
+
+def convert_panels(panels) -> list[str]:
+    return list(iter_instructions(panels))
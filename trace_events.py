@@ -0,0 +1,85 @@
+"""
+Chrome trace-event export of generation runs (--trace).
+
+When enabled, the following are recorded as complete ("X") events:
+
+    config, generate_panels, ...    telemetry stages of each image, see telemetry.py
+    <ImageGenerator>                every nested ImageGenerator.generate call, with its depth
+    pdflatex, pdftoppm              external process runs, with the pid of the process when known
+
+Every event carries the pid of the process and the native id of the thread that recorded it, and metadata
+events name both, so a run with several worker processes or threads loads as one timeline in
+chrome://tracing, https://ui.perfetto.dev or speedscope. Timestamps are wall clock microseconds, comparable
+between the processes of a run.
+
+The streamed tikz conversion of the instructions is not traced per instruction, it is part of write_tex.
+Events are kept in memory until `write`, so tracing is meant for inspecting runs rather than left on.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Optional
+
+enabled = False
+
+_events: List[dict] = []
+_named_threads = set()  # (pid, tid) that already have a thread_name event
+_lock = threading.Lock()
+_clock_offset = time.time() - time.perf_counter()  # perf_counter -> seconds since the epoch
+
+
+def enable(name: Optional[str] = None):
+    global enabled
+    enabled = True
+    pid = os.getpid()
+    if name is not None:
+        _events.append({"name": "process_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": f"{name} ({pid})"}})
+
+
+def record(name: str, category: str, start: float, seconds: float, **args):
+    """add a span that started at perf_counter `start`"""
+    pid, tid = os.getpid(), threading.get_native_id()
+    event = {
+        "name": name,
+        "cat": category,
+        "ph": "X",
+        "ts": round((start + _clock_offset) * 1e6, 1),
+        "dur": round(seconds * 1e6, 1),
+        "pid": pid,
+        "tid": tid,
+        "args": args,
+    }
+    with _lock:
+        if (pid, tid) not in _named_threads:
+            _named_threads.add((pid, tid))
+            thread_name = threading.current_thread().name
+            _events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": thread_name}})
+        _events.append(event)
+
+
+@contextmanager
+def span(name: str, category: str, **args):
+    """trace the block when enabled. the yielded args can be extended inside it, e.g. with a subprocess pid"""
+    if not enabled:
+        yield args
+        return
+    start = time.perf_counter()
+    try:
+        yield args
+    finally:
+        record(name, category, start, time.perf_counter() - start, **args)
+
+
+def events() -> List[dict]:
+    with _lock:
+        return list(_events)
+
+
+def write(path: str, all_events: Optional[List[dict]] = None):
+    """write the events of this process (or `all_events`, e.g. merged from several workers) as a trace file"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events() if all_events is None else all_events, "displayTimeUnit": "ms"}, f)
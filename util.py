@@ -92,7 +92,7 @@ def compute_opposite_angle_range(
 
 
 def cubic_bezier(t, P0, P1, P2, P3):
-    """Calculate a point on a cubic Bezier curve."""
+    """Calculate a point on a cubic Bezier curve. `t` can be an array of shape (n, 1) to get n points at once."""
     return (
         (1 - t) ** 3 * P0
         + 3 * (1 - t) ** 2 * t * P1
@@ -103,54 +103,34 @@ def cubic_bezier(t, P0, P1, P2, P3):
 
 def generate_bezier_curve(P0, P1, P2, P3, num_points=100, scale=1) -> np.ndarray:
     """Generate points on a cubic Bezier curve."""
-    t_values = np.linspace(0, 1, num_points)
-    curve = np.array([scale * cubic_bezier(t, P0, P1, P2, P3) for t in t_values])
-    return curve
+    t_values = np.linspace(0, 1, num_points)[:, np.newaxis]
+    return scale * cubic_bezier(t_values, *np.asarray([P0, P1, P2, P3], dtype=float))
 
 
 def generate_equidistant_bezier_curve(
     P0, P1, P2, P3, num_points=100, scale=1
 ) -> np.ndarray:
     """Generate approximately equidistant points on a cubic Bezier curve."""
-    t_values = np.linspace(0, 1, num_points * 10)  # 生成更多点
-    curve = np.array([scale * cubic_bezier(t, P0, P1, P2, P3) for t in t_values])
+    curve = generate_bezier_curve(P0, P1, P2, P3, num_points * 10, scale)  # 生成更多点
 
     distances = np.linalg.norm(curve[1:] - curve[:-1], axis=1)
     cumulative_distances = np.cumsum(distances)
     total_length = cumulative_distances[-1]
 
+    # the i-th sample is placed at cumulative_distances[i], interpolate both coordinates at the target distances
     target_distances = np.linspace(0, total_length, num_points)
-    equidistant_curve = []
-    last_index = 0
-
-    for target_distance in target_distances:
-        while (
-            last_index < len(cumulative_distances)
-            and cumulative_distances[last_index] < target_distance
-        ):
-            last_index += 1
-        if last_index == 0:
-            equidistant_curve.append(curve[0])
-        else:
-            # Interpolate between the two closest points
-            t = (target_distance - cumulative_distances[last_index - 1]) / (
-                cumulative_distances[last_index] - cumulative_distances[last_index - 1]
-            )
-            point = curve[last_index - 1] + t * (
-                curve[last_index] - curve[last_index - 1]
-            )
-            equidistant_curve.append(point)
-
-    return np.array(equidistant_curve)
+    return np.column_stack(
+        [np.interp(target_distances, cumulative_distances, curve[:-1, axis]) for axis in range(2)]
+    )
 
 
-def generate_random_bezier_curve():
+def generate_random_bezier_control_points() -> List[np.ndarray]:
     config = generation_config.GenerationConfig.chaining_image_config
-    control_dist = getattr(config, 'control_point_distribution', {
+    control_dist = getattr(config, 'control_point_distribution', None) or {
         'x_range': [-0.125, 0.125],
         'y_range': [-0.5, 0.5],
         'pivot_points': [-0.75, -0.25, 0.25, 0.75]
-    })
+    }
     
     pivots = [p * generation_config.GenerationConfig.canvas_width for p in control_dist['pivot_points']]
     x_range = [r * generation_config.GenerationConfig.canvas_width for r in control_dist['x_range']]
@@ -171,6 +151,11 @@ def generate_random_bezier_curve():
         )
         for pivot in pivots
     ]
+    return control_points
+
+
+def generate_random_bezier_curve():
+    control_points = generate_random_bezier_control_points()
     return generate_equidistant_bezier_curve(
         P0=control_points[0],
         P1=control_points[1],
@@ -216,9 +201,8 @@ def get_points_on_line(start, end, n=100):
     end = np.array(end)
 
     # 生成包含 n 个点的等差数列，并根据比例计算每个点的坐标
-    points = np.array(
-        [((1 - t) * start + t * end).tolist() for t in np.linspace(0, 1, n)]
-    )
+    t = np.linspace(0, 1, n)[:, np.newaxis]
+    points = (1 - t) * start + t * end
 
     return points
 
@@ -388,6 +372,20 @@ def rotate_point(original_point, pivot_point, theta):
     return np.array((x_final, y_final))
 
 
+def rotate_points(points, pivot_point, theta) -> np.ndarray:
+    """rotate_point applied to an (n, 2) array of points at once"""
+    points = np.asarray(points, dtype=float)
+    theta_rad = np.radians(theta)
+    shifted = points - np.asarray(pivot_point, dtype=float)
+    rotated = np.column_stack(
+        [
+            shifted[:, 0] * np.cos(theta_rad) - shifted[:, 1] * np.sin(theta_rad),
+            shifted[:, 0] * np.sin(theta_rad) + shifted[:, 1] * np.cos(theta_rad),
+        ]
+    )
+    return rotated + np.asarray(pivot_point, dtype=float)
+
+
 def choose_color(color_distribution: List[float]) -> img_params.Color:
     return choose_item_by_distribution(img_params.Color, color_distribution)
 
@@ -399,3 +397,52 @@ def choose_item_by_distribution(enum: Union[Type[Enum],List[str]], distribution:
         raise ValueError("Color distribution probabilities must sum to 1.")
     selected = random.choices(list(enum), weights=distribution, k=1)[0]
     return selected
+
+
+def canvas_to_pixel(coords, size, canvas_size=None) -> np.ndarray:
+    """
+    pixel coordinates of canvas coordinates on an image of `size` (width, height) that covers the whole canvas,
+    centered at (0, 0). canvas_size (width, height) defaults to the canvas of the current config
+    """
+    width, height = size
+    if canvas_size is None:
+        canvas_size = (generation_config.GenerationConfig.canvas_width, generation_config.GenerationConfig.canvas_height)
+    canvas_width, canvas_height = canvas_size
+    coords = np.asarray(coords, dtype=float)
+    return np.column_stack(
+        [
+            coords[:, 0] / canvas_width * width + width / 2,
+            height / 2 - coords[:, 1] / canvas_height * height,
+        ]
+    )
+
+
+def quantize_coords(coords, precision: int = None) -> np.ndarray:
+    """round coordinates to the output precision, near-zero values become 0.0 instead of -0.0"""
+    if precision is None:
+        precision = generation_config.GenerationConfig.coordinate_precision
+    return np.round(np.asarray(coords, dtype=float), precision) + 0.0
+
+
+def format_number(value: float, precision: int = None) -> str:
+    """shortest fixed-point text of the value at the output precision, e.g. 3.4999999999999996 -> 3.5"""
+    if precision is None:
+        precision = generation_config.GenerationConfig.coordinate_precision
+    text = f"{value:.{precision}f}"
+    if "." in text:
+        text = text.rstrip("0").rstrip(".")
+    return "0" if text == "-0" else text
+
+
+def format_coord(coord, precision: int = None) -> str:
+    return f"({format_number(coord[0], precision)}, {format_number(coord[1], precision)})"
+
+
+def format_trace(coords, precision: int = None) -> str:
+    """tikz path through the coordinates, dropping vertices that coincide after rounding"""
+    points = []
+    for coord in coords:
+        point = format_coord(coord, precision)
+        if not points or point != points[-1]:
+            points.append(point)
+    return " -- ".join(points)